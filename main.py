@@ -3,10 +3,90 @@ if not((sys.version_info > (3, ))):
     print("FATAL\tThis Script needs Python 3")
     sys.exit()
 
-import src.motor.open_loop
-import src.motor.inertial_navigation
-import src.motor.inertial_navigation_filtered
+import argparse
+import os
+import src.sim.scenario as scenario
 
-# src.motor.open_loop.sim()
-# src.motor.inertial_navigation.sim()
-src.motor.inertial_navigation_filtered.sim()
\ No newline at end of file
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Run robot GNC scenarios and write a summary table")
+    parser.add_argument("scenarios",                nargs="*",      metavar="FILE", help="JSON or TOML scenario files")
+    parser.add_argument("--sim",                    choices=sorted(scenario.sims),  help="Also run one scenario of this sim with its defaults")
+    parser.add_argument("--set",                    action="append", default=[], dest="overrides", metavar="[SCENARIO:]KEY=VALUE",
+                                                    help="Change a parameter in every scenario, or just the named one. KEY can be vehicle.FIELD")
+    parser.add_argument("--only",                   nargs="+",      metavar="NAME",  help="Only run the named scenarios")
+    parser.add_argument("--output",                 default="results",               help="Directory for the summary table, plots and telemetry")
+    parser.add_argument("--summary",                                                 help="Summary table path, defaults to OUTPUT/summary.csv")
+    parser.add_argument("--processes",              type=int)
+    parser.add_argument("--headless",               action="store_true",            help="Never open plot windows")
+    parser.add_argument("--plots",                  action="store_true",            help="Save a plot of every scenario to OUTPUT/NAME.png")
+    parser.add_argument("--list",                   action="store_true",            help="List the sims and exit")
+    args = parser.parse_args(argv)
+
+    if(args.list):
+        for name in sorted(scenario.sims):
+            print(name)
+        return 0
+
+    scenarios = []
+    try:
+        for path in args.scenarios:
+            scenarios.extend(scenario.load(path))
+    except ValueError as error:
+        parser.error(str(error))
+    if(args.sim is not None):
+        scenarios.append({"name" : args.sim, "sim" : args.sim})
+
+    # Without any scenarios, show the filtered inertial navigation sim like always
+    if(len(scenarios) == 0):
+        scenarios.append({"name" : "motor.inertial_navigation_filtered", "sim" : "motor.inertial_navigation_filtered"})
+
+    try:
+        scenarios = scenario.apply_overrides(scenarios, [scenario.parse_override(text) for text in args.overrides])
+        if(args.only is not None):
+            scenarios = [entry for entry in scenarios if entry["name"] in args.only]
+        names = [entry["name"] for entry in scenarios]
+        if(len(set(names)) != len(names)):
+            raise ValueError("Scenario names have to be unique")
+        for entry in scenarios:
+            scenario.check(entry)
+    except ValueError as error:
+        parser.error(str(error))
+
+    # Plots are only drawn in this process, so headless runs never load a GUI backend
+    show        = not args.headless
+    if(args.headless and args.plots):
+        import matplotlib
+        matplotlib.use("Agg")
+
+    summary     = args.summary if args.summary is not None else os.path.join(args.output, "summary.csv")
+    failures    = 0
+    figures     = []
+    for row, result in scenario.run_all(scenarios, summary, args.output, args.processes, show or args.plots):
+        print("{:<40} {:<6} {:.2f} s {}".format(row["name"], row["status"], row["wall_time_s"], row.get("message", "")))
+        if(row["status"] != "ok"):
+            failures += 1
+            continue
+
+        if(show or args.plots):
+            import src.sim.plotting as plotting
+
+            if(hasattr(result, "cross_track")):
+                figure = plotting.plot_path(result, False)
+            else:
+                figure = plotting.plot_result(result, False)
+            if(args.plots):
+                figure.savefig(os.path.join(args.output, "{}.png".format(row["name"])))
+            figures.append(figure)
+
+    print("{} scenarios, {} failed, summary in {}".format(len(scenarios), failures, summary))
+
+    if(show and figures):
+        import matplotlib.pyplot as plt
+        plt.show()
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
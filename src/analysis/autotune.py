@@ -0,0 +1,253 @@
+###########################################################
+#
+#   FILENAME:       autotune.py
+#
+#   DESCRIPTION:    PID gain autotuner for the inertial
+#                     navigation sims. A cross entropy search
+#                     over log scaled gains minimizes the mean
+#                     cost over a set of noise seeds, with
+#                     each generation of candidates evaluated
+#                     on a process pool. A candidate's runs
+#                     are cut short as soon as they diverge or
+#                     can no longer beat the best gains so far
+#
+###########################################################
+
+import  argparse
+import  csv
+import  inspect
+import  math
+import  multiprocessing
+import  os
+import  random
+import  sys
+import  time
+import  src.motor.inertial_navigation           as inertial_navigation
+import  src.motor.inertial_navigation_filtered  as inertial_navigation_filtered
+import  src.sim.metrics                         as metrics
+
+# Sims that can be tuned, by name
+sims = {
+    "inertial_navigation"           : inertial_navigation.run,
+    "inertial_navigation_filtered"  : inertial_navigation_filtered.run,
+}
+
+# Gains that are tuned, in table column order
+parameter_names = [
+    "kp",
+    "ki",
+    "kd",
+]
+
+table_columns = ["generation", "candidate"] + parameter_names + ["cost", "aborted", "simulated_s"]
+
+
+# Cost of one finished run. A run that never settles is charged the whole cap
+def run_cost(summary, max_time_s, overshoot_weight, error_weight):
+    settling_time = summary["settling_time"]
+    if(math.isnan(settling_time)):
+        settling_time = max_time_s
+
+    return settling_time + (overshoot_weight * summary["overshoot"]) + (error_weight * abs(summary["steady_state_error"]))
+
+
+# Passed to a sim's run() as abort. Keeps a lower bound on the cost of the run so
+#   far and stops it once that reaches the budget, or once the robot is further
+#   than divergence_meters from the target
+class Run_Monitor:
+    def __init__(self, target, budget, overshoot_weight, divergence_meters):
+        self.target             = target
+        self.budget             = budget
+        self.overshoot_weight   = overshoot_weight
+        self.divergence_meters  = divergence_meters
+        self.overshoot          = 0.0
+        self.bound              = 0.0
+        self.reason             = ""
+
+    def __call__(self, cur_time, actual_position):
+        self.overshoot  = max(self.overshoot, actual_position - self.target)
+
+        # The run hasn't settled yet, so it can't settle before now
+        self.bound      = cur_time + (self.overshoot_weight * self.overshoot)
+
+        if(abs(actual_position - self.target) > self.divergence_meters):
+            self.reason = "diverged"
+            return True
+        if(self.bound >= self.budget):
+            self.reason = "over budget"
+            return True
+        return False
+
+
+# Worker side of the search, runs one candidate over every seed in turn. budget is
+#   the incumbent's mean cost, math.inf to run everything to the end. Returns the
+#   mean cost, or a lower bound on it when the runs were aborted
+def evaluate(task):
+    sim_name, gains, seeds, config, budget, overshoot_weight, error_weight, divergence_meters = task
+
+    run         = sims[sim_name]
+    target      = config.get("target", 10)
+    max_time_s  = config.get("max_time_s", 360)
+    if(divergence_meters is None):
+        divergence_meters = 2 * abs(target)
+
+    total       = 0.0
+    simulated   = 0.0
+    aborted     = ""
+    for seed in seeds:
+        # Whatever the remaining seeds cost, they can't cost less than nothing
+        monitor     = Run_Monitor(target, (budget * len(seeds)) - total, overshoot_weight, divergence_meters)
+        result      = run(seed=seed, abort=monitor, **gains, **config)
+        simulated   += result.timestamp[-1]
+
+        if(monitor.reason == "diverged"):
+            # A diverged run is never going to settle
+            total   += max_time_s + (overshoot_weight * monitor.overshoot)
+            aborted = monitor.reason
+            break
+        elif(monitor.reason):
+            total   += monitor.bound
+            aborted = monitor.reason
+            break
+
+        total += run_cost(metrics.summarize(result), max_time_s, overshoot_weight, error_weight)
+
+    return total / len(seeds), aborted, simulated
+
+
+# Cross entropy search over log10 of the gains. Each generation draws population
+#   candidates around the current mean, evaluates them in parallel and refits the
+#   mean and spread to the best elite_fraction of them. Returns the best gains, their
+#   mean cost and one row per evaluated candidate
+#   sim_name            Key into sims
+#   initial             Starting gains, defaults to the sim's own
+#   seeds               Noise seeds every candidate is averaged over
+#   spread              Starting standard deviation of the search in decades
+#   min_spread          The spread never shrinks below this, so the search keeps exploring
+#   divergence_meters   A run this far from the target has diverged, None for twice the target
+#                         distance so an ordinary overshoot never counts
+#   early_abort         False to run every candidate to the end, e.g. to measure what aborting saves
+#   config              Other keyword arguments for the sim's run(), e.g. time_step_s
+def autotune(sim_name           = "inertial_navigation_filtered",
+             initial            = None,
+             generations        = 10,
+             population         = 16,
+             elite_fraction     = 0.25,
+             seeds              = (0, 1, 2, 3),
+             spread             = 0.5,
+             min_spread         = 0.02,
+             overshoot_weight   = 10,
+             error_weight       = 100,
+             divergence_meters  = None,
+             early_abort        = True,
+             processes          = None,
+             search_seed        = 0,
+             **config):
+
+    if(sim_name not in sims):
+        raise ValueError("Unknown sim {}".format(sim_name))
+
+    if(initial is None):
+        parameters  = inspect.signature(sims[sim_name]).parameters
+        initial     = {name : parameters[name].default for name in parameter_names}
+
+    if(processes is None):
+        processes = os.cpu_count()
+
+    rng             = random.Random(search_seed)
+    elite_count     = max(2, int(population * elite_fraction))
+
+    # Gains can't go negative or to zero in log space
+    mean            = [math.log10(max(initial[name], 1e-6)) for name in parameter_names]
+    deviation       = [spread] * len(parameter_names)
+
+    def task(gains, budget):
+        return (sim_name, gains, tuple(seeds), config, budget if early_abort else math.inf,
+                overshoot_weight, error_weight, divergence_meters)
+
+    history         = []
+    start           = time.monotonic()
+    with multiprocessing.Pool(processes) as pool:
+        # The starting gains always run to the end, they set the first budget
+        best_gains                  = dict(initial)
+        best_cost, aborted, total   = evaluate(task(best_gains, math.inf))
+        history.append(dict(best_gains, generation=0, candidate=0, cost=best_cost, aborted=aborted, simulated_s=total))
+
+        for generation in range(1, generations + 1):
+            candidates  = []
+            for i in range(0, population):
+                point = [rng.gauss(mean[d], deviation[d]) for d in range(0, len(parameter_names))]
+                candidates.append({name : 10 ** value for name, value in zip(parameter_names, point)})
+
+            # Every candidate in a generation is held to the same budget so the
+            #   search doesn't depend on the order the workers finish in
+            outcomes    = pool.map(evaluate, [task(gains, best_cost) for gains in candidates], 1)
+
+            ranked      = []
+            for i, (gains, (cost, aborted, simulated)) in enumerate(zip(candidates, outcomes)):
+                history.append(dict(gains, generation=generation, candidate=i, cost=cost, aborted=aborted, simulated_s=simulated))
+                total += simulated
+                ranked.append((cost, i))
+
+                # Only a candidate that ran to the end knows its cost
+                if((not aborted) and (cost < best_cost)):
+                    best_cost   = cost
+                    best_gains  = gains
+
+            ranked.sort()
+            elite       = [[math.log10(candidates[i][name]) for name in parameter_names] for cost, i in ranked[:elite_count]]
+            for d in range(0, len(parameter_names)):
+                values          = [point[d] for point in elite]
+                mean[d]         = sum(values) / len(values)
+                deviation[d]    = max(math.sqrt(sum((value - mean[d]) ** 2 for value in values) / len(values)), min_spread)
+
+            print("generation {}/{}: best cost {:.3f} kp {:.4g} ki {:.4g} kd {:.4g}, {} aborted, {:.0f} s".format(
+                generation, generations, best_cost, best_gains["kp"], best_gains["ki"], best_gains["kd"],
+                sum(1 for cost, aborted, simulated in outcomes if aborted), time.monotonic() - start), file=sys.stderr)
+
+    print("{:.0f} simulated seconds over {} candidate evaluations".format(total, len(history)), file=sys.stderr)
+
+    return best_gains, best_cost, history
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Tune the PID gains of an inertial navigation sim")
+    parser.add_argument("--sim",                    choices=sorted(sims),   default="inertial_navigation_filtered")
+    parser.add_argument("--generations",            type=int,   default=10)
+    parser.add_argument("--population",             type=int,   default=16)
+    parser.add_argument("--seeds",                  type=int,   default=4,      help="Average every candidate over seeds 0 to N - 1")
+    parser.add_argument("--search-seed",            type=int,   default=0,      help="Seed for the candidates the search draws")
+    parser.add_argument("--time-step",              type=float,                 help="Sim time step, defaults to the sim's own")
+    parser.add_argument("--overshoot-weight",       type=float, default=10,     help="Cost in seconds per meter of overshoot")
+    parser.add_argument("--error-weight",           type=float, default=100,    help="Cost in seconds per meter of steady state error")
+    parser.add_argument("--no-abort",               action="store_true",        help="Run every candidate to the end")
+    parser.add_argument("--processes",              type=int)
+    parser.add_argument("--output",                                 metavar="CSV",  help="Table of every evaluated candidate")
+    args = parser.parse_args(argv)
+
+    config = {}
+    if(args.time_step is not None):
+        config["time_step_s"] = args.time_step
+
+    gains, cost, history = autotune(args.sim,
+                                    generations         = args.generations,
+                                    population          = args.population,
+                                    seeds               = range(0, args.seeds),
+                                    overshoot_weight    = args.overshoot_weight,
+                                    error_weight        = args.error_weight,
+                                    early_abort         = not args.no_abort,
+                                    processes           = args.processes,
+                                    search_seed         = args.search_seed,
+                                    **config)
+
+    if(args.output is not None):
+        with open(args.output, "w", newline="") as table:
+            writer = csv.DictWriter(table, fieldnames=table_columns)
+            writer.writeheader()
+            writer.writerows(history)
+
+    print("kp {:.6g} ki {:.6g} kd {:.6g} cost {:.3f}".format(gains["kp"], gains["ki"], gains["kd"], cost))
+
+
+if __name__ == '__main__':
+    main()
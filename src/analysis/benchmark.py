@@ -0,0 +1,205 @@
+###########################################################
+#
+#   FILENAME:       benchmark.py
+#
+#   DESCRIPTION:    Benchmark suite for the models' hot
+#                     methods and the end to end sims.
+#                     Throughput and peak memory are appended
+#                     to a JSON history file and compared with
+#                     the best recorded values, the run fails
+#                     when anything regressed past the
+#                     tolerance
+#
+###########################################################
+
+import  argparse
+import  json
+import  os
+import  platform
+import  subprocess
+import  sys
+import  time
+import  tracemalloc
+import  src.models.accelerometer                as acl
+import  src.models.dc_motor                     as dc_motor
+import  src.motor.open_loop                     as open_loop
+import  src.motor.inertial_navigation           as inertial_navigation
+import  src.motor.inertial_navigation_filtered  as inertial_navigation_filtered
+from    src.models.iir_filter                   import IIR_Filter
+from    src.models.pid                          import PID
+from    src.models.ra_filter                    import RA_Filter
+
+model_calls     = 100000
+sim_time_steps  = [0.1, 0.01, 0.001]
+
+
+# Each benchmark is a name and a function that does a fixed amount of work
+#   and returns how many steps it took
+
+def bench_dc_motor_rotate():
+    motor       = dc_motor.DC_Motor(0.01, 120, 0)
+    directions  = [
+        dc_motor.DC_Motor.motor_directions["Forwards"],
+        dc_motor.DC_Motor.motor_directions["Sustain"],
+        dc_motor.DC_Motor.motor_directions["Backwards"],
+    ]
+    for i in range(0, model_calls):
+        motor.rotate(directions[i % 3])
+    return model_calls
+
+def bench_accelerometer_get_accel():
+    accel = acl.Accelerometer(0.01, 0)
+    for i in range(0, model_calls):
+        accel.get_accel(i * 0.001)
+    return model_calls
+
+def bench_pid_process():
+    controller = PID(0.01, 0.5, 1, 2)
+    for i in range(0, model_calls):
+        controller.process(10 - i * 0.0001)
+    return model_calls
+
+def make_ra_filter_bench(num_terms):
+    def bench_ra_filter_filter():
+        filter = RA_Filter(num_terms)
+        for i in range(0, model_calls):
+            filter.filter(i * 0.001)
+        return model_calls
+    return bench_ra_filter_filter
+
+def bench_iir_filter_filter():
+    filter = IIR_Filter()
+    for i in range(0, model_calls):
+        filter.filter(i * 0.001)
+    return model_calls
+
+def make_sim_bench(module, time_step_s):
+    def bench_sim():
+        result = module.run(time_step_s=time_step_s, seed=0)
+        return len(result.timestamp) - 1
+    return bench_sim
+
+
+def all_benchmarks():
+    benchmarks = [
+        ("DC_Motor.rotate",             bench_dc_motor_rotate),
+        ("Accelerometer.get_accel",     bench_accelerometer_get_accel),
+        ("PID.process",                 bench_pid_process),
+        ("RA_Filter.filter[50]",        make_ra_filter_bench(50)),
+        ("RA_Filter.filter[500]",       make_ra_filter_bench(500)),
+        ("IIR_Filter.filter",           bench_iir_filter_filter),
+    ]
+    for module in (open_loop, inertial_navigation, inertial_navigation_filtered):
+        for time_step_s in sim_time_steps:
+            name = "{}.run[dt={}]".format(module.__name__.split(".")[-1], time_step_s)
+            benchmarks.append((name, make_sim_bench(module, time_step_s)))
+    return benchmarks
+
+
+# Best of repeats for throughput, then one more pass under tracemalloc for
+#   peak memory since tracing slows everything down
+def measure(function, repeats):
+    best = None
+    for i in range(0, repeats):
+        start   = time.perf_counter()
+        steps   = function()
+        elapsed = time.perf_counter() - start
+        if((best is None) or (steps / elapsed > best)):
+            best = steps / elapsed
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"steps_per_s" : best, "peak_bytes" : peak}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if(not os.path.exists(path)):
+        return []
+    with open(path) as history_file:
+        return json.load(history_file)
+
+
+# Best recorded throughput and smallest recorded peak memory for every benchmark.
+#   Comparing with the best rather than the latest run keeps a string of small
+#   slowdowns, each inside the tolerance, from adding up unnoticed
+def best_results(history):
+    baseline = {}
+    for entry in history:
+        for name, result in entry["results"].items():
+            if(name not in baseline):
+                baseline[name] = dict(result)
+                continue
+            baseline[name]["steps_per_s"]   = max(baseline[name]["steps_per_s"], result["steps_per_s"])
+            baseline[name]["peak_bytes"]    = min(baseline[name]["peak_bytes"], result["peak_bytes"])
+    return baseline
+
+
+# Benchmarks that got slower or bigger than the baseline allows
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        if(name not in baseline):
+            continue
+        previous = baseline[name]
+        if(result["steps_per_s"] < previous["steps_per_s"] * (1 - tolerance)):
+            regressions.append("{}: {:.0f} steps/s, best was {:.0f}".format(
+                name, result["steps_per_s"], previous["steps_per_s"]))
+        if(result["peak_bytes"] > previous["peak_bytes"] * (1 + tolerance)):
+            regressions.append("{}: {} peak bytes, best was {}".format(
+                name, result["peak_bytes"], previous["peak_bytes"]))
+    return regressions
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Benchmark the models and sims")
+    parser.add_argument("--history",    default="benchmark_history.json",  help="JSON history file to compare against and append to")
+    parser.add_argument("--tolerance",  type=float, default=0.1,        help="Allowed fractional regression, 0.1 is 10%%")
+    parser.add_argument("--repeats",    type=int,   default=3)
+    parser.add_argument("--filter",     default="",                     help="Only run benchmarks whose name contains this")
+    parser.add_argument("--no-record",  action="store_true",            help="Compare without appending to the history")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, function in all_benchmarks():
+        if(args.filter not in name):
+            continue
+        results[name] = measure(function, args.repeats)
+        print("{:<40} {:>14.0f} steps/s {:>12} peak bytes".format(
+            name, results[name]["steps_per_s"], results[name]["peak_bytes"]))
+
+    history     = load_history(args.history)
+    regressions = find_regressions(results, best_results(history), args.tolerance)
+
+    # A regressed run is never recorded so it can't become the new baseline
+    if(not args.no_record and not regressions):
+        history.append({
+            "time"      : time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision"  : git_revision(),
+            "python"    : platform.python_version(),
+            "results"   : results,
+        })
+        with open(args.history, "w") as history_file:
+            json.dump(history, history_file, indent=2)
+
+    if(regressions):
+        print("\nRegressions beyond {:.0%}:".format(args.tolerance))
+        for regression in regressions:
+            print("  " + regression)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
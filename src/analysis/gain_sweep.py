@@ -0,0 +1,212 @@
+###########################################################
+#
+#   FILENAME:       gain_sweep.py
+#
+#   DESCRIPTION:    Parallel PID gain sweep over the filtered
+#                     inertial navigation sim. Points are
+#                     farmed out to a process pool with a
+#                     fixed seed per point, results are
+#                     appended to a CSV table as they finish
+#                     and finished points are skipped when a
+#                     sweep is restarted. Points can be served
+#                     from a shared result cache
+#
+###########################################################
+
+import  argparse
+import  csv
+import  itertools
+import  multiprocessing
+import  os
+import  random
+import  sys
+import  time
+import  src.motor.inertial_navigation_filtered  as inertial_navigation_filtered
+import  src.sim.metrics                         as metrics
+from    src.sim.cache                           import Result_Cache, cached_run
+
+# Parameters a sweep point may set, in table column order
+parameter_names = [
+    "kp",
+    "ki",
+    "kd",
+    "controller_threshold",
+    "filter_length",
+]
+
+table_columns = ["index", "seed"] + parameter_names + metrics.metric_names
+
+
+# Every combination of the given values. Parameters left out keep the sim default
+def make_grid(**values):
+    names   = [name for name in parameter_names if name in values]
+    points  = []
+    for combination in itertools.product(*[values[name] for name in names]):
+        points.append(dict(zip(names, combination)))
+    return points
+
+
+# num_points uniform samples from (low, high) ranges. filter_length is drawn as an integer
+def make_random(num_points, seed = 0, **ranges):
+    rng     = random.Random(seed)
+    names   = [name for name in parameter_names if name in ranges]
+    points  = []
+    for i in range(0, num_points):
+        point = {}
+        for name in names:
+            low, high = ranges[name]
+            if(name == "filter_length"):
+                point[name] = rng.randint(int(low), int(high))
+            else:
+                point[name] = rng.uniform(low, high)
+        points.append(point)
+    return points
+
+
+# One Result_Cache per cache directory in each worker process
+worker_caches = {}
+
+# Worker side of the sweep, runs a single point headless. cache is a Result_Cache
+#   directory or None
+def run_point(task):
+    index, point, seed, cache = task
+
+    if(cache is None):
+        summary = metrics.summarize(inertial_navigation_filtered.run(seed=seed, **point))
+    else:
+        if(cache not in worker_caches):
+            worker_caches[cache] = Result_Cache(cache)
+        config  = dict(point, seed=seed)
+        summary = cached_run(worker_caches[cache], "inertial_navigation_filtered",
+                             inertial_navigation_filtered.run, config)
+
+    row = {"index" : index, "seed" : seed}
+    row.update(point)
+    row.update(summary)
+    return row
+
+
+# Whether a finished table row was run with this point and seed. Values go through
+#   the table as repr() strings, so floats compare exactly
+def row_matches(row, point, seed):
+    if(row["seed"] != str(seed)):
+        return False
+    for name in parameter_names:
+        if(name in point):
+            if((row[name] in (None, "")) or (float(row[name]) != float(point[name]))):
+                return False
+        elif(row[name] not in (None, "")):
+            return False
+    return True
+
+
+# Indices of points an existing output table already holds results for. The table is
+#   rewritten with just those rows, which drops a row cut short by a killed sweep and
+#   any rows left from a sweep over a different grid or seed
+def completed_indices(output_path, points, base_seed):
+    done = set()
+    if(not os.path.exists(output_path)):
+        return done
+
+    # Only lines that made it to disk with their newline are complete
+    with open(output_path, newline="") as table:
+        content = table.read()
+    content = content[:content.rfind("\n") + 1]
+
+    rows = []
+    for row in csv.DictReader(content.splitlines(keepends=True)):
+        if(row.get(table_columns[-1]) in (None, "")):
+            continue
+        index = int(row["index"])
+        if((index < len(points)) and (index not in done) and row_matches(row, points[index], base_seed + index)):
+            done.add(index)
+            rows.append(row)
+
+    temporary_path = output_path + ".tmp"
+    with open(temporary_path, "w", newline="") as table:
+        writer = csv.DictWriter(table, fieldnames=table_columns, restval="")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(temporary_path, output_path)
+
+    return done
+
+
+def sweep(points, output_path, processes = None, chunksize = None, base_seed = 0, progress_interval_s = 5, cache = None):
+    done    = completed_indices(output_path, points, base_seed)
+    tasks   = [(i, point, base_seed + i, cache) for i, point in enumerate(points) if i not in done]
+
+    if(processes is None):
+        processes = os.cpu_count()
+
+    # Big enough chunks to keep dispatch overhead down, small enough that
+    #   every worker still gets several of them
+    if(chunksize is None):
+        chunksize = max(1, min(64, len(tasks) // (processes * 8)))
+
+    print("{} points, {} already done, {} to run on {} processes".format(
+        len(points), len(done), len(tasks), processes), file=sys.stderr)
+
+    if(len(tasks) == 0):
+        return
+
+    write_header = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+    with open(output_path, "a", newline="") as table:
+        writer = csv.DictWriter(table, fieldnames=table_columns, restval="")
+        if(write_header):
+            writer.writeheader()
+
+        start           = time.monotonic()
+        last_report     = start
+        finished        = 0
+        with multiprocessing.Pool(processes) as pool:
+            for row in pool.imap_unordered(run_point, tasks, chunksize):
+                writer.writerow(row)
+                table.flush()
+                finished += 1
+
+                now = time.monotonic()
+                if((now - last_report >= progress_interval_s) or (finished == len(tasks))):
+                    # A fast resume can finish a point within one clock tick of start
+                    elapsed     = max(now - start, 1e-9)
+                    rate        = finished / elapsed
+                    remaining   = (len(tasks) - finished) / rate
+                    print("{}/{} points, {:.1f} points/s, {:.0f} s remaining".format(
+                        finished, len(tasks), rate, remaining), file=sys.stderr)
+                    last_report = now
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Sweep PID gains over the filtered inertial navigation sim")
+    parser.add_argument("output",                                               help="CSV table to write, resumed if it exists")
+    parser.add_argument("--kp",                     type=float, nargs="+")
+    parser.add_argument("--ki",                     type=float, nargs="+")
+    parser.add_argument("--kd",                     type=float, nargs="+")
+    parser.add_argument("--controller-threshold",   type=float, nargs="+")
+    parser.add_argument("--filter-length",          type=int,   nargs="+")
+    parser.add_argument("--random",                 type=int,   metavar="N",    help="Draw N random points, each option is then a LOW HIGH range")
+    parser.add_argument("--seed",                   type=int,   default=0,      help="Base seed, point i runs with seed + i")
+    parser.add_argument("--sample-seed",            type=int,   default=0,      help="Seed for the points --random draws")
+    parser.add_argument("--processes",              type=int)
+    parser.add_argument("--chunksize",              type=int)
+    parser.add_argument("--cache",                                  metavar="DIR",  help="Result cache directory shared by the workers")
+    args = parser.parse_args(argv)
+
+    values = {}
+    for name in parameter_names:
+        if(getattr(args, name) is not None):
+            values[name] = getattr(args, name)
+
+    if(args.random is None):
+        points = make_grid(**values)
+    else:
+        for name in values:
+            if(len(values[name]) != 2):
+                parser.error("--{} needs a LOW HIGH range with --random".format(name.replace("_", "-")))
+        points = make_random(args.random, args.sample_seed, **values)
+
+    sweep(points, args.output, args.processes, args.chunksize, args.seed, cache=args.cache)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,21 +7,25 @@
 #
 ###########################################################
 
-import random
+from src.models.noise import Gaussian_Noise
 
 class Accelerometer:
-    def __init__(self, sim_time_step):
+    # rng is a seed or NumPy Generator for the sensor noise, None for an unseeded stream
+    def __init__(self, sim_time_step, rng = None):
         self.dt             = sim_time_step
         self.last_velocity  = 0
         self.last_position  = 0
 
+        # Assume 100Hz bandwidth
+        self.noise          = Gaussian_Noise(0.049, rng)
+
     def get_accel(self, position):
         # Derive instantaneous acceleration
         velocity    = (position     - self.last_position) / self.dt
         accel       = (velocity     - self.last_velocity) / self.dt
 
-        # Add noise. Assume 100Hz bandwidth
-        accel       += random.gauss(0,0.049)
+        # Add noise
+        accel       += self.noise.sample()
 
         # Update last know values
         self.last_position  = position
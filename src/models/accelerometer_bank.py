@@ -0,0 +1,43 @@
+###########################################################
+#
+#   FILENAME:       accelerometer_bank.py
+#
+#   DESCRIPTION:    Vectorized Accelerometer. One sensor
+#                     channel per scenario, with the noise
+#                     drawn a block of steps at a time
+#
+###########################################################
+
+import  numpy                               as np
+import  src.models.noise                    as noise
+
+class Accelerometer_Bank:
+    # rng is a seed or NumPy Generator for the sensor noise, None for an unseeded stream.
+    #   Each step draws one value per channel, in blocks of noise_block_size steps
+    def __init__(self, sim_time_step, count, rng = None, noise_block_size = 1024):
+        self.dt             = sim_time_step
+        self.last_velocity  = np.zeros(count)
+        self.last_position  = np.zeros(count)
+
+        # Assume 100Hz bandwidth
+        self.noise          = noise.Gaussian_Noise_Bank(0.049, count, rng, noise_block_size)
+
+    def get_accel(self, position):
+        # Derive instantaneous acceleration
+        velocity    = (position     - self.last_position) / self.dt
+        accel       = (velocity     - self.last_velocity) / self.dt
+
+        # Add noise
+        accel       = accel + self.noise.sample()
+
+        # Update last know values
+        self.last_position  = position
+        self.last_velocity  = velocity
+
+        return accel
+
+    # Keep only the channels flagged in keep
+    def select(self, keep):
+        self.last_velocity  = self.last_velocity[keep]
+        self.last_position  = self.last_position[keep]
+        self.noise.select(keep)
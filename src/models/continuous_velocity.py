@@ -6,51 +6,65 @@
 #
 ###########################################################
 
-import random
-import src.models.wheel         as wheel
-import src.models.vehicle_mass  as vm
+import src.models.motor_catalog  as motor_catalog
+from   src.models.noise         import Gaussian_Noise
+from   src.models.vehicle_spec  import Vehicle_Spec
 
 class Continuous_Velocity:
 
-    def __init__(self, sim_time_step, max_rpm):
+    # Object Constructor: Requires simulation time step in seconds and maximum rpm for the servo
+    #   rng is a seed or NumPy Generator for the rpm noise, None for an unseeded stream
+    #   vehicle is a Vehicle_Spec, None for the one described by the wheel / vehicle_mass modules
+    #   motor is a Motor_Spec, None to look max_rpm up in the servo table. It takes
+    #   precedence over max_rpm
+    #   rpm_noise_std is the spread of the actual rpm around the ramped rpm
+    def __init__(self, sim_time_step, max_rpm, rng = None, vehicle = None, motor = None, rpm_noise_std = 1):
+        if(vehicle is None):
+            vehicle = Vehicle_Spec.from_globals()
+        if(motor is None):
+            motor   = motor_catalog.servo(max_rpm)
+
         self.cur_rpm                = 0
         self.sim_time_step          = sim_time_step
-        self.max_rpm                = max_rpm
-
-        # Figure out what the motor axle torque is. Assume similar torque drop
-        #   like the normal motor
-        if(self.max_rpm == 100):
-            self.stall_torque_Nm    = 2.10
-        elif(self.max_rpm == 160):
-            self.stall_torque_Nm    = 1.31
-        elif(self.max_rpm == 240):
-            self.stall_torque_Nm    = 0.88
-
-        # Using the stall torque and the mass, calculate the ramp limit
-        # Get the force from the stall torque. Assume ideal torque transfer
-        wheel_force     = (self.stall_torque_Nm * wheel.gear_ratio) / wheel.radius_meters
-
-        # Take into account each wheel
-        vehicle_force   = wheel_force * wheel.count
-
-        # Estimate acceleration
-        accel = vehicle_force / vm.mass_kg
+        self.vehicle                = vehicle
+        self.motor                  = motor
+        self.max_rpm                = motor.max_rpm
+        self.stall_torque_Nm        = motor.stall_torque_Nm
 
-        # Calculate the distance traveled in 1 second
-        traversed_m = 0.5 * accel
+        # Assume std dev of 1 rpm in guassian distribution
+        self.noise                  = Gaussian_Noise(rpm_noise_std, rng)
 
-        # Calculate number of rotations to get there
-        wheel_rotations = (traversed_m / wheel.circumference_meters)
-        motor_rotations = wheel_rotations * wheel.gear_ratio
-
-        # motor_rotations is the ramp limit in revolutions / second, convert to rpm
-        self.rpm_ramp_limit = motor_rotations * 60
+        # Ramp limit only depends on the vehicle and motor, so it is worked out
+        #   once per pair of specs
+        self.rpm_ramp_limit         = motor_catalog.rpm_ramp_limit(vehicle, motor)
 
     # Returns the distance the robot as traveled in this time step
     def rotate(self, commanded_rpm):
 
+        # The servo can't be asked for more than its rated speed
+        if(commanded_rpm > self.max_rpm):
+            commanded_rpm = self.max_rpm
+        elif(commanded_rpm < (-1 * self.max_rpm)):
+            commanded_rpm = -1 * self.max_rpm
+
         # Ramp velocity
         delta_rpm   = commanded_rpm - self.cur_rpm
+        if(delta_rpm > self.rpm_ramp_limit):
+            delta_rpm = self.rpm_ramp_limit
+        elif(delta_rpm < (-1 * self.rpm_ramp_limit)):
+            delta_rpm = -1 * self.rpm_ramp_limit
+
+        self.cur_rpm += delta_rpm
+
+        # Simulate some extra noise in the actual rpm. Unlike the DC motor model
+        #   the servo's noise does reach the distance traveled
+        step_rpm    = self.cur_rpm + self.noise.sample()
 
+        # Calculate wheel rotation amount
+        wheel_rpm   = step_rpm / self.vehicle.gear_ratio
+        wheel_rps   = wheel_rpm / 60
+        rotatations = wheel_rps * self.sim_time_step
 
-        
\ No newline at end of file
+        # Calculate distance traveled
+        traversed   = rotatations * self.vehicle.circumference_meters
+        return traversed
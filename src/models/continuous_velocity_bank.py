@@ -0,0 +1,95 @@
+###########################################################
+#
+#   FILENAME:       continuous_velocity_bank.py
+#
+#   DESCRIPTION:    Vectorized Continuous_Velocity. Holds the
+#                     rpm of N servos as an array and applies
+#                     the command clamp and ramp limit with
+#                     NumPy operations. The N entries can be
+#                     the wheels of one robot or N independent
+#                     scenarios
+#
+###########################################################
+
+import  numpy                               as np
+import  src.models.continuous_velocity      as continuous_velocity
+import  src.models.noise                    as noise
+from    src.models.vehicle_spec             import Vehicle_Spec
+
+class Continuous_Velocity_Bank:
+
+    # Object Constructor: Requires simulation time step in seconds, maximum rpm and the number
+    #   of servos. max_rpm can be a scalar or one value per servo
+    #   rng is a seed or NumPy Generator for the rpm noise, None for an unseeded stream.
+    #   Each step draws one value per servo, in blocks of noise_block_size steps
+    #   vehicle is a Vehicle_Spec, None for the one described by the wheel / vehicle_mass modules
+    def __init__(self, sim_time_step, max_rpm, count, rng = None, vehicle = None, rpm_noise_std = 1, noise_block_size = 1024):
+        if(vehicle is None):
+            vehicle = Vehicle_Spec.from_globals()
+
+        self.sim_time_step      = sim_time_step
+        self.vehicle            = vehicle
+        self.count              = count
+        self.cur_rpm            = np.zeros(count)
+        self.max_rpm            = np.broadcast_to(np.asarray(max_rpm, dtype=np.float64), (count,)).copy()
+
+        self.noise              = noise.Gaussian_Noise_Bank(rpm_noise_std, count, rng, noise_block_size)
+
+        # The ramp limit only depends on the servo type, so work it out once per
+        #   distinct max rpm with the scalar model
+        self.rpm_ramp_limit = np.empty(count)
+        for rpm in np.unique(self.max_rpm):
+            ramp_limit = continuous_velocity.Continuous_Velocity(sim_time_step, rpm, 0, vehicle).rpm_ramp_limit
+            self.rpm_ramp_limit[self.max_rpm == rpm] = ramp_limit
+
+    # Returns the distance each servo has moved its robot in this time step.
+    #   commanded_rpm is a scalar or one command per servo
+    def rotate(self, commanded_rpm):
+        commanded_rpm   = np.clip(commanded_rpm, -1 * self.max_rpm, self.max_rpm)
+        delta_rpm       = np.clip(commanded_rpm - self.cur_rpm, -1 * self.rpm_ramp_limit, self.rpm_ramp_limit)
+        self.cur_rpm    = self.cur_rpm + delta_rpm
+
+        # Simulate some extra noise in the actual rpm
+        step_rpm        = self.cur_rpm + self.noise.sample()
+
+        # Calculate wheel rotation amount
+        wheel_rpm   = step_rpm / self.vehicle.gear_ratio
+        wheel_rps   = wheel_rpm / 60
+        rotatations = wheel_rps * self.sim_time_step
+
+        # Calculate distance traveled
+        traversed   = rotatations * self.vehicle.circumference_meters
+        return traversed
+
+    # Control effort to an rpm command per servo. The effort is taken as a fraction of
+    #   full speed, with a deadband of controller_threshold around zero. Returns the
+    #   effort after the deadband and the rpm command
+    def rpm_from_effort(self, effort, controller_threshold):
+        effort = np.where(np.abs(effort) < controller_threshold, 0, effort)
+        return effort, np.clip(effort, -1, 1) * self.max_rpm
+
+    # Keep only the servos flagged in keep
+    def select(self, keep):
+        self.cur_rpm        = self.cur_rpm[keep]
+        self.max_rpm        = self.max_rpm[keep]
+        self.rpm_ramp_limit = self.rpm_ramp_limit[keep]
+        self.noise.select(keep)
+        self.count          = len(self.cur_rpm)
+
+
+if __name__ == '__main__':
+    # Without noise every servo in the bank has to track its own scalar model exactly
+    rng         = np.random.default_rng(0)
+    count       = 64
+    max_rpm     = rng.choice([100, 160, 240], count)
+    bank        = Continuous_Velocity_Bank(0.01, max_rpm, count, rpm_noise_std=0)
+    servos      = [continuous_velocity.Continuous_Velocity(0.01, rpm, 0, rpm_noise_std=0) for rpm in max_rpm]
+
+    for step in range(0, 2000):
+        commands    = rng.uniform(-300, 300, count)
+        traversed   = bank.rotate(commands)
+        expected    = [servo.rotate(command) for servo, command in zip(servos, commands)]
+        assert np.array_equal(traversed, expected)
+        assert np.array_equal(bank.cur_rpm, [servo.cur_rpm for servo in servos])
+
+    print("Parity OK")
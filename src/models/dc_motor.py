@@ -9,9 +9,9 @@
 #
 ###########################################################
 
-import random
-import src.models.wheel as wheel
-import src.models.vehicle_mass  as vm
+import src.models.motor_catalog  as motor_catalog
+from   src.models.noise         import Gaussian_Noise
+from   src.models.vehicle_spec  import Vehicle_Spec
 
 class DC_Motor:
 
@@ -22,38 +22,29 @@ class DC_Motor:
     }
 
     # Object Constructor: Requires simulation time step in seconds and maximum rpm for the motor
-    def __init__(self, sim_time_step, max_rpm):
+    #   rng is a seed or NumPy Generator for the rpm noise, None for an unseeded stream
+    #   vehicle is a Vehicle_Spec, None for the one described by the wheel / vehicle_mass modules
+    #   motor is a Motor_Spec, None to look max_rpm up in the DC motor table. It takes
+    #   precedence over max_rpm
+    def __init__(self, sim_time_step, max_rpm, rng = None, vehicle = None, motor = None):
+        if(vehicle is None):
+            vehicle = Vehicle_Spec.from_globals()
+        if(motor is None):
+            motor   = motor_catalog.dc_motor(max_rpm)
+
         self.cur_rpm                = 0
         self.sim_time_step          = sim_time_step
-        self.max_rpm                = max_rpm
-
-        # Figure out what the motor axle torque is
-        if(self.max_rpm == 120):
-            self.stall_torque_Nm    = 1.67
-        elif(self.max_rpm == 160):
-            self.stall_torque_Nm    = 1.04
-        elif(self.max_rpm == 240):
-            self.stall_torque_Nm    = 0.7
-
-        # Using the stall torque and the mass, calculate the ramp limit
-        # Get the force from the stall torque. Assume ideal torque transfer
-        wheel_force     = (self.stall_torque_Nm * wheel.gear_ratio) / wheel.radius_meters
-
-        # Take into account each wheel
-        vehicle_force   = wheel_force * wheel.count
-
-        # Estimate acceleration
-        accel = vehicle_force / vm.mass_kg
-
-        # Calculate the distance traveled in 1 second
-        traversed_m = 0.5 * accel
+        self.vehicle                = vehicle
+        self.motor                  = motor
+        self.max_rpm                = motor.max_rpm
+        self.stall_torque_Nm        = motor.stall_torque_Nm
 
-        # Calculate number of rotations to get there
-        wheel_rotations = (traversed_m / wheel.circumference_meters)
-        motor_rotations = wheel_rotations * wheel.gear_ratio
+        # Assume std dev of 1 rpm in guassian distribution
+        self.noise                  = Gaussian_Noise(1, rng)
 
-        # motor_rotations is the ramp limit in revolutions / second, convert to rpm
-        self.rpm_ramp_limit = motor_rotations * 60
+        # Ramp limit only depends on the vehicle and motor, so it is worked out
+        #   once per pair of specs
+        self.rpm_ramp_limit         = motor_catalog.rpm_ramp_limit(vehicle, motor)
 
     # Returns the distance the robot has traveled in this time step
     def rotate(self, direction):
@@ -107,14 +98,14 @@ class DC_Motor:
                 if self.cur_rpm < ( -1 * self.max_rpm):
                     self.cur_rpm = ( -1 * self.max_rpm)
 
-        # Simulate some extra noise in the actual rpm. Assume std dev of 1 rpm in guassian distribution
-        step_rpm    = self.cur_rpm + random.gauss(0,1)
+        # Simulate some extra noise in the actual rpm
+        step_rpm    = self.cur_rpm + self.noise.sample()
 
         # Calculate wheel rotation amount
-        wheel_rpm   = self.cur_rpm / wheel.gear_ratio
+        wheel_rpm   = self.cur_rpm / self.vehicle.gear_ratio
         wheel_rps   = wheel_rpm / 60
         rotatations = wheel_rps * self.sim_time_step
 
         # Calculate distance traveled
-        traversed   = rotatations * wheel.circumference_meters
+        traversed   = rotatations * self.vehicle.circumference_meters
         return traversed
@@ -0,0 +1,113 @@
+###########################################################
+#
+#   FILENAME:       dc_motor_bank.py
+#
+#   DESCRIPTION:    Vectorized DC_Motor. Holds the rpm of N
+#                     motors as an array and applies the
+#                     forwards / backwards / sustain ramp
+#                     logic with masked NumPy operations.
+#                     The N entries can be the wheels of one
+#                     robot or N independent scenarios
+#
+###########################################################
+
+import  numpy                   as np
+import  src.models.dc_motor     as dc_motor
+from    src.models.vehicle_spec import Vehicle_Spec
+
+class DC_Motor_Bank:
+
+    motor_directions = dc_motor.DC_Motor.motor_directions
+
+    # Object Constructor: Requires simulation time step in seconds, maximum rpm and the number
+    #   of motors. max_rpm and driven_wheels can be scalars or one value per motor.
+    #   driven_wheels is how many wheels push the vehicle mass the motor moves, the scalar
+    #   DC_Motor always assumes every wheel on the robot
+    #   vehicle is a Vehicle_Spec, None for the one described by the wheel / vehicle_mass modules
+    def __init__(self, sim_time_step, max_rpm, count, driven_wheels = None, vehicle = None):
+        if(vehicle is None):
+            vehicle = Vehicle_Spec.from_globals()
+
+        self.sim_time_step  = sim_time_step
+        self.vehicle        = vehicle
+        self.count          = count
+        self.cur_rpm        = np.zeros(count)
+        self.max_rpm        = np.broadcast_to(np.asarray(max_rpm, dtype=np.float64), (count,)).copy()
+
+        if(driven_wheels is None):
+            driven_wheels = vehicle.wheel_count
+
+        # The ramp limit only depends on the motor type, so work it out once per
+        #   distinct max rpm with the scalar model and scale by the driven wheels
+        self.rpm_ramp_limit = np.empty(count)
+        for rpm in np.unique(self.max_rpm):
+            ramp_limit = dc_motor.DC_Motor(sim_time_step, rpm, 0, vehicle).rpm_ramp_limit
+            self.rpm_ramp_limit[self.max_rpm == rpm] = ramp_limit
+        self.rpm_ramp_limit *= np.broadcast_to(driven_wheels, (count,)) / vehicle.wheel_count
+
+    # Returns the distance each motor has moved its robot in this time step. direction
+    #   is a scalar or one of motor_directions per motor
+    def rotate(self, direction):
+        direction   = np.broadcast_to(direction, (self.count,))
+        forwards    = direction == DC_Motor_Bank.motor_directions["Forwards"]
+        backwards   = direction == DC_Motor_Bank.motor_directions["Backwards"]
+        sustain     = direction == DC_Motor_Bank.motor_directions["Sustain"]
+
+        if(not np.all(forwards | backwards | sustain)):
+            raise ValueError("Invalid Motor Direction")
+
+        # Sustaining motors spin down towards zero and stop outright once they
+        #   are within one ramp step of it
+        forwards    = forwards  | (sustain & (self.cur_rpm < (-1 * self.rpm_ramp_limit)))
+        backwards   = backwards | (sustain & (self.cur_rpm > self.rpm_ramp_limit))
+        stopped     = sustain & ~(forwards | backwards)
+
+        cur_rpm             = np.where(forwards,  np.minimum(self.cur_rpm + self.rpm_ramp_limit, self.max_rpm),         self.cur_rpm)
+        cur_rpm             = np.where(backwards, np.maximum(cur_rpm      - self.rpm_ramp_limit, -1 * self.max_rpm),    cur_rpm)
+        cur_rpm[stopped]    = 0
+        self.cur_rpm        = cur_rpm
+
+        # The scalar model's per step rpm noise never reaches the traversed
+        #   distance, so it isn't drawn here
+
+        # Calculate wheel rotation amount
+        wheel_rpm   = self.cur_rpm / self.vehicle.gear_ratio
+        wheel_rps   = wheel_rpm / 60
+        rotatations = wheel_rps * self.sim_time_step
+
+        # Calculate distance traveled
+        traversed   = rotatations * self.vehicle.circumference_meters
+        return traversed
+
+    # Direction for each motor from the sign of a control effort, the way the
+    #   sims pick one for the scalar motor
+    @staticmethod
+    def directions_from_effort(effort):
+        return np.where(effort > 0, DC_Motor_Bank.motor_directions["Forwards"],
+               np.where(effort < 0, DC_Motor_Bank.motor_directions["Backwards"],
+                                    DC_Motor_Bank.motor_directions["Sustain"]))
+
+    # Keep only the motors flagged in keep
+    def select(self, keep):
+        self.cur_rpm        = self.cur_rpm[keep]
+        self.max_rpm        = self.max_rpm[keep]
+        self.rpm_ramp_limit = self.rpm_ramp_limit[keep]
+        self.count          = len(self.cur_rpm)
+
+
+if __name__ == '__main__':
+    # Every motor in the bank has to track its own scalar DC_Motor exactly
+    rng         = np.random.default_rng(0)
+    count       = 64
+    max_rpm     = rng.choice([120, 160, 240], count)
+    bank        = DC_Motor_Bank(0.01, max_rpm, count)
+    motors      = [dc_motor.DC_Motor(0.01, rpm, 0) for rpm in max_rpm]
+
+    for step in range(0, 2000):
+        directions  = rng.integers(1, 4, count)
+        traversed   = bank.rotate(directions)
+        expected    = [motor.rotate(direction) for motor, direction in zip(motors, directions)]
+        assert np.array_equal(traversed, expected)
+        assert np.array_equal(bank.cur_rpm, [motor.cur_rpm for motor in motors])
+
+    print("Parity OK")
@@ -0,0 +1,102 @@
+###########################################################
+#
+#   FILENAME:       differential_drive.py
+#
+#   DESCRIPTION:    Planar differential drive kinematics.
+#                     Takes the distance the left and right
+#                     wheels traveled in a step, the way the
+#                     motor models' rotate() reports it, and
+#                     moves the (x, y, heading) pose along the
+#                     exact arc. The pose can be floats or
+#                     NumPy arrays, one entry per robot or
+#                     scenario, stored as separate arrays
+#
+###########################################################
+
+import  numpy                   as np
+from    src.models.vehicle_spec import Vehicle_Spec
+
+class Differential_Drive:
+    # vehicle is a Vehicle_Spec, None for the one described by the wheel / vehicle_mass
+    #   modules. Its track width is used unless track_width_meters is given, which can
+    #   be one value per robot
+    # x, y in meters and heading in radians from the x axis, counter clockwise. The
+    #   heading isn't wrapped, so it also counts whole turns
+    def __init__(self, vehicle = None, x = 0.0, y = 0.0, heading = 0.0, track_width_meters = None):
+        if(vehicle is None):
+            vehicle = Vehicle_Spec.from_globals()
+        if(track_width_meters is None):
+            track_width_meters = vehicle.track_width_meters
+
+        self.vehicle            = vehicle
+        self.track_width_meters = track_width_meters
+        self.x                  = x
+        self.y                  = y
+        self.heading            = heading
+
+    # Pose arrays for count robots starting at the origin facing along x
+    @classmethod
+    def batch(cls, count, vehicle = None, track_width_meters = None):
+        return cls(vehicle, np.zeros(count), np.zeros(count), np.zeros(count), track_width_meters)
+
+    # Advance by the distance each side's wheels traveled this step. Returns the new pose
+    def move(self, left_distance, right_distance):
+        distance        = (left_distance + right_distance) / 2
+        turn            = (right_distance - left_distance) / self.track_width_meters
+
+        # Exact for a constant curvature arc: the chord runs along the mid step
+        #   heading and is sin(turn / 2) / (turn / 2) of the arc length. np.sinc
+        #   is sin(pi x) / (pi x) and goes smoothly to 1 for straight steps
+        half_turn       = turn / 2
+        chord           = distance * np.sinc(half_turn / np.pi)
+        mid_heading     = self.heading + half_turn
+
+        self.x          = self.x + (chord * np.cos(mid_heading))
+        self.y          = self.y + (chord * np.sin(mid_heading))
+        self.heading    = self.heading + turn
+
+        return self.x, self.y, self.heading
+
+    # Keep only the robots flagged in keep
+    def select(self, keep):
+        self.x          = self.x[keep]
+        self.y          = self.y[keep]
+        self.heading    = self.heading[keep]
+        if(getattr(self.track_width_meters, "ndim", 0)):
+            self.track_width_meters = self.track_width_meters[keep]
+
+
+if __name__ == '__main__':
+    # Equal and opposite wheel travel around a full circle has to come back to the start
+    drive   = Differential_Drive(track_width_meters=0.2)
+    radius  = 0.5
+    steps   = 7
+    for i in range(0, steps):
+        drive.move((radius - 0.1) * 2 * np.pi / steps, (radius + 0.1) * 2 * np.pi / steps)
+    print("Circle closure error: {:.2e} m".format(np.hypot(drive.x, drive.y)))
+    assert np.hypot(drive.x, drive.y) < 1e-12
+    assert abs(drive.heading - 2 * np.pi) < 1e-12
+
+    # One big step has to land where many tiny ones do
+    coarse  = Differential_Drive(track_width_meters=0.2)
+    fine    = Differential_Drive(track_width_meters=0.2)
+    coarse.move(0.3, 0.7)
+    for i in range(0, 100000):
+        fine.move(0.3 / 100000, 0.7 / 100000)
+    print("Coarse vs fine step error: {:.2e} m".format(np.hypot(coarse.x - fine.x, coarse.y - fine.y)))
+    assert np.hypot(coarse.x - fine.x, coarse.y - fine.y) < 1e-9
+
+    # The batched form has to match each robot stepped on its own
+    rng     = np.random.default_rng(0)
+    count   = 32
+    batch   = Differential_Drive.batch(count)
+    robots  = [Differential_Drive() for i in range(0, count)]
+    for step in range(0, 500):
+        left    = rng.uniform(-0.01, 0.02, count)
+        right   = rng.uniform(-0.01, 0.02, count)
+        batch.move(left, right)
+        for robot, l, r in zip(robots, left, right):
+            robot.move(l, r)
+    assert np.array_equal(batch.x, [robot.x for robot in robots])
+    assert np.array_equal(batch.heading, [robot.heading for robot in robots])
+    print("Batch parity OK")
@@ -0,0 +1,178 @@
+###########################################################
+#
+#   FILENAME:       iir_filter_bank.py
+#
+#   DESCRIPTION:    General Infinite Impulse Response Filter
+#                     Cascade of arbitrary order sections in
+#                     direct form I. Samples can be floats or
+#                     NumPy arrays of independent channels,
+#                     and whole signals can be filtered at
+#                     once with filter_block
+#
+###########################################################
+
+try:
+    import scipy.signal as scipy_signal
+except ImportError:
+    scipy_signal = None
+
+
+class IIR_Section:
+    def __init__(self, b, a):
+        # Normalize so the leading feedback coefficient is 1. Skipped when it
+        #   already is so the coefficients stay bit for bit what was given
+        if(a[0] != 1):
+            b = [coeff / a[0] for coeff in b]
+            a = [coeff / a[0] for coeff in a]
+
+        self.b          = list(b)
+        self.a          = list(a)
+
+        # Past inputs and outputs, newest first
+        self.x_history  = [0] * (len(self.b) - 1)
+        self.y_history  = [0] * (len(self.a) - 1)
+
+    def filter(self, value):
+        output = self.b[0] * value
+        for i in range(1, len(self.b)):
+            output = output + (self.b[i] * self.x_history[i - 1])
+        for i in range(1, len(self.a)):
+            output = output - (self.a[i] * self.y_history[i - 1])
+
+        if(self.x_history):
+            self.x_history = [value]  + self.x_history[:-1]
+        if(self.y_history):
+            self.y_history = [output] + self.y_history[:-1]
+
+        return output
+
+    def filter_block(self, signal):
+        import numpy as np
+
+        if(scipy_signal is None):
+            output = np.empty_like(signal)
+            for i in range(0, len(signal)):
+                output[i] = self.filter(signal[i])
+            return output
+
+        # Work on (samples, channels) and convert the direct form I history into
+        #   lfilter's initial conditions, one channel at a time
+        flat_signal     = signal.reshape(len(signal), -1)
+        x_history       = IIR_Section.history_array(self.x_history, flat_signal.shape[1])
+        y_history       = IIR_Section.history_array(self.y_history, flat_signal.shape[1])
+
+        state_length    = max(len(self.a), len(self.b)) - 1
+        zi              = np.zeros((state_length, flat_signal.shape[1]))
+        for channel in range(0, flat_signal.shape[1]):
+            zi[:, channel] = scipy_signal.lfiltic(self.b, self.a, y_history[:, channel], x_history[:, channel])
+
+        if(state_length == 0):
+            output      = scipy_signal.lfilter(self.b, self.a, flat_signal, axis=0)
+        else:
+            output, zi  = scipy_signal.lfilter(self.b, self.a, flat_signal, axis=0, zi=zi)
+        output          = output.reshape(signal.shape)
+
+        self.x_history  = IIR_Section.tail_history(signal, self.x_history)
+        self.y_history  = IIR_Section.tail_history(output, self.y_history)
+
+        return output
+
+    # Newest first history after a block, topped up from the old history when
+    #   the block is shorter than the filter order
+    @staticmethod
+    def tail_history(samples, history):
+        length  = len(history)
+        newest  = [samples[len(samples) - 1 - i] for i in range(0, min(length, len(samples)))]
+        return newest + history[:length - len(newest)]
+
+    # History list as a (length, channels) array, scalars broadcast across channels
+    @staticmethod
+    def history_array(history, channels):
+        import numpy as np
+
+        array = np.zeros((len(history), channels))
+        for i in range(0, len(history)):
+            array[i] = np.reshape(history[i], -1)
+        return array
+
+    def reset(self):
+        self.x_history  = [0] * len(self.x_history)
+        self.y_history  = [0] * len(self.y_history)
+
+
+class IIR_Filter_Bank:
+    # sections is a list of (b, a) coefficient pairs applied in order. Inputs
+    #   are divided by input_gain before the first section
+    def __init__(self, sections, input_gain = 1):
+        self.sections   = [IIR_Section(b, a) for b, a in sections]
+        self.input_gain = input_gain
+
+    # Single section of arbitrary order
+    @classmethod
+    def from_coefficients(cls, b, a, input_gain = 1):
+        return cls([(b, a)], input_gain)
+
+    # Cascaded second order sections, rows of [b0, b1, b2, a0, a1, a2]
+    @classmethod
+    def from_sos(cls, sos):
+        return cls([(list(row[0:3]), list(row[3:6])) for row in sos])
+
+    # Same response as the first order IIR_Filter, sample for sample
+    @classmethod
+    def from_iir_filter(cls, iir_filter):
+        return cls.from_coefficients([1, 1], [1, -1 * iir_filter.back_coeff], iir_filter.input_gain)
+
+    def filter(self, value):
+        value = value / self.input_gain
+        for section in self.sections:
+            value = section.filter(value)
+        return value
+
+    # Filter a whole signal at once. signal is shape (samples,) or
+    #   (samples, channels) and the state carries over to later calls
+    def filter_block(self, signal):
+        import numpy as np
+
+        signal = np.asarray(signal, dtype=np.float64) / self.input_gain
+        for section in self.sections:
+            signal = section.filter_block(signal)
+        return signal
+
+    def reset(self):
+        for section in self.sections:
+            section.reset()
+
+
+if __name__ == '__main__':
+    import numpy as np
+    from src.models.iir_filter import IIR_Filter
+
+    rng         = np.random.default_rng(0)
+    signal      = rng.normal(0, 0.049, 5000)
+
+    # Per sample path has to match the original first order filter exactly
+    reference   = IIR_Filter()
+    bank        = IIR_Filter_Bank.from_iir_filter(reference)
+    expected    = np.array([reference.filter(value) for value in signal])
+    actual      = np.array([bank.filter(value) for value in signal])
+    assert np.array_equal(expected, actual)
+
+    # Block path, split across calls and mixed with per sample calls
+    bank        = IIR_Filter_Bank.from_iir_filter(IIR_Filter())
+    blocks      = np.concatenate((
+        bank.filter_block(signal[:1000]),
+        [bank.filter(value) for value in signal[1000:1001]],
+        bank.filter_block(signal[1001:]),
+    ))
+    print("Block worst absolute error:   {:.3e}".format(np.max(np.abs(blocks - expected))))
+    assert np.allclose(blocks, expected, rtol=1e-9, atol=1e-12)
+
+    # Independent channels through a cascade of second order sections
+    sos         = [[0.2, 0.4, 0.2, 1, -0.5, 0.3], [1, 2, 1, 1, -0.3, 0.1]]
+    signals     = rng.normal(0, 1, (2000, 8))
+    bank        = IIR_Filter_Bank.from_sos(sos)
+    block       = bank.filter_block(signals)
+    bank.reset()
+    stepped     = np.array([bank.filter(row) for row in signals])
+    print("Channel worst absolute error: {:.3e}".format(np.max(np.abs(block - stepped))))
+    assert np.allclose(block, stepped, rtol=1e-9, atol=1e-12)
@@ -0,0 +1,144 @@
+###########################################################
+#
+#   FILENAME:       kalman_filter.py
+#
+#   DESCRIPTION:    Linear Kalman filter over position and
+#                     velocity. Accelerometer readings drive
+#                     the prediction and wheel odometry
+#                     positions correct it. The state can be
+#                     floats or NumPy arrays of N scenarios,
+#                     the covariance doesn't depend on the
+#                     data so one copy serves every scenario
+#
+###########################################################
+
+class Kalman_Filter:
+    # Object Constructor: Requires simulation time step in seconds
+    #   accel_std       Accelerometer noise, drives the process noise
+    #   odometry_std    Odometry reading noise
+    #   steady_state    Use the precomputed steady state gain instead of
+    #                     propagating the covariance every step
+    #   initial_position, initial_velocity can be arrays for a batch of scenarios
+    def __init__(self, sim_time_step, accel_std = 0.049, odometry_std = 0.002, steady_state = False,
+                 initial_position = 0, initial_velocity = 0, initial_variance = 0):
+        self.dt             = sim_time_step
+        self.position       = initial_position
+        self.velocity       = initial_velocity
+        self.steady_state   = steady_state
+
+        # Discrete white noise acceleration model, Q = accel_var * G * G' with G = [dt^2 / 2, dt]
+        accel_var           = accel_std ** 2
+        self.q00            = accel_var * (sim_time_step ** 4) / 4
+        self.q01            = accel_var * (sim_time_step ** 3) / 2
+        self.q11            = accel_var * (sim_time_step ** 2)
+        self.r              = odometry_std ** 2
+
+        # Covariance, stored as its three distinct terms
+        self.p00            = initial_variance
+        self.p01            = 0
+        self.p11            = initial_variance
+
+        # Gains of the last update
+        self.k0             = 0
+        self.k1             = 0
+
+        if(steady_state):
+            self.k0, self.k1, self.p00, self.p01, self.p11 = self.steady_state_gain()
+
+    # Iterate the covariance to convergence. Returns the position and velocity gains
+    #   and the covariance after an update
+    def steady_state_gain(self, tolerance = 1e-12, max_iterations = 1000000):
+        p00, p01, p11   = self.p00, self.p01, self.p11
+        k0, k1          = 0, 0
+        for i in range(0, max_iterations):
+            p00, p01, p11           = self.predict_covariance(p00, p01, p11)
+            last_k0, last_k1        = k0, k1
+            k0, k1, p00, p01, p11   = self.update_covariance(p00, p01, p11)
+            if((abs(k0 - last_k0) < tolerance) and (abs(k1 - last_k1) < tolerance)):
+                break
+        return k0, k1, p00, p01, p11
+
+    # P = F P F' + Q with F = [[1, dt], [0, 1]]
+    def predict_covariance(self, p00, p01, p11):
+        dt = self.dt
+        return (p00 + (2 * dt * p01) + (dt * dt * p11) + self.q00,
+                p01 + (dt * p11) + self.q01,
+                p11 + self.q11)
+
+    # Gain for a position measurement and the covariance after applying it
+    def update_covariance(self, p00, p01, p11):
+        innovation_var  = p00 + self.r
+        k0              = p00 / innovation_var
+        k1              = p01 / innovation_var
+        return (k0, k1,
+                (1 - k0) * p00,
+                (1 - k0) * p01,
+                p11 - (k1 * p01))
+
+    # Propagate the state with the measured acceleration
+    def predict(self, accel):
+        self.position   = self.position + (self.velocity * self.dt) + (0.5 * accel * self.dt * self.dt)
+        self.velocity   = self.velocity + (accel * self.dt)
+
+        if(not self.steady_state):
+            self.p00, self.p01, self.p11 = self.predict_covariance(self.p00, self.p01, self.p11)
+
+    # Correct the state with an odometry position
+    def update(self, odometry_position):
+        if(not self.steady_state):
+            self.k0, self.k1, self.p00, self.p01, self.p11 = self.update_covariance(self.p00, self.p01, self.p11)
+
+        innovation      = odometry_position - self.position
+        self.position   = self.position + (self.k0 * innovation)
+        self.velocity   = self.velocity + (self.k1 * innovation)
+
+    # One step of the filter. Odometry can be None on steps without a reading.
+    #   Returns the position estimate
+    def estimate(self, accel, odometry_position = None):
+        self.predict(accel)
+        if(odometry_position is not None):
+            self.update(odometry_position)
+        return self.position
+
+    # Keep only the scenarios flagged in keep
+    def select(self, keep):
+        if(getattr(self.position, "ndim", 0)):
+            self.position = self.position[keep]
+        if(getattr(self.velocity, "ndim", 0)):
+            self.velocity = self.velocity[keep]
+
+
+if __name__ == '__main__':
+    import numpy as np
+
+    # A constant acceleration run with noisy sensors, the estimate has to beat
+    #   both raw double integration and the raw odometry
+    dt          = 0.01
+    steps       = 2000
+    rng         = np.random.default_rng(0)
+    time        = np.arange(1, steps + 1) * dt
+    true_accel  = 0.2 * np.sin(time)
+    true_vel    = np.cumsum(true_accel * dt)
+    true_pos    = np.cumsum(true_vel * dt)
+    accel       = true_accel + rng.normal(0, 0.049, steps)
+    odometry    = true_pos   + rng.normal(0, 0.002, steps)
+
+    for steady_state in (False, True):
+        kf          = Kalman_Filter(dt, steady_state=steady_state)
+        estimate    = np.array([kf.estimate(accel[i], odometry[i]) for i in range(0, steps)])
+        print("steady_state={!s:<5} rms error {:.2e} m (odometry {:.2e} m)".format(
+            steady_state, np.sqrt(np.mean((estimate - true_pos) ** 2)), np.sqrt(np.mean((odometry - true_pos) ** 2))))
+        assert np.sqrt(np.mean((estimate - true_pos) ** 2)) < np.sqrt(np.mean((odometry - true_pos) ** 2))
+
+    # The batched form has to track every scenario exactly like its own scalar filter
+    count       = 16
+    accel       = true_accel[:, None] + rng.normal(0, 0.049, (steps, count))
+    odometry    = true_pos[:, None]   + rng.normal(0, 0.002, (steps, count))
+    batch       = Kalman_Filter(dt, initial_position=np.zeros(count), initial_velocity=np.zeros(count))
+    scalars     = [Kalman_Filter(dt) for i in range(0, count)]
+    for i in range(0, steps):
+        batched = batch.estimate(accel[i], odometry[i])
+        single  = [kf.estimate(accel[i, n], odometry[i, n]) for n, kf in enumerate(scalars)]
+        assert np.array_equal(batched, single)
+
+    print("Batch parity OK")
@@ -0,0 +1,104 @@
+###########################################################
+#
+#   FILENAME:       motor_catalog.py
+#
+#   DESCRIPTION:    Motor specs and the torque-speed tables
+#                     they are built from. Stall torque for
+#                     any rated speed is interpolated from
+#                     the table, and the ramp limit a motor
+#                     gives a vehicle is cached per spec pair
+#
+###########################################################
+
+import  functools
+from    src.models.spec         import Spec
+
+class Motor_Spec(Spec):
+    fields      = ("name", "max_rpm", "stall_torque_Nm")
+    __slots__   = fields
+
+    #   max_rpm             No load speed at the output shaft
+    #   stall_torque_Nm     Output shaft torque at zero speed
+    def __init__(self, name, max_rpm, stall_torque_Nm):
+        object.__setattr__(self, "name",            name)
+        object.__setattr__(self, "max_rpm",         max_rpm)
+        object.__setattr__(self, "stall_torque_Nm", stall_torque_Nm)
+
+    # Torque available at a given speed, assuming the usual linear DC motor curve
+    def torque_at(self, rpm):
+        return self.stall_torque_Nm * max(0.0, 1 - (abs(rpm) / self.max_rpm))
+
+
+# (no load rpm, stall torque Nm) for each gearing of the same motor family
+dc_motor_table = [
+    (120,   1.67),
+    (160,   1.04),
+    (240,   0.7),
+]
+
+# Continuous rotation servos. Assume similar torque drop like the normal motor
+servo_table = [
+    (100,   2.10),
+    (160,   1.31),
+    (240,   0.88),
+]
+
+
+# Stall torque for max_rpm. Exact at the table entries, linear between them
+#   and constant power (torque * speed) beyond either end
+def interpolate_stall_torque(table, max_rpm):
+    if(max_rpm <= 0):
+        raise ValueError("Motor max rpm must be positive")
+
+    table = sorted(table)
+    # The speed ratio goes first so the end entries come back exactly
+    if(max_rpm <= table[0][0]):
+        return table[0][1] * (table[0][0] / max_rpm)
+    if(max_rpm >= table[-1][0]):
+        return table[-1][1] * (table[-1][0] / max_rpm)
+
+    for (low_rpm, low_torque), (high_rpm, high_torque) in zip(table, table[1:]):
+        if(max_rpm == low_rpm):
+            return low_torque
+        if(max_rpm < high_rpm):
+            fraction = (max_rpm - low_rpm) / (high_rpm - low_rpm)
+            return low_torque + fraction * (high_torque - low_torque)
+
+
+def dc_motor(max_rpm):
+    return Motor_Spec("DC {} rpm".format(max_rpm), max_rpm, interpolate_stall_torque(dc_motor_table, max_rpm))
+
+def servo(max_rpm):
+    return Motor_Spec("Servo {} rpm".format(max_rpm), max_rpm, interpolate_stall_torque(servo_table, max_rpm))
+
+
+catalog = {}
+for rpm, torque in dc_motor_table:
+    catalog["dc_{}".format(rpm)]    = dc_motor(rpm)
+for rpm, torque in servo_table:
+    catalog["servo_{}".format(rpm)] = servo(rpm)
+
+
+# Rpm the motor can gain per step when driving the vehicle from a stand still.
+#   Cached by (vehicle, motor), bounded so a sweep over vehicles can't grow it forever
+@functools.lru_cache(maxsize=256)
+def rpm_ramp_limit(vehicle, motor):
+    # Using the stall torque and the mass, calculate the ramp limit
+    # Get the force from the stall torque. Assume ideal torque transfer
+    wheel_force     = (motor.stall_torque_Nm * vehicle.gear_ratio) / vehicle.wheel_radius_meters
+
+    # Take into account each wheel
+    vehicle_force   = wheel_force * vehicle.wheel_count
+
+    # Estimate acceleration
+    accel = vehicle_force / vehicle.mass_kg
+
+    # Calculate the distance traveled in 1 second
+    traversed_m = 0.5 * accel
+
+    # Calculate number of rotations to get there
+    wheel_rotations = (traversed_m / vehicle.circumference_meters)
+    motor_rotations = wheel_rotations * vehicle.gear_ratio
+
+    # motor_rotations is the ramp limit in revolutions / second, convert to rpm
+    return motor_rotations * 60
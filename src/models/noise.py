@@ -0,0 +1,95 @@
+###########################################################
+#
+#   FILENAME:       noise.py
+#
+#   DESCRIPTION:    Seedable noise streams for the stochastic
+#                     models. Noise is drawn from a NumPy
+#                     Generator in large blocks and handed out
+#                     one sample at a time
+#
+#                     numpy is imported on first use so the
+#                     sims stay cheap to import
+#
+###########################################################
+
+# Generator from a seed, a SeedSequence or an existing Generator. None gives
+#   a freshly seeded, non-reproducible Generator
+def make_rng(seed = None):
+    import numpy as np
+
+    if(isinstance(seed, np.random.Generator)):
+        return seed
+    return np.random.default_rng(seed)
+
+
+# count statistically independent Generators derived from one seed, e.g. one
+#   per model in a sim or one per worker in a sweep
+def spawn(seed, count):
+    import numpy as np
+
+    if(isinstance(seed, np.random.Generator)):
+        return seed.spawn(count)
+    if(not isinstance(seed, np.random.SeedSequence)):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in seed.spawn(count)]
+
+
+class Gaussian_Noise:
+    def __init__(self, std_dev, rng = None, block_size = 4096):
+        self.std_dev        = std_dev
+        self.rng            = make_rng(rng)
+        self.block_size     = block_size
+        self.block          = []
+        self.index          = 0
+
+    # Next sample in the stream
+    def sample(self):
+        if(self.index == len(self.block)):
+            # Plain floats index much faster than a NumPy array element by element
+            self.block  = self.rng.normal(0, self.std_dev, self.block_size).tolist()
+            self.index  = 0
+
+        value       = self.block[self.index]
+        self.index  += 1
+        return value
+
+    # Next count samples as an array, the same values count calls to sample()
+    #   would have returned
+    def sample_block(self, count):
+        import numpy as np
+
+        buffered    = self.block[self.index:self.index + count]
+        self.index  += len(buffered)
+        if(len(buffered) == count):
+            return np.array(buffered)
+
+        fresh       = self.rng.normal(0, self.std_dev, count - len(buffered))
+        return np.concatenate((buffered, fresh))
+
+
+# Gaussian_Noise with one channel per scenario. Each step hands out one sample per
+#   channel, drawn a block of block_size steps at a time
+class Gaussian_Noise_Bank:
+    def __init__(self, std_dev, count, rng = None, block_size = 1024):
+        import numpy as np
+
+        self.std_dev        = std_dev
+        self.count          = count
+        self.rng            = make_rng(rng)
+        self.block_size     = block_size
+        self.block          = np.zeros((0, count))
+        self.row            = 0
+
+    # Next sample of every channel
+    def sample(self):
+        if(self.row == len(self.block)):
+            self.block  = self.rng.normal(0, self.std_dev, (self.block_size, self.count))
+            self.row    = 0
+
+        self.row += 1
+        return self.block[self.row - 1]
+
+    # Keep only the channels flagged in keep
+    def select(self, keep):
+        self.block  = self.block[:, keep]
+        self.count  = self.block.shape[1]
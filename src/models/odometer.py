@@ -0,0 +1,26 @@
+###########################################################
+#
+#   FILENAME:       odometer.py
+#
+#   DESCRIPTION:    Wheel odometry. Accumulates the distance
+#                     the motor models report for each step
+#                     and reads it back with Gaussian encoder
+#                     reading noise on top. Wheel slip isn't
+#                     modelled, so the reading never drifts
+#
+###########################################################
+
+from src.models.noise import Gaussian_Noise
+
+class Odometer:
+    # noise_std is the reading noise in meters, rng is a seed or NumPy Generator for
+    #   it, None for an unseeded stream
+    def __init__(self, noise_std = 0.002, rng = None):
+        self.noise_std  = noise_std
+        self.distance   = 0
+        self.noise      = Gaussian_Noise(noise_std, rng)
+
+    # Add the distance returned by rotate() this step and return the noisy reading
+    def measure(self, distance_traveled):
+        self.distance = self.distance + distance_traveled
+        return self.distance + self.noise.sample()
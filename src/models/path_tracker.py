@@ -0,0 +1,195 @@
+###########################################################
+#
+#   FILENAME:       path_tracker.py
+#
+#   DESCRIPTION:    Nearest segment lookup along a waypoint
+#                     route. A uniform grid over the segments
+#                     finds the nearest one from scratch, and
+#                     after that a search over a small window
+#                     around the last segment keeps every tick
+#                     the same cost however long the route is
+#
+###########################################################
+
+import  math
+import  numpy                   as np
+
+class Path_Tracker:
+    # waypoints is a sequence of (x, y) points in meters, at least two
+    #   lookahead_meters    How far along the route the lookahead point sits
+    #   search_window       Segments either side of the last one searched each tick
+    #   cell_size_meters    Grid cell size, defaults to a few typical segment lengths
+    #   relocalize_meters   A warm started match further away than this falls back
+    #                         to the grid, defaults to one cell
+    def __init__(self, waypoints, lookahead_meters = 0.3, search_window = 16,
+                 cell_size_meters = None, relocalize_meters = None):
+        points = np.asarray(waypoints, dtype=np.float64)
+        if((points.ndim != 2) or (points.shape[1] != 2) or (len(points) < 2)):
+            raise ValueError("A route needs at least two (x, y) waypoints")
+
+        self.starts             = points[:-1]
+        self.directions         = points[1:] - points[:-1]
+        self.lengths            = np.hypot(self.directions[:, 0], self.directions[:, 1])
+        self.cumulative         = np.concatenate(([0.0], np.cumsum(self.lengths)))
+        self.total_length       = float(self.cumulative[-1])
+        self.segment_count      = len(self.lengths)
+        self.end_point          = points[-1]
+
+        # Zero length segments still project, onto their start point
+        self.lengths_squared    = np.maximum(self.lengths ** 2, 1e-300)
+
+        self.lookahead_meters   = lookahead_meters
+        self.search_window      = search_window
+
+        if(cell_size_meters is None):
+            cell_size_meters    = max(4 * float(np.median(self.lengths)), lookahead_meters, 1e-3)
+        if(relocalize_meters is None):
+            relocalize_meters   = cell_size_meters
+        self.cell_size_meters   = cell_size_meters
+        self.relocalize_meters  = relocalize_meters
+
+        self.build_grid()
+
+        # Last matched segment, None until the first lookup
+        self.segment            = None
+        self.along_track        = 0.0
+        self.cross_track        = 0.0
+
+    # Every grid cell a segment's bounding box touches lists that segment
+    def build_grid(self):
+        low     = np.floor(np.minimum(self.starts, self.starts + self.directions) / self.cell_size_meters).astype(np.int64)
+        high    = np.floor(np.maximum(self.starts, self.starts + self.directions) / self.cell_size_meters).astype(np.int64)
+
+        self.grid = {}
+        for segment in range(0, self.segment_count):
+            for ix in range(low[segment, 0], high[segment, 0] + 1):
+                for iy in range(low[segment, 1], high[segment, 1] + 1):
+                    self.grid.setdefault((ix, iy), []).append(segment)
+
+        self.grid_low   = low.min(axis=0)
+        self.grid_high  = high.max(axis=0)
+
+    # Distance from (x, y) to each of the given segments and where along them the
+    #   closest point is, as a 0 to 1 fraction
+    def project(self, segments, x, y):
+        offset_x    = x - self.starts[segments, 0]
+        offset_y    = y - self.starts[segments, 1]
+        fraction    = (offset_x * self.directions[segments, 0] + offset_y * self.directions[segments, 1]) / self.lengths_squared[segments]
+        fraction    = np.clip(fraction, 0.0, 1.0)
+        distance    = np.hypot(offset_x - fraction * self.directions[segments, 0],
+                               offset_y - fraction * self.directions[segments, 1])
+        return distance, fraction
+
+    # Nearest segment over the whole route. Grid cells are searched in growing
+    #   square rings until no unsearched cell can hold anything closer
+    def grid_search(self, x, y):
+        cell_x      = int(math.floor(x / self.cell_size_meters))
+        cell_y      = int(math.floor(y / self.cell_size_meters))
+        max_ring    = int(max(abs(cell_x - self.grid_low[0]), abs(cell_x - self.grid_high[0]),
+                              abs(cell_y - self.grid_low[1]), abs(cell_y - self.grid_high[1])))
+
+        best_segment    = None
+        best_distance   = math.inf
+        for ring in range(0, max_ring + 1):
+            candidates = []
+            for ix in range(cell_x - ring, cell_x + ring + 1):
+                for iy in (range(cell_y - ring, cell_y + ring + 1) if abs(ix - cell_x) == ring else (cell_y - ring, cell_y + ring)):
+                    candidates.extend(self.grid.get((ix, iy), ()))
+
+            if(candidates):
+                candidates      = np.unique(candidates)
+                distance, _     = self.project(candidates, x, y)
+                closest         = int(np.argmin(distance))
+                if(distance[closest] < best_distance):
+                    best_distance   = float(distance[closest])
+                    best_segment    = int(candidates[closest])
+
+            # Everything within ring cells of the point has been searched
+            if(best_distance <= ring * self.cell_size_meters):
+                break
+
+        return best_segment
+
+    # Nearest segment in a window around the last one. The window slides while the
+    #   best match sits on its edge, so a fast robot on a dense route still follows
+    def local_search(self, x, y):
+        best = self.segment
+        for slide in range(0, (self.segment_count // max(1, self.search_window)) + 1):
+            low         = max(0, best - self.search_window)
+            high        = min(self.segment_count, best + self.search_window + 1)
+            distance, _ = self.project(np.arange(low, high), x, y)
+            best        = low + int(np.argmin(distance))
+            if(not (((best == low) and (low > 0)) or ((best == high - 1) and (high < self.segment_count)))):
+                break
+        return best, float(distance[best - low])
+
+    # Match (x, y) to the route. Returns the along track distance from the start of
+    #   the route and the cross track error, positive to the left of the route
+    def locate(self, x, y):
+        segment = None
+        if(self.segment is not None):
+            segment, distance = self.local_search(x, y)
+            if(distance > self.relocalize_meters):
+                segment = None
+        if(segment is None):
+            segment = self.grid_search(x, y)
+
+        distance, fraction  = self.project(np.array([segment]), x, y)
+        fraction            = float(fraction[0])
+        direction           = self.directions[segment]
+        length              = max(self.lengths[segment], 1e-300)
+
+        self.segment        = segment
+        self.along_track    = float(self.cumulative[segment] + fraction * self.lengths[segment])
+        self.cross_track    = float((direction[0] * (y - self.starts[segment, 1]) -
+                                     direction[1] * (x - self.starts[segment, 0])) / length)
+        return self.along_track, self.cross_track
+
+    # Point on the route the given distance from its start, clamped to the route
+    def point_at(self, along_track):
+        along_track = min(max(along_track, 0.0), self.total_length)
+        segment     = min(int(np.searchsorted(self.cumulative, along_track, side="right")) - 1, self.segment_count - 1)
+        fraction    = (along_track - self.cumulative[segment]) / max(self.lengths[segment], 1e-300)
+        return (float(self.starts[segment, 0] + fraction * self.directions[segment, 0]),
+                float(self.starts[segment, 1] + fraction * self.directions[segment, 1]))
+
+    # Lookahead point for the last located position
+    def lookahead_point(self):
+        return self.point_at(self.along_track + self.lookahead_meters)
+
+    # Distance left to drive along the route from the last located position
+    def remaining(self):
+        return self.total_length - self.along_track
+
+
+if __name__ == '__main__':
+    import time
+
+    # A winding route, checked against brute force and timed at growing lengths
+    rng = np.random.default_rng(0)
+    for count in (1000, 10000, 100000):
+        angles      = np.cumsum(rng.normal(0, 0.05, count))
+        steps       = np.stack((np.cos(angles), np.sin(angles)), axis=1) * 0.05
+        waypoints   = np.cumsum(steps, axis=0)
+        tracker     = Path_Tracker(waypoints)
+
+        # Drive the first stretch of the route, 2 cm a tick with some sideways noise
+        along       = np.arange(0, 2000) * 0.02
+        positions   = [np.array(tracker.point_at(s)) + rng.normal(0, 0.01, 2) for s in along]
+
+        start       = time.perf_counter()
+        for position in positions:
+            tracker.locate(position[0], position[1])
+        per_tick    = (time.perf_counter() - start) / len(positions)
+
+        # From scratch lookups have to find the true nearest distance
+        for position in positions[::97]:
+            fresh       = Path_Tracker.__new__(Path_Tracker)
+            fresh.__dict__.update(tracker.__dict__)
+            fresh.segment = None
+            fresh.locate(position[0], position[1])
+            found, _    = fresh.project(np.array([fresh.segment]), position[0], position[1])
+            brute, _    = fresh.project(np.arange(fresh.segment_count), position[0], position[1])
+            assert abs(found[0] - brute.min()) < 1e-12
+
+        print("{:>6} waypoints: {:.1f} us per tick".format(count, per_tick * 1e6))
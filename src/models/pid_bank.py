@@ -0,0 +1,63 @@
+###########################################################
+#
+#   FILENAME:       pid_bank.py
+#
+#   DESCRIPTION:    Vectorized PID. One controller channel
+#                     per scenario, step for step the same
+#                     as PID
+#
+###########################################################
+
+import  numpy                               as np
+
+class PID_Bank:
+    # Object Constructor: Requires simulation time step in seconds, the gains and the
+    #   number of channels. Every channel starts together, so the first call skips
+    #   the derivative for all of them
+    def __init__(self, sim_time_step, kp, ki, kd, count):
+        self.sim_time_step      = sim_time_step
+        self.kp                 = kp
+        self.ki                 = ki
+        self.kd                 = kd
+        self.error_integrator   = np.zeros(count)
+        self.last_error         = None
+
+    def process(self, error):
+        # Proportional control
+        output_effort           = error * self.kp
+
+        # Integral Control  - Only turn on when error is small
+        integrate               = error < 1
+        self.error_integrator   = self.error_integrator + np.where(integrate, error, 0)
+        output_effort           = output_effort + np.where(integrate, self.error_integrator * self.sim_time_step * self.ki, 0)
+
+        # Derivative Control, skipped on the first call
+        if(self.last_error is not None):
+            output_effort       = output_effort + (((error - self.last_error) / self.sim_time_step) * self.kd)
+        self.last_error         = error
+
+        return output_effort
+
+    # Keep only the channels flagged in keep
+    def select(self, keep):
+        self.error_integrator   = self.error_integrator[keep]
+        if(self.last_error is not None):
+            self.last_error     = self.last_error[keep]
+
+
+if __name__ == '__main__':
+    from src.models.pid import PID
+
+    # Every channel has to track its own scalar controller exactly
+    rng         = np.random.default_rng(0)
+    count       = 64
+    bank        = PID_Bank(0.01, 0.5, 1, 2, count)
+    controllers = [PID(0.01, 0.5, 1, 2) for i in range(0, count)]
+
+    for step in range(0, 2000):
+        errors      = rng.uniform(-3, 3, count)
+        effort      = bank.process(errors)
+        expected    = [controller.process(error) for controller, error in zip(controllers, errors.tolist())]
+        assert np.array_equal(effort, expected)
+
+    print("Parity OK")
@@ -4,25 +4,73 @@
 #
 #   DESCRIPTION:    Running Average Filter
 #
+#                     Terms live in a ring buffer with a
+#                     running sum so each sample is O(1).
+#                     Values can be floats or NumPy arrays
+#                     of parallel channels
 #
 ###########################################################
 
 class RA_Filter:
+
+    # Samples per cumulative sum pass in filter_block, bounds round-off growth
+    block_chunk_size = 65536
+
     def __init__(self, num_terms):
         self.terms = []
         for i in range(0, num_terms):
             self.terms.append(0)
 
+        self.head   = 0     # Index of the oldest term
+        self.sum    = 0
+
     def filter(self, value):
-        # Rotate Back Terms
-        for i in range(0, len(self.terms) - 1):
-            self.terms[i] = self.terms[i+1]
+        # Swap the oldest term for the new one
+        self.sum                = self.sum - self.terms[self.head] + value
+        self.terms[self.head]   = value
+        self.head               += 1
+
+        if(self.head == len(self.terms)):
+            # Re-sum once per lap so the running sum can't drift
+            self.head   = 0
+            self.sum    = sum(self.terms)
+
+        return self.sum / len(self.terms)
+
+    # Filter a whole signal at once. signal is shape (samples,) or
+    #   (samples, channels) and the filter state carries over to later calls
+    def filter_block(self, signal):
+        import numpy as np
+
+        signal      = np.asarray(signal, dtype=np.float64)
+        num_terms   = len(self.terms)
+
+        # Current terms in time order, oldest first
+        history     = np.empty((num_terms,) + signal.shape[1:])
+        for i in range(0, num_terms):
+            history[i] = self.terms[(self.head + i) % num_terms]
+
+        output      = np.empty_like(signal)
+        for start in range(0, len(signal), RA_Filter.block_chunk_size):
+            chunk       = signal[start:start + RA_Filter.block_chunk_size]
+            padded      = np.concatenate((history, chunk))
+
+            # Each output is the difference of two cumulative sums num_terms apart
+            sums        = np.cumsum(padded, axis=0)
+            output[start:start + len(chunk)] = (sums[num_terms:] - sums[:-num_terms]) / num_terms
+            history     = padded[-num_terms:]
 
-        self.terms[-1] = value
+        # Carry the last num_terms samples over as the new filter state
+        self.terms  = list(history.copy())
+        self.head   = 0
+        self.sum    = sum(self.terms)
 
-        #Sum up terms
-        sum = 0
-        for i in range(0, len(self.terms)):
-            sum += self.terms[i]
+        return output
 
-        return sum / len(self.terms)
\ No newline at end of file
+    # Keep only the channels flagged in keep, for callers that drop finished
+    #   channels out of their state arrays. Terms that are still the initial
+    #   scalar zero broadcast to any channel count and are left alone
+    def select(self, keep):
+        self.terms  = [term[keep] if getattr(term, "ndim", 0) else term for term in self.terms]
+        if(getattr(self.sum, "ndim", 0)):
+            self.sum = self.sum[keep]
@@ -0,0 +1,110 @@
+###########################################################
+#
+#   FILENAME:       rolling_stats.py
+#
+#   DESCRIPTION:    Windowed mean / standard deviation with
+#                     O(1) updates. Welford style add and
+#                     remove over a ring buffer, re-centered
+#                     from the buffer once per window to keep
+#                     round-off from building up
+#
+#                     Works on plain floats or on NumPy
+#                     arrays of parallel channels
+#
+###########################################################
+
+class Rolling_Stats:
+    # window is in samples and has to hold at least one, e.g. a steady state
+    #   condition shorter than the time step leaves it empty
+    def __init__(self, window, recenter_interval = None):
+        if(int(window) < 1):
+            raise ValueError("Rolling window of {} samples is shorter than one sample".format(window))
+
+        self.window                 = int(window)
+        self.values                 = [0] * self.window
+        self.head                   = 0
+        self.count                  = 0
+        self.mean                   = 0
+        self.m2                     = 0         # Sum of squared deviations from the mean
+
+        # Recomputing from the buffer costs O(window), so doing it once per
+        #   window keeps updates O(1) amortized
+        if(recenter_interval is None):
+            recenter_interval       = self.window
+        self.recenter_interval      = recenter_interval
+        self.updates_since_recenter = 0
+
+    def update(self, value):
+        if(self.count < self.window):
+            # Window still filling, plain Welford add
+            self.count  += 1
+            delta       = value - self.mean
+            self.mean   = self.mean + (delta / self.count)
+            self.m2     = self.m2 + (delta * (value - self.mean))
+
+        else:
+            # Window full, swap the oldest value for the new one
+            oldest      = self.values[self.head]
+            last_mean   = self.mean
+            self.mean   = last_mean + ((value - oldest) / self.window)
+            self.m2     = self.m2 + ((value - oldest) * (value - self.mean + oldest - last_mean))
+
+        self.values[self.head]  = value
+        self.head               = (self.head + 1) % self.window
+
+        self.updates_since_recenter += 1
+        if(self.updates_since_recenter >= self.recenter_interval):
+            self.recenter()
+
+    # Recompute the mean and squared deviations exactly from the buffer
+    def recenter(self):
+        values      = self.values[:self.count]
+        self.mean   = sum(values) / self.count
+        self.m2     = sum((value - self.mean) ** 2 for value in values)
+        self.updates_since_recenter = 0
+
+    # Keep only the channels flagged in keep, for callers that drop finished
+    #   channels out of their state arrays
+    def select(self, keep):
+        self.values = [value[keep] for value in self.values[:self.count]] + self.values[self.count:]
+        self.mean   = self.mean[keep]
+        self.m2     = self.m2[keep]
+
+    def variance(self):
+        # Round-off can leave a flat window very slightly negative
+        return abs(self.m2) / self.count
+
+    def std(self):
+        return self.variance() ** 0.5
+
+
+if __name__ == '__main__':
+    import numpy as np
+
+    # Accuracy check against np.std over a slice, the way the sims used to do it.
+    #   A random walk with a large offset stresses the cancellation in the update
+    window      = 500
+    rng         = np.random.default_rng(0)
+    signal      = 1e4 + np.cumsum(rng.normal(0, 0.01, 20 * window))
+
+    stats       = Rolling_Stats(window)
+    worst       = 0
+    for i in range(len(signal)):
+        stats.update(signal[i])
+        expected    = np.std(signal[max(0, i + 1 - window):i + 1])
+        worst       = max(worst, abs(stats.std() - expected))
+
+    print("Scalar worst absolute error:  {:.3e}".format(worst))
+    assert worst < 1e-9
+
+    # Same check with parallel channels
+    signals     = 1e4 + np.cumsum(rng.normal(0, 0.01, (10 * window, 16)), axis=0)
+    stats       = Rolling_Stats(window)
+    worst       = 0
+    for i in range(len(signals)):
+        stats.update(signals[i])
+        expected    = np.std(signals[max(0, i + 1 - window):i + 1], axis=0)
+        worst       = max(worst, np.max(np.abs(stats.std() - expected)))
+
+    print("Batched worst absolute error: {:.3e}".format(worst))
+    assert worst < 1e-9
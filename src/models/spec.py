@@ -0,0 +1,52 @@
+###########################################################
+#
+#   FILENAME:       spec.py
+#
+#   DESCRIPTION:    Base for the immutable spec classes.
+#                     Plain slotted classes rather than
+#                     dataclasses, so importing the models
+#                     stays cheap
+#
+###########################################################
+
+class Spec:
+    __slots__   = ()
+
+    # Constructor arguments in order. Subclasses set each of them once in __init__
+    #   with object.__setattr__, the specs can't be changed after that
+    fields      = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is immutable, use with_changes()".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+    def as_tuple(self):
+        return tuple(getattr(self, name) for name in self.fields)
+
+    def as_dict(self):
+        return dict(zip(self.fields, self.as_tuple()))
+
+    # Copy with some fields changed, e.g. vehicle.with_changes(mass_kg=12)
+    def with_changes(self, **changes):
+        unknown = [name for name in changes if name not in self.fields]
+        if(unknown):
+            raise TypeError("{} has no field {}".format(type(self).__name__, ", ".join(unknown)))
+        return type(self)(**dict(self.as_dict(), **changes))
+
+    def __eq__(self, other):
+        if(type(other) is not type(self)):
+            return NotImplemented
+        return self.as_tuple() == other.as_tuple()
+
+    def __hash__(self):
+        return hash((type(self).__name__,) + self.as_tuple())
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__,
+                               ", ".join("{}={!r}".format(name, value) for name, value in self.as_dict().items()))
+
+    # Pickled and copied through the constructor, since setting attributes is blocked
+    def __reduce__(self):
+        return (type(self), self.as_tuple())
@@ -0,0 +1,47 @@
+###########################################################
+#
+#   FILENAME:       vehicle_spec.py
+#
+#   DESCRIPTION:    Immutable description of the robot body.
+#                     Models take one of these instead of
+#                     reading the wheel / vehicle_mass module
+#                     globals, so different vehicles can be
+#                     simulated side by side in one process
+#
+###########################################################
+
+import  math
+from    src.models.spec         import Spec
+import  src.models.wheel        as wheel
+import  src.models.vehicle_mass as vm
+
+class Vehicle_Spec(Spec):
+    fields      = ("mass_kg", "wheel_count", "gear_ratio", "wheel_radius_meters", "track_width_meters")
+    __slots__   = fields + ("circumference_meters",)
+
+    #   mass_kg             Total Mass of robot
+    #   wheel_count         Number of wheels
+    #   gear_ratio          Number of motor turns to wheel turns
+    #   wheel_radius_meters Radius of wheel
+    #   track_width_meters  Distance between the left and right wheels
+    def __init__(self, mass_kg, wheel_count, gear_ratio, wheel_radius_meters,
+                 track_width_meters = wheel.track_width_meters):
+        object.__setattr__(self, "mass_kg",             mass_kg)
+        object.__setattr__(self, "wheel_count",         wheel_count)
+        object.__setattr__(self, "gear_ratio",          gear_ratio)
+        object.__setattr__(self, "wheel_radius_meters", wheel_radius_meters)
+        object.__setattr__(self, "track_width_meters",  track_width_meters)
+
+        # Derived once here since the motor models use it every step
+        object.__setattr__(self, "circumference_meters", wheel_radius_meters * 2 * math.pi)
+
+    # Spec matching the current wheel and vehicle_mass module values
+    @classmethod
+    def from_globals(cls):
+        return cls(
+            mass_kg             = vm.mass_kg,
+            wheel_count         = wheel.count,
+            gear_ratio          = wheel.gear_ratio,
+            wheel_radius_meters = wheel.radius_meters,
+            track_width_meters  = wheel.track_width_meters,
+        )
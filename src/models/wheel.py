@@ -15,3 +15,5 @@ gear_ratio              = 1                                 # Number of motor tu
 
 radius_meters           = 0.035                             # Radius of wheel
 circumference_meters    = radius_meters * 2 * math.pi       # Circumference of wheel
+
+track_width_meters      = 0.2                               # Distance between the left and right wheels
@@ -0,0 +1,326 @@
+###########################################################
+#
+#   FILENAME:       filtered_kernel.py
+#
+#   DESCRIPTION:    Flat array version of the filtered inertial
+#                     navigation loop. Compiled with Numba in
+#                     nopython mode when it is installed, run as
+#                     plain Python otherwise. Produces the same
+#                     trajectory as inertial_navigation_filtered
+#                     for the same seed
+#
+###########################################################
+
+import  math
+import  src.models.dc_motor         as dc_motor
+import  src.models.noise            as noise
+from    src.sim.result              import Sim_Result
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+# The whole sim step by step over flat state. Every expression mirrors the
+#   PID, DC_Motor, Accelerometer, RA_Filter and Rolling_Stats models operation
+#   for operation so the floating point results are identical.
+#   Returns the number of steps taken and the settling time, or -1 if the
+#   run hit the time cap
+def filtered_loop(time_step_s,
+                  motor_max_rpm,
+                  rpm_ramp_limit,
+                  gear_ratio,
+                  circumference_meters,
+                  steady_state_condition,
+                  window,
+                  filter_terms,
+                  controller_threshold,
+                  kp,
+                  ki,
+                  kd,
+                  target,
+                  max_time_s,
+                  accel_noise,
+                  timestamp,
+                  estimated_position,
+                  estimated_velocity,
+                  estimated_acceleration,
+                  actual_position,
+                  control_effort,
+                  solution_drift,
+                  window_values):
+
+    filter_length       = len(filter_terms)
+
+    cur_time            = 0.0
+    est_position        = 0.0
+    est_velocity        = 0.0
+    current_position    = 0.0
+
+    # PID
+    error_integrator    = 0.0
+    last_error          = 0.0
+    first_error         = True
+
+    # Motor
+    cur_rpm             = 0.0
+
+    # Accelerometer
+    last_accel_position = 0.0
+    last_accel_velocity = 0.0
+
+    # Running average filter
+    filter_head         = 0
+    filter_sum          = 0.0
+
+    # Rolling stats, seeded with the initial position
+    stats_head          = 1
+    stats_count         = 1
+    stats_mean          = 0.0
+    stats_m2            = 0.0
+    window_values[0]    = 0.0
+    stats_updates       = 1
+    if(stats_updates >= window):
+        stats_updates   = 0
+    stats_head          = stats_head % window
+
+    settling_time       = -1.0
+    step                = 0
+    while(step + 1 < len(timestamp)):
+        step                += 1
+        cur_time            = cur_time + time_step_s
+
+        # PID.process
+        error               = target - est_position
+        effort              = 0.0
+        effort              += error * kp
+        if(error < 1):
+            error_integrator    += error
+            effort              += error_integrator * time_step_s * ki
+        if(first_error):
+            last_error      = error
+            first_error     = False
+        else:
+            derivative      = (error - last_error) / time_step_s
+            last_error      = error
+            effort          += derivative * kd
+
+        # Deadband on the controller
+        if(abs(effort) < controller_threshold):
+            effort = 0.0
+
+        # DC_Motor.rotate
+        moving              = True
+        negative            = False
+        if(effort < 0):
+            negative        = True
+        elif(effort == 0):
+            if(cur_rpm > rpm_ramp_limit):
+                negative    = True
+            elif(cur_rpm < (-1 * rpm_ramp_limit)):
+                negative    = False
+            else:
+                cur_rpm     = 0.0
+                moving      = False
+
+        distance_traveled   = 0.0
+        if(moving):
+            if(not negative):
+                if(cur_rpm != motor_max_rpm):
+                    cur_rpm += rpm_ramp_limit
+                    if(cur_rpm > motor_max_rpm):
+                        cur_rpm = motor_max_rpm
+            else:
+                if(cur_rpm != (-1 * motor_max_rpm)):
+                    cur_rpm -= rpm_ramp_limit
+                    if(cur_rpm < (-1 * motor_max_rpm)):
+                        cur_rpm = (-1 * motor_max_rpm)
+
+            wheel_rpm           = cur_rpm / gear_ratio
+            wheel_rps           = wheel_rpm / 60
+            rotations           = wheel_rps * time_step_s
+            distance_traveled   = rotations * circumference_meters
+
+        current_position    = current_position + distance_traveled
+
+        # Accelerometer.get_accel
+        velocity            = (current_position - last_accel_position) / time_step_s
+        accel               = (velocity         - last_accel_velocity) / time_step_s
+        accel               += accel_noise[step - 1]
+        last_accel_position = current_position
+        last_accel_velocity = velocity
+
+        # RA_Filter.filter
+        filter_sum                  = filter_sum - filter_terms[filter_head] + accel
+        filter_terms[filter_head]   = accel
+        filter_head                 += 1
+        if(filter_head == filter_length):
+            filter_head = 0
+            filter_sum  = 0.0
+            for i in range(0, filter_length):
+                filter_sum += filter_terms[i]
+        est_accel           = filter_sum / filter_length
+
+        # Double integration
+        est_velocity        = est_velocity + (est_accel * time_step_s)
+        est_position        = est_position + (est_velocity * time_step_s)
+
+        percent_drift       = abs(((current_position - est_position) / est_position) * 100)
+
+        timestamp[step]                 = cur_time
+        estimated_position[step]        = est_position
+        estimated_velocity[step]        = est_velocity
+        estimated_acceleration[step]    = est_accel
+        actual_position[step]           = current_position
+        control_effort[step]            = effort
+        solution_drift[step]            = percent_drift
+
+        # Rolling_Stats.update
+        if(stats_count < window):
+            stats_count     += 1
+            delta           = est_position - stats_mean
+            stats_mean      = stats_mean + (delta / stats_count)
+            stats_m2        = stats_m2 + (delta * (est_position - stats_mean))
+        else:
+            oldest          = window_values[stats_head]
+            last_mean       = stats_mean
+            stats_mean      = last_mean + ((est_position - oldest) / window)
+            stats_m2        = stats_m2 + ((est_position - oldest) * (est_position - stats_mean + oldest - last_mean))
+        window_values[stats_head]   = est_position
+        stats_head                  = (stats_head + 1) % window
+        stats_updates               += 1
+        if(stats_updates >= window):
+            total = 0.0
+            for i in range(0, stats_count):
+                total += window_values[i]
+            stats_mean  = total / stats_count
+            total = 0.0
+            for i in range(0, stats_count):
+                total += (window_values[i] - stats_mean) ** 2
+            stats_m2        = total
+            stats_updates   = 0
+
+        # Determine if we've reach steady state
+        if(cur_time >= steady_state_condition):
+            standard_deviation = (abs(stats_m2) / stats_count) ** 0.5
+            if(standard_deviation < (target * 0.001)):
+                settling_time = cur_time
+                break
+
+        # If the simulation has gone on longer than the cap, enough is enough
+        if(cur_time > max_time_s):
+            break
+
+    return step, settling_time
+
+
+if(numba is not None):
+    compiled_loop = numba.njit(cache=True)(filtered_loop)
+else:
+    compiled_loop = filtered_loop
+
+
+# Same arguments as inertial_navigation_filtered.run(). compiled=False forces
+#   the pure Python path even when Numba is installed
+def run(time_step_s             = 0.01,
+        motor_max_rpm           = 120,
+        steady_state_condition  = 5,
+        filter_length           = None,
+        controller_threshold    = 0.01,
+        kp                      = 0.5,
+        ki                      = 1,
+        kd                      = 2,
+        target                  = 10,
+        max_time_s              = 360,
+        seed                    = None,
+        vehicle                 = None,
+        compiled                = True):
+    import numpy as np
+
+    if(filter_length is None):
+        filter_length       = int(0.5 / time_step_s)
+
+    # Same stream split as the object model sim. The motor's noise never
+    #   reaches the trajectory, so only the accelerometer stream is drawn
+    motor_rng, accel_rng    = noise.spawn(seed, 2)
+    accel_noise             = noise.Gaussian_Noise(0.049, accel_rng)
+
+    motor               = dc_motor.DC_Motor(time_step_s, motor_max_rpm, motor_rng, vehicle)
+
+    # Room for every step up to the time cap plus the initial sample. cur_time is a
+    #   running sum, so rounding can take a few extra steps to pass the cap
+    length              = math.ceil(max_time_s / time_step_s) + 16
+    channels            = np.zeros((7, length))
+    window              = int(steady_state_condition / time_step_s)
+
+    loop = compiled_loop if compiled else filtered_loop
+    steps, settling_time = loop(
+        float(time_step_s),
+        float(motor_max_rpm),
+        float(motor.rpm_ramp_limit),
+        float(motor.vehicle.gear_ratio),
+        float(motor.vehicle.circumference_meters),
+        float(steady_state_condition),
+        window,
+        np.zeros(filter_length),
+        float(controller_threshold),
+        float(kp),
+        float(ki),
+        float(kd),
+        float(target),
+        float(max_time_s),
+        accel_noise.sample_block(length),
+        channels[0],
+        channels[1],
+        channels[2],
+        channels[3],
+        channels[4],
+        channels[5],
+        channels[6],
+        np.zeros(window),
+    )
+
+    # The loop also stops when the buffers are full, which must never cut a run short
+    if((settling_time < 0) and (channels[0, steps] <= max_time_s)):
+        raise RuntimeError("Trajectory buffers filled at {} s, before the {} s time cap".format(channels[0, steps], max_time_s))
+
+    channels = channels[:, :steps + 1]
+    return Sim_Result(
+        "Inertial Navigation / Dead Reckoning\n(Filtered)",
+        channels[0],
+        np.broadcast_to(np.float64(target), (steps + 1,)),
+        channels[1],
+        channels[4],
+        channels[5],
+        channels[6],
+        estimated_velocity      = channels[2],
+        estimated_acceleration  = channels[3],
+        settling_time           = settling_time if settling_time >= 0 else None,
+    )
+
+
+if __name__ == '__main__':
+    import time
+    import numpy as np
+    import src.motor.inertial_navigation_filtered as inertial_navigation_filtered
+
+    # Parity between the object model sim, the pure Python kernel and the compiled kernel
+    for seed in range(0, 5):
+        reference   = inertial_navigation_filtered.run(seed=seed)
+        for compiled in (False, True):
+            result = run(seed=seed, compiled=compiled)
+            for name in ("timestamp", "estimated_position", "estimated_velocity", "estimated_acceleration",
+                         "actual_position", "control_effort", "solution_drift"):
+                assert np.array_equal(getattr(reference, name), getattr(result, name)), name
+            assert reference.settling_time == result.settling_time
+
+    print("Parity OK, Numba {}".format("available" if numba is not None else "missing"))
+
+    # Long horizon throughput, hold the robot at the target for an hour of sim time
+    for compiled in (False, True):
+        start   = time.perf_counter()
+        result  = run(seed=0, steady_state_condition=3600, max_time_s=3600, compiled=compiled)
+        elapsed = time.perf_counter() - start
+        print("{:<9} {:>8} steps in {:.3f} s ({:.0f} steps/s)".format(
+            "compiled" if compiled else "python", len(result.timestamp), elapsed, len(result.timestamp) / elapsed))
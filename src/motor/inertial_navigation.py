@@ -9,51 +9,106 @@
 #
 ###########################################################
 
-import  math
-import  random
-import  matplotlib.pyplot           as plt
-import  numpy                       as np
 import  src.models.dc_motor         as dc_motor
-import  src.models.wheel            as wheel
 import  src.models.accelerometer    as acl
+import  src.models.noise            as noise
 from    src.models.pid              import PID
-
-
-def sim():
-
-    # Simulation constraints
-    time_step_s             = 0.1  # Simulate the robot in time increments of 10 milliseconds
-    motor_max_rpm           = 120   # Max RPM of the motor is 120 RPM
-    steady_state_condition  = 5     # The robot needs to sit almost still for 5 seconds
-    controller_threshold    = 0.02
+from    src.models.rolling_stats    import Rolling_Stats
+from    src.sim.result              import Sim_Result
+from    src.sim.recorder            import Trajectory_Recorder
+
+
+# Simulation constraints
+#   time_step_s             Simulate the robot in time increments of 100 milliseconds
+#   motor_max_rpm           Max RPM of the motor is 120 RPM
+#   steady_state_condition  The robot needs to sit almost still for 5 seconds
+#   controller_threshold    Deadband on the control effort
+#   kp, ki, kd              PID gains
+#   target                  Target distance in meters
+#   max_time_s              If the simulation goes on longer than this, enough is enough
+#   seed                    Seed or NumPy Generator for the noise streams, None for an unseeded run
+#   vehicle                 Vehicle_Spec of the robot, None for the wheel / vehicle_mass module values
+#   telemetry               Directory to stream every step to with a Telemetry_Writer, None for no files
+#   keep_trajectory         False to only keep the final sample in memory, e.g. for multi-hour runs
+#                             that stream to telemetry
+#   profiler                instrumentation.Profiler to time each stage of the loop with, None for no profiling
+#   abort                   Called as abort(cur_time, actual_position) after every step, the run stops
+#                             early once it returns True. None to run to steady state or the cap
+def run(time_step_s             = 0.1,
+        motor_max_rpm           = 120,
+        steady_state_condition  = 5,
+        controller_threshold    = 0.02,
+        kp                      = 5,
+        ki                      = 1,
+        kd                      = 0.1,
+        target                  = 10,
+        max_time_s              = 360,
+        seed                    = None,
+        vehicle                 = None,
+        telemetry               = None,
+        keep_trajectory         = True,
+        profiler                = None,
+        abort                   = None):
+
+    # Independent noise streams for the motor and the accelerometer
+    motor_rng, accel_rng = noise.spawn(seed, 2)
 
     # Model handles
-    motor_actuators     = dc_motor.DC_Motor(time_step_s, motor_max_rpm)
-    controller          = PID(time_step_s, 5 ,1, 0.1)
-    accel               = acl.Accelerometer(time_step_s)
-
-    # Make arrays to store the simulation in
-
-    target_line         = [10]  # Target distance in meters
-    estimated_position  = [0]   # Where the system thinks it is
-    estimated_velocity  = [0]
-    estimated_acceleration = [0]
-    actual_position     = [0]   # Where the system actually is
-    timestamp           = [0]   # Time of the simulation
-    control_effort      = [0]   # Signal the controller passes to actuators
-    solution_drift      = [0]   # How far off is estimated position from actual position
+    motor_actuators     = dc_motor.DC_Motor(time_step_s, motor_max_rpm, motor_rng, vehicle)
+    controller          = PID(time_step_s, kp, ki, kd)
+    accel               = acl.Accelerometer(time_step_s, accel_rng)
+
+    # Record the simulation into preallocated buffers. The target never changes
+    #   so it is stored once as a constant channel
+    recorder            = Trajectory_Recorder(
+        [
+            "timestamp",                # Time of the simulation
+            "estimated_position",       # Where the system thinks it is
+            "estimated_velocity",
+            "estimated_acceleration",
+            "actual_position",          # Where the system actually is
+            "control_effort",           # Signal the controller passes to actuators
+            "solution_drift",           # How far off is estimated position from actual position
+        ],
+        constants = {"target_line" : target},
+        keep      = keep_trajectory,
+    )
+
+    # Optionally stream every step to disk as well
+    if(telemetry is not None):
+        from src.sim.telemetry import Telemetry_Writer
+
+        recorder.stream_to(Telemetry_Writer(telemetry, recorder.channels, recorder.constants))
+
+    recorder.record(0, 0, 0, 0, 0, 0, 0)
+
+    cur_time            = 0
+    est_position        = 0
+    est_velocity        = 0
+    current_position    = 0
+
+    # Steady state window over the estimated position, seeded with the initial sample
+    position_stats      = Rolling_Stats(steady_state_condition / time_step_s)
+    position_stats.update(0)
+
+    # Time each stage of the loop when profiling
+    if(profiler is not None):
+        profiler.wrap_all([(controller, "process"), (motor_actuators, "rotate"), (accel, "get_accel"),
+                           (recorder, "record"), (position_stats, "update"), (position_stats, "std")])
+        profiler.start()
 
     target_reached      = 0     # Time at which the target was actually met
 
     # Run the simulation as long as the steady state critera hasn't been met
     steady_state        = False
+    settling_time       = None
     while(not steady_state):
 
         # Update the timestamp from the previous timestamp
-        cur_time            = timestamp[-1] + time_step_s
+        cur_time            = cur_time + time_step_s
 
         # Calculate Error
-        error               = target_line[-1] - estimated_position[-1]
+        error               = target - est_position
 
         effort              = controller.process(error)
 
@@ -75,63 +130,72 @@ def sim():
         
 
         # Update the true position
-        current_position    = actual_position[-1] + distance_traveled
+        current_position    = current_position + distance_traveled
 
         # Feed the true position into the accelerometer model
         est_accel           = accel.get_accel(current_position)
-        est_velocity        = estimated_velocity[-1] + (est_accel * time_step_s)
-        est_position        = estimated_position[-1] + (est_velocity * time_step_s)
+        est_velocity        = est_velocity + (est_accel * time_step_s)
+        est_position        = est_position + (est_velocity * time_step_s)
 
         # Update simulation arrays
 
         percent_drift       = ((est_position - current_position) / current_position) * 100
 
-        # Append the simulation arrays
-        target_line.append(target_line[-1])             # Target Line's value never changes, but needs to be as long as the sim
-        estimated_position.append(est_position)
-        estimated_velocity.append(est_velocity)
-        estimated_acceleration.append(est_accel)
-        actual_position.append(current_position)
-        timestamp.append(cur_time)
-        control_effort.append(effort)
-        solution_drift.append(percent_drift)
+        recorder.record(
+            cur_time,
+            est_position,
+            est_velocity,
+            est_accel,
+            current_position,
+            effort,
+            percent_drift,
+        )
+
+        # Keep a running spread of the last steady_state_condition seconds of estimates
+        position_stats.update(est_position)
 
         # Determine if we've reach steady state, if that much time as passed to start checking
         if(cur_time >= steady_state_condition):
-            sample_size = steady_state_condition / time_step_s
             # Get the standard deviation
-            standard_deviation  = np.std(estimated_position[int(0-sample_size):])
+            standard_deviation  = position_stats.std()
 
             # If the standard deviation is 0.01% of the target distance, we've reached steady state
-            if (standard_deviation < (target_line[-1] * 0.0001)):
-                steady_state = True
+            if (standard_deviation < (target * 0.0001)):
+                steady_state    = True
+                settling_time   = cur_time
 
-        # If the simulation has gone on longer than 360 seconds, enough is enough
-        if( cur_time > 360):
+        # If the simulation has gone on longer than the cap, enough is enough
+        if( cur_time > max_time_s):
+            steady_state = True
+        # Stop early once the caller has seen enough of this run
+        elif((not steady_state) and (abort is not None) and abort(cur_time, current_position)):
             steady_state = True
 
-    # Plot the results from the simulation
-
-    fig, ax1 = plt.subplots()
-
-    # ax2 = ax1.twinx()
+    if(profiler is not None):
+        profiler.stop()
 
-    ax1.plot(timestamp, target_line,            'r',    label="Target Position")
-    ax1.plot(timestamp, estimated_position,     'm',    label="Estimated Position")
-    ax1.plot(timestamp, estimated_acceleration, 'y',    label="Estimated Accel")
-    ax1.plot(timestamp, actual_position,        'c',    label="Actual Position")
-    # ax2.plot(timestamp, solution_drift,         'k',    label="Solution Drift")
-    ax1.plot(timestamp, control_effort,         'b',    label="Control Effort")
+    recorder.close()
 
-    ax1.legend()
-    # ax2.legend()
+    return Sim_Result(
+        "Inertial Navigation / Dead Reckoning\n(Un-Filtered)",
+        recorder.as_array("timestamp"),
+        recorder.as_array("target_line"),
+        recorder.as_array("estimated_position"),
+        recorder.as_array("actual_position"),
+        recorder.as_array("control_effort"),
+        recorder.as_array("solution_drift"),
+        estimated_velocity      = recorder.as_array("estimated_velocity"),
+        estimated_acceleration  = recorder.as_array("estimated_acceleration"),
+        settling_time           = settling_time,
+    )
 
-    ax1.set_ylabel("Position (m)\nAcceleration (m/s/s)")
-    # ax2.set_ylabel("Solution % Deviation")
 
-    ax1.set_xlabel("Time (s)")
-    ax1.set_title("Inertial Navigation / Dead Reckoning\n(Un-Filtered)")
+def sim(show = True):
+    import src.sim.plotting as plotting
 
-    plt.show()
+    result = run()
 
+    # Plot the results from the simulation
+    plotting.plot_result(result, show)
 
+    return result
@@ -0,0 +1,136 @@
+###########################################################
+#
+#   FILENAME:       monte_carlo.py
+#
+#   DESCRIPTION:    Batched Monte Carlo version of the
+#                     filtered inertial navigation sim.
+#                     Runs N independent noise realizations
+#                     at once, one NumPy array of shape (N,)
+#                     per state variable, on the batched core
+#                     in sim.batch
+#
+###########################################################
+
+import  numpy                           as np
+from    src.models.accelerometer_bank   import Accelerometer_Bank
+from    src.models.dc_motor_bank        import DC_Motor_Bank
+import  src.models.noise                as noise
+from    src.models.pid_bank             import PID_Bank
+from    src.models.ra_filter            import RA_Filter
+import  src.sim.batch                   as batch
+from    src.sim.batch                   import Monte_Carlo_Result
+
+
+class Monte_Carlo_Core:
+    def __init__(self, count, time_step_s, motor_max_rpm, filter_length, controller_threshold,
+                 kp, ki, kd, target, rng, noise_block_size, vehicle):
+        self.count                  = count
+        self.time_step_s            = time_step_s
+        self.target                 = target
+        self.controller_threshold   = controller_threshold
+        self.motor_actuators        = DC_Motor_Bank(time_step_s, motor_max_rpm, count, vehicle=vehicle)
+        self.controller             = PID_Bank(time_step_s, kp, ki, kd, count)
+        self.accel                  = Accelerometer_Bank(time_step_s, count, rng, noise_block_size)
+        self.filter                 = RA_Filter(filter_length)
+
+        self.estimated_position     = np.zeros(count)
+        self.estimated_velocity     = np.zeros(count)
+        self.actual_position        = np.zeros(count)
+        self.control_effort         = np.zeros(count)
+
+    def step(self, cur_time):
+        # PID on the estimated error, with a deadband on the controller
+        effort                      = self.controller.process(self.target - self.estimated_position)
+        self.control_effort         = np.where(np.abs(effort) < self.controller_threshold, 0, effort)
+
+        # Drive the motors in the direction of the control effort
+        directions                  = DC_Motor_Bank.directions_from_effort(self.control_effort)
+        self.actual_position        = self.actual_position + self.motor_actuators.rotate(directions)
+
+        # Filter the detected acceleration and double integrate it
+        est_accel                   = self.filter.filter(self.accel.get_accel(self.actual_position))
+        self.estimated_velocity     = self.estimated_velocity + (est_accel * self.time_step_s)
+        self.estimated_position     = self.estimated_position + (self.estimated_velocity * self.time_step_s)
+
+    def select(self, keep):
+        self.motor_actuators.select(keep)
+        self.controller.select(keep)
+        self.accel.select(keep)
+        self.filter.select(keep)
+        self.estimated_position     = self.estimated_position[keep]
+        self.estimated_velocity     = self.estimated_velocity[keep]
+        self.actual_position        = self.actual_position[keep]
+        self.control_effort         = self.control_effort[keep]
+        self.count                  = len(self.actual_position)
+
+
+# Simulation constraints, the same defaults as inertial_navigation_filtered.run()
+#   num_runs                Scenarios to simulate at once, each with its own noise
+#   seed                    Seed or NumPy Generator for the noise, None for an unseeded run
+#   noise_block_size        Steps of accelerometer noise drawn at a time
+#   vehicle                 Vehicle_Spec of the robot, None for the wheel / vehicle_mass module values
+#   time_step_s             Simulate the robot in time increments of 10 milliseconds
+#   motor_max_rpm           Max RPM of the motor is 120 RPM
+#   steady_state_condition  The robot needs to sit almost still for 5 seconds
+#   filter_length           Running average length, defaults to half a second of samples
+#   controller_threshold    Deadband on the control effort
+#   kp, ki, kd              PID gains
+#   target                  Target distance in meters
+#   max_time_s              If the simulation goes on longer than this, enough is enough
+def sim(num_runs,
+        seed                    = None,
+        noise_block_size        = 1024,
+        vehicle                 = None,
+        time_step_s             = 0.01,
+        motor_max_rpm           = 120,
+        steady_state_condition  = 5,
+        filter_length           = None,
+        controller_threshold    = 0.01,
+        kp                      = 0.5,
+        ki                      = 1,
+        kd                      = 2,
+        target                  = 10,
+        max_time_s              = 360):
+
+    if(filter_length is None):
+        filter_length       = int(0.5 / time_step_s)
+
+    core = Monte_Carlo_Core(num_runs, time_step_s, motor_max_rpm, filter_length, controller_threshold,
+                            kp, ki, kd, target, noise.make_rng(seed), noise_block_size, vehicle)
+    results, _ = batch.simulate(core, "Monte Carlo Inertial Navigation", time_step_s,
+                                steady_state_condition, 0.001, target, max_time_s)
+    return results
+
+
+# Runs num_runs scenarios in batches of batch_size and streams every run's
+#   statistics to a telemetry directory, one row per run, so million run
+#   studies never hold more than one batch in memory. Each batch gets its own
+#   noise stream spawned from seed, so a given seed and batch_size always
+#   reproduce the same rows. Read the rows back with telemetry.open_telemetry()
+#   parameters are any of sim()'s simulation constraints, e.g. kp or time_step_s, and
+#   are stored with the rows
+def sim_batches(num_runs, telemetry, batch_size = 10000, seed = None, noise_block_size = 1024, vehicle = None, **parameters):
+    num_batches = (num_runs + batch_size - 1) // batch_size
+    batch_rngs  = noise.spawn(seed, num_batches)
+
+    from src.sim.telemetry import Telemetry_Writer
+
+    constants   = dict(parameters, num_runs=num_runs, batch_size=batch_size)
+    with Telemetry_Writer(telemetry, Monte_Carlo_Result.channels, constants) as writer:
+        for index, batch_rng in enumerate(batch_rngs):
+            count   = min(batch_size, num_runs - index * batch_size)
+            results = sim(count, batch_rng, noise_block_size, vehicle, **parameters)
+            writer.write_block(*results.columns())
+
+
+if __name__ == '__main__':
+    import time
+
+    num_runs    = 1000
+    start       = time.perf_counter()
+    results     = sim(num_runs, seed=0)
+    elapsed     = time.perf_counter() - start
+
+    print("{} runs in {:.2f} s ({:.2f} ms per run)".format(num_runs, elapsed, 1000 * elapsed / num_runs))
+    for name, stats in results.summary().items():
+        print(name, stats)
@@ -0,0 +1,159 @@
+###########################################################
+#
+#   FILENAME:       multi_rate.py
+#
+#   DESCRIPTION:    Filtered inertial navigation with each
+#                     model at its own rate. The plant steps
+#                     at the finest rate, the accelerometer
+#                     and estimator at the sensor rate and the
+#                     PID at the controller rate, with sample
+#                     and hold in between
+#
+###########################################################
+
+import  src.models.accelerometer    as acl
+import  src.models.dc_motor         as dc_motor
+import  src.models.noise            as noise
+from    src.models.pid              import PID
+from    src.models.ra_filter        import RA_Filter
+from    src.models.rolling_stats    import Rolling_Stats
+from    src.sim.result              import Sim_Result
+from    src.sim.recorder            import Trajectory_Recorder
+from    src.sim.scheduler           import Multi_Rate_Scheduler
+
+
+# Simulation constraints
+#   plant_step_s            Motor and true position update every millisecond
+#   sensor_step_s           Accelerometer, filter and estimator run at 100 Hz, the sensor bandwidth
+#   controller_step_s       PID runs at 20 Hz
+#   motor_max_rpm           Max RPM of the motor is 120 RPM
+#   steady_state_condition  The robot needs to sit almost still for 5 seconds
+#   filter_length           Running average length, defaults to half a second of sensor samples
+#   controller_threshold    Deadband on the control effort
+#   kp, ki, kd              PID gains
+#   target                  Target distance in meters
+#   max_time_s              If the simulation goes on longer than this, enough is enough
+#   seed                    Seed or NumPy Generator for the noise streams, None for an unseeded run
+#   vehicle                 Vehicle_Spec of the robot, None for the wheel / vehicle_mass module values
+def run(plant_step_s            = 0.001,
+        sensor_step_s           = 0.01,
+        controller_step_s       = 0.05,
+        motor_max_rpm           = 120,
+        steady_state_condition  = 5,
+        filter_length           = None,
+        controller_threshold    = 0.01,
+        kp                      = 0.5,
+        ki                      = 1,
+        kd                      = 2,
+        target                  = 10,
+        max_time_s              = 360,
+        seed                    = None,
+        vehicle                 = None):
+
+    if(filter_length is None):
+        filter_length       = int(0.5 / sensor_step_s)
+
+    # Independent noise streams for the motor and the accelerometer
+    motor_rng, accel_rng = noise.spawn(seed, 2)
+
+    # Model handles, each built for the step it is called at
+    motor_actuators     = dc_motor.DC_Motor(plant_step_s, motor_max_rpm, motor_rng, vehicle)
+    controller          = PID(controller_step_s, kp, ki, kd)
+    accel               = acl.Accelerometer(sensor_step_s, accel_rng)
+    filter              = RA_Filter(filter_length)
+
+    # Recorded at the sensor rate, the fastest rate anything is observed at
+    recorder            = Trajectory_Recorder(
+        [
+            "timestamp",
+            "estimated_position",
+            "estimated_velocity",
+            "estimated_acceleration",
+            "actual_position",
+            "control_effort",
+            "solution_drift",
+        ],
+        constants = {"target_line" : target},
+    )
+    recorder.record(0, 0, 0, 0, 0, 0, 0)
+
+    # Values handed between the tasks. Each is only written by one task and read
+    #   as held by the others
+    direction           = dc_motor.DC_Motor.motor_directions["Sustain"]
+    effort              = 0
+    current_position    = 0
+    est_position        = 0
+    est_velocity        = 0
+    settling_time       = None
+
+    position_stats      = Rolling_Stats(steady_state_condition / sensor_step_s)
+    position_stats.update(0)
+
+    scheduler           = Multi_Rate_Scheduler(plant_step_s)
+
+    def plant(cur_time):
+        nonlocal current_position
+        current_position    = current_position + motor_actuators.rotate(direction)
+
+    def estimator(cur_time):
+        nonlocal est_position, est_velocity, settling_time
+
+        est_accel           = filter.filter(accel.get_accel(current_position))
+        est_velocity        = est_velocity + (est_accel * sensor_step_s)
+        est_position        = est_position + (est_velocity * sensor_step_s)
+
+        percent_drift       = abs(((current_position - est_position) / est_position) * 100)
+        recorder.record(cur_time, est_position, est_velocity, est_accel, current_position, effort, percent_drift)
+
+        # Steady state once the estimate has held within 0.1% of the target for the window
+        position_stats.update(est_position)
+        if((cur_time >= steady_state_condition) and (position_stats.std() < (target * 0.001))):
+            settling_time   = cur_time
+            scheduler.stop()
+
+    def control(cur_time):
+        nonlocal direction, effort
+
+        effort              = controller.process(target - est_position)
+
+        # Create a deadband on the controller
+        if( abs(effort) < controller_threshold):
+            effort = 0
+
+        if(effort > 0):
+            direction       = dc_motor.DC_Motor.motor_directions["Forwards"]
+        elif(effort < 0):
+            direction       = dc_motor.DC_Motor.motor_directions["Backwards"]
+        else:
+            direction       = dc_motor.DC_Motor.motor_directions["Sustain"]
+
+    # Plant first so the sensor sees this tick's position, then the controller
+    #   acts on the freshest estimate
+    scheduler.add("plant",      plant_step_s,       plant)
+    scheduler.add("estimator",  sensor_step_s,      estimator)
+    scheduler.add("controller", controller_step_s,  control)
+    scheduler.run(max_time_s)
+
+    return Sim_Result(
+        "Inertial Navigation / Dead Reckoning\n(Multi-Rate)",
+        recorder.as_array("timestamp"),
+        recorder.as_array("target_line"),
+        recorder.as_array("estimated_position"),
+        recorder.as_array("actual_position"),
+        recorder.as_array("control_effort"),
+        recorder.as_array("solution_drift"),
+        estimated_velocity      = recorder.as_array("estimated_velocity"),
+        estimated_acceleration  = recorder.as_array("estimated_acceleration"),
+        settling_time           = settling_time,
+    )
+
+
+def sim(show = True):
+    import src.sim.plotting as plotting
+
+    result = run()
+
+    # Plot the results from the simulation
+    plotting.plot_result(result, show)
+
+    return result
@@ -9,52 +9,100 @@
 #
 ###########################################################
 
-import math
-import random
-import matplotlib.pyplot    as plt
-import numpy                as np
 import src.models.dc_motor  as dc_motor
-import src.models.wheel     as wheel
-
-def sim():
-
-    # Simulation constraints
-    time_step_s             = 0.01  # Simulate the robot in time increments of 10 milliseconds
-    motor_max_rpm           = 120   # Max RPM of the motor is 120 RPM
-    steady_state_condition  = 5     # The robot needs to sit almost still for 5 seconds
+import src.models.noise     as noise
+from   src.models.rolling_stats import Rolling_Stats
+from   src.sim.result       import Sim_Result
+from   src.sim.recorder     import Trajectory_Recorder
+
+# Using an open loop velocity model, we estimate that with the peak RPM
+#   the robot will always travel at a constant speed
+def planned_velocity(motor_actuators, motor_max_rpm, velocity_rng):
+    wheel_rps           = (motor_max_rpm / 60) / motor_actuators.vehicle.gear_ratio
+    estimated_velocity  = wheel_rps * motor_actuators.vehicle.circumference_meters
+    # Assume velocity can only be measured with 0.01 m/s accuracy
+    return (int(estimated_velocity * 100) / 100.0) + float(velocity_rng.normal(0,0.01))
+
+
+# Simulation constraints
+#   time_step_s             Simulate the robot in time increments of 10 milliseconds
+#   motor_max_rpm           Max RPM of the motor is 120 RPM
+#   steady_state_condition  The robot needs to sit almost still for 5 seconds
+#   target                  Target distance in meters
+#   max_time_s              If the simulation goes on longer than this, enough is enough
+#   seed                    Seed or NumPy Generator for the noise streams, None for an unseeded run
+#   vehicle                 Vehicle_Spec of the robot, None for the wheel / vehicle_mass module values
+#   telemetry               Directory to stream every step to with a Telemetry_Writer, None for no files
+#   keep_trajectory         False to only keep the final sample in memory, e.g. for multi-hour runs
+#                             that stream to telemetry
+#   profiler                instrumentation.Profiler to time each stage of the loop with, None for no profiling
+def run(time_step_s             = 0.01,
+        motor_max_rpm           = 120,
+        steady_state_condition  = 5,
+        target                  = 10,
+        max_time_s              = 360,
+        seed                    = None,
+        vehicle                 = None,
+        telemetry               = None,
+        keep_trajectory         = True,
+        profiler                = None):
+
+    # Independent noise streams for the motor and the velocity measurement
+    motor_rng, velocity_rng = noise.spawn(seed, 2)
 
     # Model handles
-    motor_actuators     = dc_motor.DC_Motor(time_step_s, motor_max_rpm)
-
-    # Make arrays to store the simulation in
-
-    target_line         = [10]  # Target distance in meters
-    estimated_position  = [0]   # Where the system thinks it is
-    actual_position     = [0]   # Where the system actually is
-    velocity            = [0]   # Current speed of the robot
-    timestamp           = [0]   # Time of the simulation
-    control_effort      = [0]   # Signal the controller passes to actuators
-    solution_drift      = [0]   # How far off is estimated position from actual position
+    motor_actuators     = dc_motor.DC_Motor(time_step_s, motor_max_rpm, motor_rng, vehicle)
+
+    # Record the simulation into preallocated buffers. The target never changes
+    #   so it is stored once as a constant channel
+    recorder            = Trajectory_Recorder(
+        [
+            "timestamp",                # Time of the simulation
+            "estimated_position",       # Where the system thinks it is
+            "actual_position",          # Where the system actually is
+            "velocity",                 # Current speed of the robot
+            "control_effort",           # Signal the controller passes to actuators
+            "solution_drift",           # How far off is estimated position from actual position
+        ],
+        constants = {"target_line" : target},
+        keep      = keep_trajectory,
+    )
+
+    # Optionally stream every step to disk as well
+    if(telemetry is not None):
+        from src.sim.telemetry import Telemetry_Writer
+
+        recorder.stream_to(Telemetry_Writer(telemetry, recorder.channels, recorder.constants))
+
+    recorder.record(0, 0, 0, 0, 0, 0)
+
+    cur_time            = 0
+    estimated_location  = 0
+    actual_location     = 0
+    actual_velocity     = 0
+    percent_drift       = 0
+
+    # Steady state window over the estimated position, seeded with the initial sample
+    position_stats      = Rolling_Stats(steady_state_condition / time_step_s)
+    position_stats.update(0)
+
+    # Time each stage of the loop when profiling
+    if(profiler is not None):
+        profiler.wrap_all([(motor_actuators, "rotate"), (recorder, "record"), (position_stats, "update"), (position_stats, "std")])
+        profiler.start()
 
     target_reached      = 0     # Time at which the target was actually met
 
-    # Using an open loop velocity model, we estimate that with the peak RPM
-    #   the robot will always travel at a constant speed
-
-    wheel_rps           = (motor_max_rpm / 60) / wheel.gear_ratio
-    estimated_velocity  = wheel_rps * wheel.circumference_meters
-    # Assume velocity can only be measured with 0.01 m/s accuracy
-    estimated_velocity  = (int(estimated_velocity * 100) / 100.0) + random.gauss(0,0.01)
-
-    travel_time         = target_line[-1] / estimated_velocity
-    print(travel_time)
+    estimated_velocity  = planned_velocity(motor_actuators, motor_max_rpm, velocity_rng)
+    travel_time         = target / estimated_velocity
 
     # Run the simulation as long as the steady state critera hasn't been met
     steady_state        = False
+    settling_time       = None
     while(not steady_state):
 
         # Update the timestamp from the previous timestamp
-        cur_time        = timestamp[-1] + time_step_s
+        cur_time        = cur_time + time_step_s
 
         # If the current timestamp is below the travel time, move forward
         if(cur_time <= travel_time):
@@ -65,77 +113,213 @@ def sim():
             actual_velocity     = distance_forward / time_step_s
 
             # Estimate current location
-            estimated_location  = estimated_position[-1] + estimated_velocity * time_step_s
+            estimated_location  = estimated_location + estimated_velocity * time_step_s
 
             # Calculate the actual location
-            actual_location     = actual_position[-1] + distance_forward
+            actual_location     = actual_location + distance_forward
 
             # Calculate solution drift
             percent_drift       = ((estimated_location - actual_location) / actual_location) * 100.0
 
-            # Append the simulation arrays
-            target_line.append(target_line[-1])             # Target Line's value never changes, but needs to be as long as the sim
-            estimated_position.append(estimated_location)
-            actual_position.append(actual_location)
-            velocity.append(actual_velocity)
-            timestamp.append(cur_time)
-            control_effort.append(1)
-            solution_drift.append(percent_drift)
+            control_effort      = 1
 
         # If we think we've ran out of travel time
         else:
-            # Keep updating actual position based upon slowdown rate
+            # Keep updating actual position based upon slowdown rate. Everything
+            #   else just keeps what it was
             distance_forward    = motor_actuators.rotate(dc_motor.DC_Motor.motor_directions["Sustain"])
-            actual_location     = actual_position[-1] + distance_forward
+            actual_location     = actual_location + distance_forward
 
-            # Append the simulation arrays, just updated everything to what they were
-            target_line.append(target_line[-1])                 # Target Line's value never changes, but needs to be as long as the sim
-            estimated_position.append(estimated_position[-1])
-            actual_position.append(actual_location)
-            velocity.append(velocity[-1])
-            solution_drift.append(solution_drift[-1])
+            control_effort      = 0
 
-            # These two sim arrays are special
-            timestamp.append(cur_time)
-            control_effort.append(0)
+        recorder.record(
+            cur_time,
+            estimated_location,
+            actual_location,
+            actual_velocity,
+            control_effort,
+            percent_drift,
+        )
+
+        # Keep a running spread of the last steady_state_condition seconds of estimates
+        position_stats.update(estimated_location)
 
         # Determine if we've reach steady state, if that much time as passed to start checking
         if(cur_time >= steady_state_condition):
-            sample_size = steady_state_condition / time_step_s
             # Get the standard deviation
-            standard_deviation  = np.std(estimated_position[int(0-sample_size):])
+            standard_deviation  = position_stats.std()
 
             # If the standard deviation is 0.01% of the target distance, we've reached steady state
-            if (standard_deviation < (target_line[-1] * 0.0001)):
-                steady_state = True
+            if (standard_deviation < (target * 0.0001)):
+                steady_state    = True
+                settling_time   = cur_time
 
-        # If the simulation has gone on longer than 360 seconds, enough is enough
-        if( cur_time > 360):
+        # If the simulation has gone on longer than the cap, enough is enough
+        if( cur_time > max_time_s):
             steady_state = True
 
-    # Plot the results from the simulation
+    if(profiler is not None):
+        profiler.stop()
+
+    recorder.close()
+
+    return Sim_Result(
+        "Open Loop Solution",
+        recorder.as_array("timestamp"),
+        recorder.as_array("target_line"),
+        recorder.as_array("estimated_position"),
+        recorder.as_array("actual_position"),
+        recorder.as_array("control_effort"),
+        recorder.as_array("solution_drift"),
+        actual_velocity = recorder.as_array("velocity"),
+        settling_time   = settling_time,
+        travel_time     = travel_time,
+    )
+
+# Adaptive step version of run(). The plant is only stepped one time_step_s at a
+#   time while the motor is ramping. While it is saturated at max rpm or stopped
+#   nothing changes from step to step, so the whole stretch up to the next command
+#   change is taken in one step. The target crossing is located by interpolating
+#   inside a step, and steady state by bisecting for the first time_step_s grid
+#   point that would have passed the windowed test
+# Only the open loop sim has an adaptive version. The closed loop sims draw fresh
+#   accelerometer noise and run the estimator and the controller on every sample, so
+#   their plant is never quiet for a stretch of steps, and the deadband and steady
+#   state tests act on that noisy estimate. Taking bigger steps there would change
+#   the noise the estimate sees rather than skip work, so they stay fixed step
+#   output_step_s           None returns the variable step points, otherwise they are
+#                             interpolated onto a uniform grid with this spacing
+def run_adaptive(time_step_s             = 0.01,
+                 motor_max_rpm           = 120,
+                 steady_state_condition  = 5,
+                 target                  = 10,
+                 max_time_s              = 360,
+                 seed                    = None,
+                 vehicle                 = None,
+                 output_step_s           = None):
+    import math
+    import numpy as np
+    from src.sim.events import crossing_time, first_true, resample
+
+    # Same noise streams as run(), so a seed plans the same trip
+    motor_rng, velocity_rng = noise.spawn(seed, 2)
+
+    motor_actuators     = dc_motor.DC_Motor(time_step_s, motor_max_rpm, motor_rng, vehicle)
+    estimated_velocity  = planned_velocity(motor_actuators, motor_max_rpm, velocity_rng)
+    travel_time         = target / estimated_velocity
+
+    # Everything below counts in whole time_step_s steps, the grid run() walks
+    forward_steps       = int(math.floor(travel_time / time_step_s))
+    window              = int(steady_state_condition / time_step_s)
+    first_check         = int(math.ceil((steady_state_condition / time_step_s) - 1e-9))
+    last_step           = int(math.floor(max_time_s / time_step_s)) + 1
+    threshold           = target * 0.0001
+
+    # Points the plant was evaluated at, [step, estimated, actual, velocity, effort, drift]
+    points              = [[0, 0, 0, 0, 0, 0]]
+
+    # Estimated position on any grid step, exact since it is linear between points
+    def estimated_at(steps):
+        point_steps = [point[0] for point in points]
+        estimates   = [point[1] for point in points]
+        return np.interp(steps, point_steps, estimates)
+
+    # The Rolling_Stats window run() tests, ending on step
+    def steady_at(step):
+        window_steps = np.arange(max(0, step - window + 1), step + 1)
+        return np.std(estimated_at(window_steps)) < threshold
+
+    steps_taken         = 0
+    target_time         = None
+    settling_time       = None
+    step                = 0
+    while(step < last_step):
+        forward         = (step + 1) <= forward_steps
+        if(forward):
+            direction   = dc_motor.DC_Motor.motor_directions["Forwards"]
+            quiet       = motor_actuators.cur_rpm == motor_actuators.max_rpm
+            end         = forward_steps
+        else:
+            direction   = dc_motor.DC_Motor.motor_directions["Sustain"]
+            quiet       = motor_actuators.cur_rpm == 0
+            end         = last_step
+
+        # One rotate() gives the distance for every step of a quiet stretch
+        count           = (end - step) if quiet else 1
+        distance        = motor_actuators.rotate(direction)
+        steps_taken     += 1
+
+        start           = points[-1]
+        actual          = start[2] + (count * distance)
+        if(forward):
+            estimated   = start[1] + (count * estimated_velocity * time_step_s)
+            velocity    = distance / time_step_s
+            drift       = ((estimated - actual) / actual) * 100.0
+            effort      = 1
+        else:
+            estimated, velocity, drift = start[1], start[3], start[5]
+            effort      = 0
+
+        # The step changes the held values, so a long stretch gets a point after its
+        #   first step as well to keep the interpolation linear
+        if(count > 1):
+            points.append([step + 1, start[1] + ((estimated - start[1]) / count),
+                           start[2] + distance, velocity, effort, drift])
+        points.append([step + count, estimated, actual, velocity, effort, drift])
+
+        # Target crossing event
+        if(target_time is None):
+            target_time = crossing_time(step * time_step_s, start[2], (step + count) * time_step_s, actual, target)
+
+        # Steady state event, the first grid step in this stretch that passes. Once the
+        #   window passes it keeps passing: the estimate holds still from then on, so
+        #   every later window only swaps an older sample for the held value
+        if(step + count >= first_check):
+            settled     = first_true(steady_at, max(step + 1, first_check), step + count)
+            if(settled is not None):
+                if(settled < step + count):
+                    # Cut the stretch short at the event
+                    fraction    = (settled - step) / count
+                    points[-1]  = [settled,
+                                   start[1] + (fraction * (estimated - start[1])),
+                                   start[2] + (fraction * (actual - start[2])),
+                                   velocity, effort, drift]
+                settling_time   = settled * time_step_s
+                break
+
+        step            += count
+
+    points              = np.array(points)
+    timestamp           = points[:, 0] * time_step_s
+    channels            = [points[:, column] for column in range(1, 6)]
+    if(output_step_s is not None):
+        timestamp, *channels = resample(timestamp, output_step_s, *channels)
+    estimated, actual, velocity, effort, drift = channels
+
+    result = Sim_Result(
+        "Open Loop Solution\n(Adaptive Step)",
+        timestamp,
+        np.full(len(timestamp), target, dtype=np.float64),
+        estimated,
+        actual,
+        effort,
+        drift,
+        actual_velocity = velocity,
+        settling_time   = settling_time,
+        travel_time     = travel_time,
+        target_time     = target_time,
+        steps_taken     = steps_taken,
+    )
+    return result
+
+
+def sim(show = True):
+    import src.sim.plotting as plotting
+
+    result = run()
+    print(result.travel_time)
 
     # Plot the results from the simulation
+    plotting.plot_result(result, show)
 
-    fig, ax1 = plt.subplots()
-
-    # ax2 = ax1.twinx()
-
-    ax1.plot(timestamp, target_line,            'r',    label="Target Position")
-    ax1.plot(timestamp, estimated_position,     'm',    label="Estimated Position")
-    ax1.plot(timestamp, actual_position,        'c',    label="Actual Position")
-    # ax2.plot(timestamp, solution_drift,         'k',    label="Solution Drift")
-    ax1.plot(timestamp, control_effort,         'b',    label="Control Effort")
-
-    ax1.legend()
-    # ax2.legend()
-
-    ax1.set_ylabel("Position (m)")
-    # ax2.set_ylabel("Solution % Deviation")
-
-    ax1.set_xlabel("Time (s)")
-    ax1.set_title("Open Loop Solution")
-
-    plt.show()
-
-
+    return result
@@ -0,0 +1,117 @@
+###########################################################
+#
+#   FILENAME:       inertial_navigation.py
+#
+#   DESCRIPTION:    Inertial navigation with a continuous
+#                     rotation servo drivetrain. The position
+#                     comes from double integrating filtered
+#                     accelerometer readings and the PID
+#                     output commands the servo speed
+#
+###########################################################
+
+import  numpy                                   as np
+import  src.models.noise                        as noise
+from    src.models.continuous_velocity_bank     import Continuous_Velocity_Bank
+from    src.models.accelerometer_bank           import Accelerometer_Bank
+from    src.models.pid_bank                     import PID_Bank
+from    src.models.ra_filter                    import RA_Filter
+import  src.sim.batch                           as batch
+
+
+class Inertial_Navigation_Core:
+    def __init__(self, count, time_step_s, motor_max_rpm, filter_length, controller_threshold,
+                 kp, ki, kd, target, motor_rng, accel_rng, vehicle):
+        self.count                  = count
+        self.time_step_s            = time_step_s
+        self.target                 = target
+        self.controller_threshold   = controller_threshold
+        self.servos                 = Continuous_Velocity_Bank(time_step_s, motor_max_rpm, count, motor_rng, vehicle)
+        self.controller             = PID_Bank(time_step_s, kp, ki, kd, count)
+        self.accel                  = Accelerometer_Bank(time_step_s, count, accel_rng)
+        self.filter                 = RA_Filter(filter_length)
+
+        self.estimated_position     = np.zeros(count)
+        self.estimated_velocity     = np.zeros(count)
+        self.actual_position        = np.zeros(count)
+        self.control_effort         = np.zeros(count)
+
+    def step(self, cur_time):
+        # PID on the estimated error, as a fraction of full speed
+        effort                      = self.controller.process(self.target - self.estimated_position)
+        self.control_effort, rpm    = self.servos.rpm_from_effort(effort, self.controller_threshold)
+        self.actual_position        = self.actual_position + self.servos.rotate(rpm)
+
+        # Filter the detected acceleration and double integrate it
+        est_accel                   = self.filter.filter(self.accel.get_accel(self.actual_position))
+        self.estimated_velocity     = self.estimated_velocity + (est_accel * self.time_step_s)
+        self.estimated_position     = self.estimated_position + (self.estimated_velocity * self.time_step_s)
+
+    def select(self, keep):
+        self.servos.select(keep)
+        self.controller.select(keep)
+        self.accel.select(keep)
+        self.filter.select(keep)
+        self.estimated_position     = self.estimated_position[keep]
+        self.estimated_velocity     = self.estimated_velocity[keep]
+        self.actual_position        = self.actual_position[keep]
+        self.control_effort         = self.control_effort[keep]
+        self.count                  = len(self.actual_position)
+
+
+# Simulation constraints
+#   num_runs                Scenarios to simulate at once, each with its own noise
+#   time_step_s             Simulate the robot in time increments of 10 milliseconds
+#   motor_max_rpm           Max RPM of the servo is 100 RPM
+#   steady_state_condition  The robot needs to sit almost still for 5 seconds
+#   filter_length           Running average length, defaults to half a second of samples
+#   controller_threshold    Deadband on the control effort
+#   kp, ki, kd              PID gains, the effort is a fraction of full speed
+#   target                  Target distance in meters
+#   max_time_s              If the simulation goes on longer than this, enough is enough
+#   seed                    Seed or NumPy Generator for the noise streams, None for an unseeded run
+#   vehicle                 Vehicle_Spec of the robot, None for the wheel / vehicle_mass module values
+#   record                  True to also record the trajectory of the first scenario
+# Returns a Monte_Carlo_Result and a Sim_Result of the recorded trajectory, None without record
+def run_batch(num_runs,
+              time_step_s               = 0.01,
+              motor_max_rpm             = 100,
+              steady_state_condition    = 5,
+              filter_length             = None,
+              controller_threshold      = 0.01,
+              kp                        = 0.5,
+              ki                        = 1,
+              kd                        = 2,
+              target                    = 10,
+              max_time_s                = 360,
+              seed                      = None,
+              vehicle                   = None,
+              record                    = False):
+
+    if(filter_length is None):
+        filter_length = int(0.5 / time_step_s)
+
+    # Independent noise streams for the servos and the accelerometer
+    motor_rng, accel_rng = noise.spawn(seed, 2)
+
+    core = Inertial_Navigation_Core(num_runs, time_step_s, motor_max_rpm, filter_length, controller_threshold,
+                                    kp, ki, kd, target, motor_rng, accel_rng, vehicle)
+    return batch.simulate(core, "Servo Inertial Navigation / Dead Reckoning\n(Filtered)",
+                          time_step_s, steady_state_condition, 0.001, target, max_time_s, record)
+
+
+# A single scenario with its trajectory, returns a Sim_Result
+def run(**kwargs):
+    results, result = run_batch(1, record = True, **kwargs)
+    return result
+
+
+def sim(show = True):
+    import src.sim.plotting as plotting
+
+    result = run()
+
+    # Plot the results from the simulation
+    plotting.plot_result(result, show)
+
+    return result
@@ -0,0 +1,99 @@
+###########################################################
+#
+#   FILENAME:       open_loop.py
+#
+#   DESCRIPTION:    Open loop control of a continuous
+#                     rotation servo drivetrain. Commands
+#                     full speed for the time the planned
+#                     velocity says the trip takes, then stops
+#
+###########################################################
+
+import  numpy                                   as np
+import  src.models.noise                        as noise
+from    src.models.continuous_velocity_bank     import Continuous_Velocity_Bank
+import  src.sim.batch                           as batch
+
+
+class Open_Loop_Core:
+    def __init__(self, count, time_step_s, motor_max_rpm, target, motor_rng, velocity_rng, vehicle):
+        self.count              = count
+        self.time_step_s        = time_step_s
+        self.servos             = Continuous_Velocity_Bank(time_step_s, motor_max_rpm, count, motor_rng, vehicle)
+
+        # Using an open loop velocity model, we estimate that with the peak RPM
+        #   the robot will always travel at a constant speed. Assume velocity can
+        #   only be measured with 0.01 m/s accuracy
+        wheel_rps               = (motor_max_rpm / 60) / self.servos.vehicle.gear_ratio
+        planned_velocity        = wheel_rps * self.servos.vehicle.circumference_meters
+        self.planned_velocity   = (int(planned_velocity * 100) / 100.0) + velocity_rng.normal(0, 0.01, count)
+        self.travel_time        = target / self.planned_velocity
+
+        self.estimated_position = np.zeros(count)
+        self.estimated_velocity = np.zeros(count)
+        self.actual_position    = np.zeros(count)
+        self.control_effort     = np.zeros(count)
+
+    def step(self, cur_time):
+        # Drive at full speed until the planned travel time runs out
+        moving                  = cur_time <= self.travel_time
+        self.control_effort     = moving.astype(np.float64)
+        self.actual_position    = self.actual_position + self.servos.rotate(self.control_effort * self.servos.max_rpm)
+
+        self.estimated_velocity = np.where(moving, self.planned_velocity, 0)
+        self.estimated_position = self.estimated_position + (self.estimated_velocity * self.time_step_s)
+
+    def select(self, keep):
+        self.servos.select(keep)
+        self.planned_velocity   = self.planned_velocity[keep]
+        self.travel_time        = self.travel_time[keep]
+        self.estimated_position = self.estimated_position[keep]
+        self.estimated_velocity = self.estimated_velocity[keep]
+        self.actual_position    = self.actual_position[keep]
+        self.control_effort     = self.control_effort[keep]
+        self.count              = len(self.actual_position)
+
+
+# Simulation constraints
+#   num_runs                Scenarios to simulate at once, each with its own noise
+#   time_step_s             Simulate the robot in time increments of 10 milliseconds
+#   motor_max_rpm           Max RPM of the servo is 100 RPM
+#   steady_state_condition  The robot needs to sit almost still for 5 seconds
+#   target                  Target distance in meters
+#   max_time_s              If the simulation goes on longer than this, enough is enough
+#   seed                    Seed or NumPy Generator for the noise streams, None for an unseeded run
+#   vehicle                 Vehicle_Spec of the robot, None for the wheel / vehicle_mass module values
+#   record                  True to also record the trajectory of the first scenario
+# Returns a Monte_Carlo_Result and a Sim_Result of the recorded trajectory, None without record
+def run_batch(num_runs,
+              time_step_s               = 0.01,
+              motor_max_rpm             = 100,
+              steady_state_condition    = 5,
+              target                    = 10,
+              max_time_s                = 360,
+              seed                      = None,
+              vehicle                   = None,
+              record                    = False):
+
+    # Independent noise streams for the servos and the velocity measurement
+    motor_rng, velocity_rng = noise.spawn(seed, 2)
+
+    core = Open_Loop_Core(num_runs, time_step_s, motor_max_rpm, target, motor_rng, velocity_rng, vehicle)
+    return batch.simulate(core, "Servo Open Loop Solution", time_step_s, steady_state_condition, 0.0001, target, max_time_s, record)
+
+
+# A single scenario with its trajectory, returns a Sim_Result
+def run(**kwargs):
+    results, result = run_batch(1, record = True, **kwargs)
+    return result
+
+
+def sim(show = True):
+    import src.sim.plotting as plotting
+
+    result = run()
+
+    # Plot the results from the simulation
+    plotting.plot_result(result, show)
+
+    return result
@@ -0,0 +1,133 @@
+###########################################################
+#
+#   FILENAME:       path_following.py
+#
+#   DESCRIPTION:    Waypoint route following with a
+#                     differential drive of two continuous
+#                     rotation servos. Each tick the robot is
+#                     matched to the nearest route segment,
+#                     one PID sets the forward speed from the
+#                     distance left to drive and another steers
+#                     towards the lookahead point
+#
+###########################################################
+
+import  math
+import  numpy                                   as np
+import  src.models.noise                        as noise
+from    src.models.continuous_velocity          import Continuous_Velocity
+from    src.models.differential_drive           import Differential_Drive
+from    src.models.path_tracker                 import Path_Tracker
+from    src.models.pid                          import PID
+from    src.models.vehicle_spec                 import Vehicle_Spec
+from    src.sim.recorder                        import Trajectory_Recorder
+from    src.sim.result                          import Path_Result
+
+
+# Demo route, an S bend out and back across a 2 meter wide strip sampled every centimeter
+def demo_route():
+    along   = np.linspace(0, 6, 601)
+    return np.stack((along, np.sin(along * (2 * np.pi / 6))), axis=1)
+
+
+# Simulation constraints
+#   waypoints               Route as a sequence of (x, y) points in meters, None for the demo route
+#   time_step_s             Simulate the robot in time increments of 10 milliseconds
+#   motor_max_rpm           Max RPM of the servos is 100 RPM
+#   lookahead_meters        How far down the route the robot steers towards
+#   speed_kp, ki, kd        PID gains from the distance left to drive to a fraction of full speed
+#   steer_kp, ki, kd        PID gains from the heading error to the lookahead point to a
+#                             fraction of full speed added to one side and taken from the other
+#   goal_tolerance          The run is over once the robot is this close to the last waypoint
+#   max_time_s              If the simulation goes on longer than this, enough is enough
+#   seed                    Seed or NumPy Generator for the noise streams, None for an unseeded run
+#   vehicle                 Vehicle_Spec of the robot, None for the wheel / vehicle_mass module values
+def run(waypoints                   = None,
+        time_step_s                 = 0.01,
+        motor_max_rpm               = 100,
+        lookahead_meters            = 0.3,
+        speed_kp                    = 4,
+        speed_ki                    = 0,
+        speed_kd                    = 0,
+        steer_kp                    = 1,
+        steer_ki                    = 0,
+        steer_kd                    = 0.05,
+        goal_tolerance              = 0.05,
+        max_time_s                  = 360,
+        seed                        = None,
+        vehicle                     = None):
+
+    if(waypoints is None):
+        waypoints = demo_route()
+    if(vehicle is None):
+        vehicle = Vehicle_Spec.from_globals()
+
+    # Independent noise streams for the left and right servos
+    left_rng, right_rng = noise.spawn(seed, 2)
+
+    left_servo          = Continuous_Velocity(time_step_s, motor_max_rpm, left_rng, vehicle)
+    right_servo         = Continuous_Velocity(time_step_s, motor_max_rpm, right_rng, vehicle)
+    tracker             = Path_Tracker(waypoints, lookahead_meters)
+    speed_controller    = PID(time_step_s, speed_kp, speed_ki, speed_kd)
+    steer_controller    = PID(time_step_s, steer_kp, steer_ki, steer_kd)
+    max_rpm             = left_servo.max_rpm
+
+    # Start on the first waypoint facing along the first segment
+    start               = tracker.point_at(0.0)
+    drive               = Differential_Drive(vehicle, start[0], start[1],
+                                             math.atan2(tracker.directions[0, 1], tracker.directions[0, 0]))
+
+    recorder            = Trajectory_Recorder(["timestamp", "x", "y", "heading", "along_track", "cross_track"])
+
+    cur_time            = 0
+    finish_time         = None
+    while(cur_time < max_time_s):
+
+        along_track, cross_track = tracker.locate(drive.x, drive.y)
+        recorder.record(cur_time, drive.x, drive.y, drive.heading, along_track, cross_track)
+
+        remaining   = tracker.remaining()
+        if((remaining < goal_tolerance) and
+           (math.hypot(drive.x - tracker.end_point[0], drive.y - tracker.end_point[1]) < goal_tolerance)):
+            finish_time = cur_time
+            break
+
+        # Heading error to the lookahead point, wrapped to +/- pi. Being off to one
+        #   side of the route turns the lookahead point towards it, so this carries
+        #   the cross track error as well as the heading of the route
+        target      = tracker.lookahead_point()
+        if(remaining < lookahead_meters):
+            target  = (float(tracker.end_point[0]), float(tracker.end_point[1]))
+        bearing     = math.atan2(target[1] - drive.y, target[0] - drive.x)
+        heading_error = math.remainder(bearing - drive.heading, 2 * math.pi)
+
+        # Slow down for sharp turns so the robot doesn't swing wide of the route
+        forward     = min(max(speed_controller.process(remaining), 0.0), 1.0) * max(math.cos(heading_error), 0.0)
+        turn        = steer_controller.process(heading_error)
+
+        left_rpm    = min(max(forward - turn, -1.0), 1.0) * max_rpm
+        right_rpm   = min(max(forward + turn, -1.0), 1.0) * max_rpm
+        drive.move(left_servo.rotate(left_rpm), right_servo.rotate(right_rpm))
+
+        cur_time    += time_step_s
+
+    return Path_Result("Servo Waypoint Path Following",
+                       tracker.starts.tolist() + [tracker.end_point.tolist()],
+                       recorder.as_array("timestamp"),
+                       recorder.as_array("x"),
+                       recorder.as_array("y"),
+                       recorder.as_array("heading"),
+                       recorder.as_array("along_track"),
+                       recorder.as_array("cross_track"),
+                       finish_time)
+
+
+def sim(show = True):
+    import src.sim.plotting as plotting
+
+    result = run()
+
+    # Plot the results from the simulation
+    plotting.plot_path(result, show)
+
+    return result
@@ -0,0 +1,110 @@
+###########################################################
+#
+#   FILENAME:       velocity_navigation.py
+#
+#   DESCRIPTION:    Velocity feedback navigation with a
+#                     continuous rotation servo drivetrain.
+#                     The position comes from integrating the
+#                     measured wheel speed once, and the PID
+#                     output commands the servo speed
+#
+###########################################################
+
+import  numpy                                   as np
+import  src.models.noise                        as noise
+from    src.models.continuous_velocity_bank     import Continuous_Velocity_Bank
+from    src.models.pid_bank                     import PID_Bank
+import  src.sim.batch                           as batch
+
+
+class Velocity_Navigation_Core:
+    def __init__(self, count, time_step_s, motor_max_rpm, controller_threshold, kp, ki, kd,
+                 velocity_noise_std, target, motor_rng, velocity_rng, vehicle):
+        self.count                  = count
+        self.time_step_s            = time_step_s
+        self.target                 = target
+        self.controller_threshold   = controller_threshold
+        self.servos                 = Continuous_Velocity_Bank(time_step_s, motor_max_rpm, count, motor_rng, vehicle)
+        self.controller             = PID_Bank(time_step_s, kp, ki, kd, count)
+        self.velocity_noise         = noise.Gaussian_Noise_Bank(velocity_noise_std, count, velocity_rng)
+
+        self.estimated_position     = np.zeros(count)
+        self.estimated_velocity     = np.zeros(count)
+        self.actual_position        = np.zeros(count)
+        self.control_effort         = np.zeros(count)
+
+    def step(self, cur_time):
+        # PID on the estimated error, as a fraction of full speed
+        effort                      = self.controller.process(self.target - self.estimated_position)
+        self.control_effort, rpm    = self.servos.rpm_from_effort(effort, self.controller_threshold)
+        distance_traveled           = self.servos.rotate(rpm)
+        self.actual_position        = self.actual_position + distance_traveled
+
+        # Measure the wheel speed and integrate it once
+        self.estimated_velocity     = (distance_traveled / self.time_step_s) + self.velocity_noise.sample()
+        self.estimated_position     = self.estimated_position + (self.estimated_velocity * self.time_step_s)
+
+    def select(self, keep):
+        self.servos.select(keep)
+        self.controller.select(keep)
+        self.velocity_noise.select(keep)
+        self.estimated_position     = self.estimated_position[keep]
+        self.estimated_velocity     = self.estimated_velocity[keep]
+        self.actual_position        = self.actual_position[keep]
+        self.control_effort         = self.control_effort[keep]
+        self.count                  = len(self.actual_position)
+
+
+# Simulation constraints
+#   num_runs                Scenarios to simulate at once, each with its own noise
+#   time_step_s             Simulate the robot in time increments of 10 milliseconds
+#   motor_max_rpm           Max RPM of the servo is 100 RPM
+#   steady_state_condition  The robot needs to sit almost still for 5 seconds
+#   controller_threshold    Deadband on the control effort
+#   kp, ki, kd              PID gains, the effort is a fraction of full speed
+#   velocity_noise_std      Wheel speed measurement noise in m/s
+#   target                  Target distance in meters
+#   max_time_s              If the simulation goes on longer than this, enough is enough
+#   seed                    Seed or NumPy Generator for the noise streams, None for an unseeded run
+#   vehicle                 Vehicle_Spec of the robot, None for the wheel / vehicle_mass module values
+#   record                  True to also record the trajectory of the first scenario
+# Returns a Monte_Carlo_Result and a Sim_Result of the recorded trajectory, None without record
+def run_batch(num_runs,
+              time_step_s               = 0.01,
+              motor_max_rpm             = 100,
+              steady_state_condition    = 5,
+              controller_threshold      = 0.01,
+              kp                        = 0.5,
+              ki                        = 1,
+              kd                        = 0.1,
+              velocity_noise_std        = 0.01,
+              target                    = 10,
+              max_time_s                = 360,
+              seed                      = None,
+              vehicle                   = None,
+              record                    = False):
+
+    # Independent noise streams for the servos and the velocity measurement
+    motor_rng, velocity_rng = noise.spawn(seed, 2)
+
+    core = Velocity_Navigation_Core(num_runs, time_step_s, motor_max_rpm, controller_threshold, kp, ki, kd,
+                                    velocity_noise_std, target, motor_rng, velocity_rng, vehicle)
+    return batch.simulate(core, "Servo Velocity Feedback Navigation", time_step_s,
+                          steady_state_condition, 0.001, target, max_time_s, record)
+
+
+# A single scenario with its trajectory, returns a Sim_Result
+def run(**kwargs):
+    results, result = run_batch(1, record = True, **kwargs)
+    return result
+
+
+def sim(show = True):
+    import src.sim.plotting as plotting
+
+    result = run()
+
+    # Plot the results from the simulation
+    plotting.plot_result(result, show)
+
+    return result
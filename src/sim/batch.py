@@ -0,0 +1,151 @@
+###########################################################
+#
+#   FILENAME:       batch.py
+#
+#   DESCRIPTION:    Batched simulation core shared by the
+#                     Monte Carlo and servo sims. A core steps
+#                     N scenarios at once as NumPy arrays,
+#                     simulate() drives it, detects steady
+#                     state per scenario and compacts finished
+#                     scenarios out. The per scenario outcome
+#                     is a Monte_Carlo_Result
+#
+###########################################################
+
+import  numpy                       as np
+from    src.models.rolling_stats    import Rolling_Stats
+from    src.sim.recorder            import Trajectory_Recorder
+from    src.sim.result              import Sim_Result
+
+
+class Monte_Carlo_Result:
+    def __init__(self, num_runs, target):
+        self.num_runs           = num_runs
+        self.target             = target
+        self.settled            = np.zeros(num_runs, dtype=bool)    # Did the run reach steady state before the time cap
+        self.settling_time      = np.full(num_runs, np.nan)         # Time at which steady state was detected
+        self.final_position     = np.zeros(num_runs)                # Where the robot actually ended up
+        self.final_estimate     = np.zeros(num_runs)                # Where the robot thinks it ended up
+        self.final_error        = np.zeros(num_runs)                # Target minus actual final position
+        self.final_drift        = np.zeros(num_runs)                # Estimated minus actual final position
+        self.max_abs_drift      = np.zeros(num_runs)                # Worst estimate error seen during the run
+
+    # Spread of each per-run statistic across the batch
+    def summary(self):
+        stats = {}
+        for name in ("settling_time", "final_error", "final_drift", "max_abs_drift"):
+            values = getattr(self, name)
+            values = values[np.isfinite(values)]
+            if(len(values) == 0):
+                stats[name] = None
+                continue
+
+            stats[name] = {
+                "mean"  : float(np.mean(values)),
+                "std"   : float(np.std(values)),
+                "min"   : float(np.min(values)),
+                "p50"   : float(np.percentile(values, 50)),
+                "p95"   : float(np.percentile(values, 95)),
+                "max"   : float(np.max(values)),
+            }
+
+        stats["settled_fraction"] = float(np.mean(self.settled))
+        return stats
+
+    # Per-run statistics in the order monte_carlo.sim_batches() streams them
+    channels = ["settled", "settling_time", "final_position", "final_estimate",
+                "final_error", "final_drift", "max_abs_drift"]
+
+    def columns(self):
+        return [getattr(self, name) for name in Monte_Carlo_Result.channels]
+
+
+# Steps core until every scenario has held still for steady_state_condition
+#   seconds or max_time_s runs out. A core has count, step(cur_time), select(keep) and
+#   estimated_position, estimated_velocity, actual_position and control_effort
+#   arrays. Steady state is the estimated position's spread staying under
+#   target * tolerance. Returns a Monte_Carlo_Result and, with record = True, a
+#   Sim_Result with the trajectory of the first scenario, otherwise None
+def simulate(core, title, time_step_s, steady_state_condition, tolerance, target, max_time_s, record = False):
+    num_runs            = core.count
+    results             = Monte_Carlo_Result(num_runs, target)
+    run_index           = np.arange(num_runs)
+    max_abs_drift       = np.zeros(num_runs)
+
+    recorder            = None
+    if(record):
+        recorder        = Trajectory_Recorder(
+            [
+                "timestamp",
+                "estimated_position",
+                "estimated_velocity",
+                "actual_position",
+                "control_effort",
+                "solution_drift",
+            ],
+            constants = {"target_line" : target},
+        )
+        recorder.record(0, 0, 0, 0, 0, 0)
+
+    # Window of estimated positions for the steady state test, seeded with the
+    #   initial position like the single run sims
+    position_stats      = Rolling_Stats(steady_state_condition / time_step_s)
+    position_stats.update(np.zeros(num_runs))
+    threshold           = target * tolerance
+
+    cur_time            = 0
+    while(len(run_index) > 0):
+        cur_time        = cur_time + time_step_s
+        core.step(cur_time)
+
+        drift           = core.estimated_position - core.actual_position
+        max_abs_drift   = np.maximum(max_abs_drift, np.abs(drift))
+
+        # The first scenario is recorded until it finishes
+        if((recorder is not None) and (run_index[0] == 0)):
+            percent_drift = abs(drift[0] / core.estimated_position[0]) * 100 if core.estimated_position[0] else 0.0
+            recorder.record(cur_time, core.estimated_position[0], core.estimated_velocity[0],
+                            core.actual_position[0], core.control_effort[0], percent_drift)
+
+        position_stats.update(core.estimated_position)
+
+        done            = np.zeros(len(run_index), dtype=bool)
+        if(cur_time >= steady_state_condition):
+            done                                    = position_stats.std() < threshold
+            results.settled[run_index[done]]        = True
+            results.settling_time[run_index[done]]  = cur_time
+
+        # If the simulation has gone on longer than the cap, enough is enough
+        if(cur_time > max_time_s):
+            done[:]     = True
+
+        if(np.any(done)):
+            finished                            = run_index[done]
+            results.final_position[finished]    = core.actual_position[done]
+            results.final_estimate[finished]    = core.estimated_position[done]
+            results.max_abs_drift[finished]     = max_abs_drift[done]
+
+            keep            = ~done
+            run_index       = run_index[keep]
+            max_abs_drift   = max_abs_drift[keep]
+            position_stats.select(keep)
+            core.select(keep)
+
+    results.final_error = target - results.final_position
+    results.final_drift = results.final_estimate - results.final_position
+
+    if(recorder is None):
+        return results, None
+
+    settling_time = float(results.settling_time[0]) if results.settled[0] else None
+    return results, Sim_Result(
+        title,
+        recorder.as_array("timestamp"),
+        recorder.as_array("target_line"),
+        recorder.as_array("estimated_position"),
+        recorder.as_array("actual_position"),
+        recorder.as_array("control_effort"),
+        recorder.as_array("solution_drift"),
+        estimated_velocity  = recorder.as_array("estimated_velocity"),
+        settling_time       = settling_time,
+    )
@@ -0,0 +1,362 @@
+###########################################################
+#
+#   FILENAME:       cache.py
+#
+#   DESCRIPTION:    Content addressed cache of sim results.
+#                     Entries are keyed on a hash of the sim
+#                     name, its full configuration with the
+#                     run() defaults filled in and the source
+#                     of the models / sims, and hold the
+#                     metrics summary plus, optionally, the
+#                     whole trajectory. Files are written
+#                     atomically so any number of worker
+#                     processes can share one cache directory,
+#                     and the least recently used entries are
+#                     evicted once it grows past its size bound.
+#                     Runs without a seed are never cached
+#
+#                     <directory>/<key[:2]>/<key>.json   summary
+#                     <directory>/<key[:2]>/<key>.npz    trajectory
+#
+###########################################################
+
+import  functools
+import  hashlib
+import  inspect
+import  json
+import  os
+import  uuid
+from    src.models.spec     import Spec
+import  src.sim.metrics     as metrics
+from    src.sim.result      import Sim_Result
+
+# Packages whose source decides what a run produces
+source_packages = ["models", "motor", "servo", "sim"]
+
+# Sim_Result array channels saved with a trajectory
+trajectory_channels = [
+    "timestamp",
+    "target_line",
+    "estimated_position",
+    "actual_position",
+    "control_effort",
+    "solution_drift",
+    "estimated_velocity",
+    "estimated_acceleration",
+    "actual_velocity",
+]
+
+
+# Hash of every source file the sims are built from, worked out once per process
+@functools.lru_cache(maxsize=None)
+def code_version():
+    root    = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest  = hashlib.sha256()
+    for package in source_packages:
+        package_path = os.path.join(root, package)
+        if(not os.path.isdir(package_path)):
+            continue
+        for name in sorted(os.listdir(package_path)):
+            if(name.endswith(".py")):
+                digest.update(name.encode())
+                with open(os.path.join(package_path, name), "rb") as source:
+                    # Line endings don't change what the code does
+                    digest.update(source.read().replace(b"\r\n", b"\n"))
+    return digest.hexdigest()
+
+
+# Configuration values as plain JSON types. Anything that can't be written down
+#   exactly, like a NumPy Generator mid stream, makes the run uncacheable
+def canonical(value):
+    if(value is None or isinstance(value, (bool, str))):
+        return value
+    if(isinstance(value, int)):
+        return int(value)
+    if(isinstance(value, float)):
+        return float(value)
+    if(isinstance(value, dict)):
+        return dict((str(key), canonical(item)) for key, item in value.items())
+    if(isinstance(value, (list, tuple))):
+        return [canonical(item) for item in value]
+    if(isinstance(value, Spec)):
+        return {type(value).__name__ : canonical(value.as_dict())}
+    if(hasattr(value, "item") and getattr(value, "ndim", None) == 0):
+        return canonical(value.item())      # NumPy scalars
+    raise TypeError("Can't cache a configuration containing {}".format(type(value).__name__))
+
+
+# Key for a run of sim_name with config. A run without a seed draws fresh noise
+#   every time, so it is never cached
+def config_key(sim_name, config, version = None):
+    if(config.get("seed") is None):
+        raise TypeError("Can't cache an unseeded run")
+    if(version is None):
+        version = code_version()
+    text = json.dumps({"sim" : sim_name, "config" : canonical(config), "code" : version},
+                      sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class Result_Cache:
+    # max_bytes bounds the files on disk. Eviction runs every evict_interval
+    #   puts from this process, and can be run by hand with evict()
+    def __init__(self, directory, max_bytes = 1 << 30, evict_interval = 256, memory_entries = 4096):
+        self.directory          = directory
+        self.max_bytes          = max_bytes
+        self.evict_interval     = evict_interval
+        self.puts               = 0
+        self.hits               = 0
+        self.misses             = 0
+
+        # Summaries this process has already read or written, so repeats skip the disk
+        self.memory_entries     = memory_entries
+        self.memory             = {}
+
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, suffix):
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    # Write to a uniquely named file next to the target and rename it into place,
+    #   readers only ever see complete files
+    def write_atomic(self, path, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = "{}.{}.tmp".format(path, uuid.uuid4().hex)
+        try:
+            with open(temporary_path, "wb") as output:
+                write(output)
+            os.replace(temporary_path, path)
+        finally:
+            if(os.path.exists(temporary_path)):
+                os.remove(temporary_path)
+
+    # Least recently used summaries are dropped first, a hit moves its key to the end
+    def remember(self, key, entry):
+        if(len(self.memory) >= self.memory_entries):
+            self.memory.pop(next(iter(self.memory)))
+        self.memory[key] = entry
+
+    # The stored {"summary" : ..., "result" : ...} dict for key, or None on a miss
+    def get_entry(self, key):
+        if(key in self.memory):
+            self.hits       += 1
+            entry           = self.memory.pop(key)
+            self.memory[key] = entry
+            return entry
+
+        path = self.path(key, ".json")
+        try:
+            with open(path) as entry_file:
+                entry = json.load(entry_file)
+            # Touch it so eviction sees it as recently used
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.remember(key, entry)
+        return entry
+
+    # Summary dict for key, or None on a miss
+    def get(self, key):
+        entry = self.get_entry(key)
+        if(entry is None):
+            return None
+        return entry["summary"]
+
+    # Full Sim_Result for key, or None if no trajectory was stored
+    def get_result(self, key):
+        entry = self.get_entry(key)
+        if(entry is None):
+            return None
+        return self.entry_result(key, entry)
+
+    # Sim_Result for an entry get_entry() already returned, or None if it has no trajectory
+    def entry_result(self, key, entry):
+        import numpy as np
+
+        if("result" not in entry):
+            return None
+
+        try:
+            with np.load(self.path(key, ".npz")) as arrays:
+                channels = dict((name, arrays[name]) for name in arrays.files)
+            os.utime(self.path(key, ".npz"))
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+
+        attributes = entry["result"]
+        return Sim_Result(
+            attributes["title"],
+            channels.pop("timestamp"),
+            channels.pop("target_line"),
+            channels.pop("estimated_position"),
+            channels.pop("actual_position"),
+            channels.pop("control_effort"),
+            channels.pop("solution_drift"),
+            settling_time   = attributes["settling_time"],
+            travel_time     = attributes["travel_time"],
+            target_time     = attributes["target_time"],
+            **channels
+        )
+
+    # Store the summary for key, and the trajectory too when result is given.
+    #   The trajectory goes first so a summary that mentions one always has it
+    def put(self, key, summary, result = None):
+        import numpy as np
+
+        entry = {"summary" : summary}
+        if(result is not None):
+            channels = dict((name, getattr(result, name)) for name in trajectory_channels
+                            if getattr(result, name) is not None)
+            self.write_atomic(self.path(key, ".npz"), lambda output: np.savez(output, **channels))
+            entry["result"] = {
+                "title"         : result.title,
+                "settling_time" : result.settling_time,
+                "travel_time"   : result.travel_time,
+                "target_time"   : result.target_time,
+            }
+
+        text = json.dumps(entry).encode()
+        self.write_atomic(self.path(key, ".json"), lambda output: output.write(text))
+        self.remember(key, entry)
+
+        self.puts += 1
+        if(self.puts % self.evict_interval == 0):
+            self.evict()
+
+    # Delete the least recently used entries until the cache is back under 90% of
+    #   max_bytes. Other processes may be deleting at the same time, files that
+    #   are already gone are skipped
+    def evict(self):
+        entries     = {}
+        total_bytes = 0
+        for root, directories, names in os.walk(self.directory):
+            for name in names:
+                if(name.endswith(".tmp")):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+                key = name.split(".")[0]
+                used, size, paths = entries.get(key, (0, 0, []))
+                entries[key] = (max(used, stat.st_mtime), size + stat.st_size, paths + [path])
+                total_bytes += stat.st_size
+
+        if(total_bytes <= self.max_bytes):
+            return 0
+
+        removed = 0
+        for key, (used, size, paths) in sorted(entries.items(), key=lambda entry: entry[1][0]):
+            if(total_bytes <= 0.9 * self.max_bytes):
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.memory.pop(key, None)
+            total_bytes -= size
+            removed     += 1
+        return removed
+
+
+# config with every argument it leaves out filled in from run_function's defaults,
+#   so a run spelled out in full and one left to the defaults share a key
+def with_defaults(run_function, config):
+    parameters  = inspect.signature(run_function).parameters.values()
+    defaults    = dict((parameter.name, parameter.default) for parameter in parameters
+                       if parameter.default is not parameter.empty)
+    return dict(defaults, **config)
+
+
+# Runs run_function(**config) through the cache. Returns the metrics summary, and
+#   with keep_trajectory the Sim_Result as well. Configurations that can't be
+#   hashed, e.g. a Generator seed, or that have no seed at all run uncached
+def cached_run(cache, sim_name, run_function, config, keep_trajectory = False):
+    config = with_defaults(run_function, config)
+    try:
+        key = config_key(sim_name, config)
+    except TypeError:
+        key = None
+
+    if(key is not None):
+        entry = cache.get_entry(key)
+        if(entry is not None):
+            if(not keep_trajectory):
+                return entry["summary"]
+            result = cache.entry_result(key, entry)
+            if(result is not None):
+                return entry["summary"], result
+
+    result  = run_function(**config)
+    summary = metrics.summarize(result)
+    if(key is not None):
+        cache.put(key, summary, result if keep_trajectory else None)
+
+    if(keep_trajectory):
+        return summary, result
+    return summary
+
+
+if __name__ == '__main__':
+    import tempfile
+    import time
+    import numpy as np
+    import src.motor.inertial_navigation_filtered as inertial_navigation_filtered
+
+    cache   = Result_Cache(tempfile.mkdtemp())
+    config  = {"seed" : 3, "kp" : 0.5, "time_step_s" : 0.01}
+
+    start   = time.perf_counter()
+    summary, result = cached_run(cache, "inertial_navigation_filtered", inertial_navigation_filtered.run, config, True)
+    run_s   = time.perf_counter() - start
+
+    # A fresh cache object on the same directory, like another worker process
+    other   = Result_Cache(cache.directory)
+    start   = time.perf_counter()
+    cached_summary = cached_run(other, "inertial_navigation_filtered", inertial_navigation_filtered.run, config)
+    disk_s  = time.perf_counter() - start
+
+    start   = time.perf_counter()
+    cached_run(other, "inertial_navigation_filtered", inertial_navigation_filtered.run, config)
+    memory_s = time.perf_counter() - start
+
+    assert cached_summary == json.loads(json.dumps(summary))
+    cached_result = other.get_result(config_key("inertial_navigation_filtered",
+                                                with_defaults(inertial_navigation_filtered.run, config)))
+    assert np.array_equal(cached_result.estimated_position, result.estimated_position)
+    assert cached_result.settling_time == result.settling_time
+    print("run {:.1f} ms, disk hit {:.1f} us, memory hit {:.1f} us".format(run_s * 1e3, disk_s * 1e6, memory_s * 1e6))
+
+    # Eviction keeps the newest entries under the bound
+    small = Result_Cache(tempfile.mkdtemp(), max_bytes=1000, evict_interval=1)
+    for i in range(0, 100):
+        small.put(config_key("test", {"i" : i, "seed" : 0}), {"value" : i})
+        os.utime(small.path(config_key("test", {"i" : i, "seed" : 0}), ".json"), (i, i))
+    assert small.get(config_key("test", {"i" : 99, "seed" : 0})) is not None
+    assert Result_Cache(small.directory).get(config_key("test", {"i" : 0, "seed" : 0})) is None
+    print("Eviction OK")
+
+    # Unseeded runs always run, and a config left to the defaults shares the key of one spelled out
+    counted = Result_Cache(tempfile.mkdtemp())
+    cached_run(counted, "inertial_navigation_filtered", inertial_navigation_filtered.run, {"kp" : 0.5})
+    cached_run(counted, "inertial_navigation_filtered", inertial_navigation_filtered.run, {"kp" : 0.5})
+    assert counted.hits == 0
+    cached_run(counted, "inertial_navigation_filtered", inertial_navigation_filtered.run, {"seed" : 3})
+    cached_run(counted, "inertial_navigation_filtered", inertial_navigation_filtered.run, {"seed" : 3, "kp" : 0.5}, True)
+    assert (counted.hits, counted.misses) == (1, 1)
+
+    # The memory map drops the least recently used summary
+    lru     = Result_Cache(tempfile.mkdtemp(), memory_entries=2)
+    keys    = [config_key("test", {"i" : i, "seed" : 0}) for i in range(0, 3)]
+    lru.put(keys[0], {"value" : 0})
+    lru.put(keys[1], {"value" : 1})
+    lru.get(keys[0])
+    lru.put(keys[2], {"value" : 2})
+    assert (keys[0] in lru.memory) and (keys[1] not in lru.memory)
+    print("Keys OK")
@@ -0,0 +1,183 @@
+###########################################################
+#
+#   FILENAME:       decimate.py
+#
+#   DESCRIPTION:    Shape preserving downsampling of long
+#                     channels for plotting. A Min_Max_Pyramid
+#                     holds the index of the smallest and the
+#                     largest sample in every block of 8, 16,
+#                     32, ... samples by default, starting at
+#                     2 ** first_level, built once per channel.
+#                     Any view of the channel is then answered
+#                     from the coarsest level that still has a
+#                     couple of blocks per pixel, so drawing
+#                     costs the same however long the run was
+#                     and no peak is ever dropped. LTTB can
+#                     thin that envelope further
+#
+###########################################################
+
+import  numpy                   as np
+
+
+# Largest triangle three buckets. Indices of count samples chosen so each one spans
+#   the largest triangle with the sample kept before it and the average of the next
+#   bucket, in order and always including the first and last sample
+def lttb(x, y, count):
+    x       = np.asarray(x, dtype=np.float64)
+    y       = np.asarray(y, dtype=np.float64)
+    length  = len(x)
+    if((count >= length) or (count < 3)):
+        return np.arange(0, length)
+
+    # The first and last samples get a bucket of their own
+    edges   = np.linspace(1, length - 1, count - 1).astype(np.int64)
+    edges[-1] = length - 1
+
+    # Averages of every bucket, the target each triangle reaches towards
+    sums_x  = np.add.reduceat(x[1:length - 1], edges[:-1] - 1)
+    sums_y  = np.add.reduceat(y[1:length - 1], edges[:-1] - 1)
+    sizes   = np.diff(edges)
+    mean_x  = np.append(sums_x / sizes, x[-1])
+    mean_y  = np.append(sums_y / sizes, y[-1])
+
+    chosen      = np.empty(count, dtype=np.int64)
+    chosen[0]   = 0
+    chosen[-1]  = length - 1
+    previous    = 0
+    for bucket in range(0, count - 2):
+        low     = edges[bucket]
+        high    = edges[bucket + 1]
+
+        # Twice the triangle area, the constant factor doesn't change the largest
+        area    = np.abs((x[previous] - mean_x[bucket + 1]) * (y[low:high] - y[previous]) -
+                         (x[previous] - x[low:high]) * (mean_y[bucket + 1] - y[previous]))
+        previous            = low + int(np.argmax(area))
+        chosen[bucket + 1]  = previous
+
+    return chosen
+
+
+class Min_Max_Pyramid:
+    # x has to be sorted, e.g. timestamps. The finest level has blocks of
+    #   2 ** first_level samples, views that would need finer blocks than that are
+    #   drawn sample for sample. Levels stop once a level has fewer than min_blocks blocks
+    def __init__(self, x, y, first_level = 3, min_blocks = 64):
+        self.x              = np.asarray(x, dtype=np.float64)
+        self.y              = np.asarray(y, dtype=np.float64)
+        self.length         = len(self.y)
+        self.first_level    = first_level
+
+        # The finest level straight from the samples, in one pass. A short last block
+        #   is padded with its last sample
+        block               = 1 << first_level
+        padded              = -(-self.length // block) * block
+        blocks              = np.concatenate((self.y, np.full(padded - self.length, self.y[-1]))).reshape(-1, block)
+        offsets             = np.arange(0, padded, block)
+        minimum             = np.minimum(offsets + np.argmin(blocks, axis=1), self.length - 1)
+        maximum             = np.minimum(offsets + np.argmax(blocks, axis=1), self.length - 1)
+        self.levels         = [(minimum, maximum)]
+
+        # Every coarser level pairs up the blocks of the one below
+        while(len(minimum) >= 2 * min_blocks):
+            # An odd block out pairs with itself
+            if(len(minimum) % 2):
+                minimum     = np.append(minimum, minimum[-1])
+                maximum     = np.append(maximum, maximum[-1])
+
+            left            = self.y[minimum[0::2]] <= self.y[minimum[1::2]]
+            minimum         = np.where(left, minimum[0::2], minimum[1::2])
+            right           = self.y[maximum[1::2]] >= self.y[maximum[0::2]]
+            maximum         = np.where(right, maximum[1::2], maximum[0::2])
+            self.levels.append((minimum, maximum))
+
+    # Indices to draw for x from low to high at the given width in pixels. One sample
+    #   either side of the view is kept so the line runs to the edge of the axes
+    def query(self, low, high, pixels):
+        start       = max(int(np.searchsorted(self.x, low, side="left")) - 1, 0)
+        stop        = min(int(np.searchsorted(self.x, high, side="right")) + 1, self.length)
+        span        = stop - start
+
+        # Coarsest level that still has at least one block per pixel
+        level       = int(np.log2(max(span / pixels, 1)))
+        if(level < self.first_level):
+            return np.arange(start, stop)
+        level       = min(level, self.first_level + len(self.levels) - 1)
+
+        minimum, maximum = self.levels[level - self.first_level]
+        first       = start >> level
+        last        = ((stop - 1) >> level) + 1
+
+        return np.unique(np.concatenate((minimum[first:last], maximum[first:last], [start, stop - 1])))
+
+
+# Draws a channel on a matplotlib axes at the resolution of the axes and redraws it
+#   from the pyramid whenever the x limits change, e.g. on zoom or pan
+#   method      "min_max" draws the full envelope, "lttb" thins it to one sample per pixel
+class Decimated_Line:
+    def __init__(self, ax, x, y, *args, method = "min_max", pixels = None, **kwargs):
+        if(method not in ("min_max", "lttb")):
+            raise ValueError("Unknown decimation method {}".format(method))
+
+        self.ax         = ax
+        self.pyramid    = Min_Max_Pyramid(x, y)
+        self.method     = method
+        self.pixels     = pixels
+
+        indices         = self.indices(self.pyramid.x[0], self.pyramid.x[-1])
+        self.line,      = ax.plot(self.pyramid.x[indices], self.pyramid.y[indices], *args, **kwargs)
+
+        # matplotlib only keeps a weak reference to the callback, the line keeps this alive
+        self.line.decimated = self
+        ax.callbacks.connect("xlim_changed", self.update)
+
+    def indices(self, low, high):
+        pixels      = self.pixels
+        if(pixels is None):
+            pixels  = max(int(self.ax.bbox.width), 1)
+
+        indices     = self.pyramid.query(low, high, pixels)
+        if((self.method == "lttb") and (len(indices) > pixels)):
+            indices = indices[lttb(self.pyramid.x[indices], self.pyramid.y[indices], pixels)]
+        return indices
+
+    def update(self, ax):
+        low, high   = ax.get_xlim()
+        indices     = self.indices(low, high)
+        self.line.set_data(self.pyramid.x[indices], self.pyramid.y[indices])
+
+
+if __name__ == '__main__':
+    import time
+
+    rng     = np.random.default_rng(0)
+    for length in (10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7):
+        x       = np.arange(0, length) * 0.001
+        y       = np.cumsum(rng.normal(0, 1, length))
+        start   = time.perf_counter()
+        pyramid = Min_Max_Pyramid(x, y)
+        built   = time.perf_counter() - start
+
+        # Every view has to keep the extremes a brute force search over it finds
+        for low, high in ((x[0], x[-1]), (x[length // 3], x[length // 3 + length // 7]), (x[10], x[900])):
+            start   = time.perf_counter()
+            indices = pyramid.query(low, high, 1000)
+            queried = time.perf_counter() - start
+            inside  = (x >= low) & (x <= high)
+            assert y[indices].max() >= y[inside].max()
+            assert y[indices].min() <= y[inside].min()
+            assert len(indices) <= 8 * 1000 + 2
+
+        start   = time.perf_counter()
+        thinned = lttb(x[indices], y[indices], 500)
+        thin_s  = time.perf_counter() - start
+
+        print("{:>9} samples: build {:7.1f} ms, query {:5.2f} ms for {} points, lttb {:5.2f} ms".format(
+            length, built * 1e3, queried * 1e3, len(indices), thin_s * 1e3))
+
+    # LTTB has to keep a lone spike
+    y       = np.zeros(10000)
+    y[4321] = 5
+    assert 4321 in lttb(np.arange(10000), y, 100)
+    assert 4321 in Min_Max_Pyramid(np.arange(10000), y).query(0, 10000, 100)
+    print("Spike kept")
@@ -0,0 +1,52 @@
+###########################################################
+#
+#   FILENAME:       events.py
+#
+#   DESCRIPTION:    Event detection helpers for the adaptive
+#                     step sims. Level crossings are located
+#                     by interpolating inside a step, latching
+#                     conditions by bisection, and variable
+#                     step output can be put back on a uniform
+#                     time grid
+#
+###########################################################
+
+# Time at which a signal going linearly from x0 at t0 to x1 at t1 crosses level,
+#   None if it doesn't
+def crossing_time(t0, x0, t1, x1, level):
+    if(x0 == x1):
+        return t0 if (x0 == level) else None
+    if((x0 - level) * (x1 - level) > 0):
+        return None
+    return t0 + ((level - x0) / (x1 - x0)) * (t1 - t0)
+
+
+# First integer in [low, high] for which condition() is true. None if it is false
+#   at high. The bisection assumes condition() is monotonic over the range: false up
+#   to some point and true from there on. A condition that turns true and then false
+#   again can return any of its true points, not the first one
+def first_true(condition, low, high):
+    if(low > high or not condition(high)):
+        return None
+    if(condition(low)):
+        return low
+
+    # condition(low) is false and condition(high) is true
+    while(high - low > 1):
+        middle = (low + high) // 2
+        if(condition(middle)):
+            high = middle
+        else:
+            low = middle
+    return high
+
+
+# Linear interpolation of variable step channels onto a uniform grid from the first
+#   to the last timestamp. Returns the grid and the resampled channels
+def resample(timestamp, step_s, *channels):
+    import numpy as np
+
+    timestamp   = np.asarray(timestamp)
+    grid        = np.arange(0, int(round((timestamp[-1] - timestamp[0]) / step_s)) + 1) * step_s + timestamp[0]
+    grid        = grid[grid <= timestamp[-1] + (1e-9 * step_s)]
+    return (grid,) + tuple(np.interp(grid, timestamp, channel) for channel in channels)
@@ -0,0 +1,140 @@
+###########################################################
+#
+#   FILENAME:       imu_replay.py
+#
+#   DESCRIPTION:    Replays logged accelerometer samples
+#                     through the inertial navigation
+#                     estimator. The log is memory mapped and
+#                     processed in large blocks: filter_block
+#                     on the filter, then a cumulative sum
+#                     double integration that carries its state
+#                     from one block to the next
+#
+###########################################################
+
+import  numpy                       as np
+from    src.models.iir_filter       import IIR_Filter
+from    src.models.iir_filter_bank  import IIR_Filter_Bank
+from    src.models.ra_filter        import RA_Filter
+from    src.sim.telemetry           import Telemetry_Writer
+
+replay_channels = ["timestamp", "estimated_acceleration", "estimated_velocity", "estimated_position"]
+
+
+# Memory maps the acceleration axis of a raw log as read only samples
+#   dtype           Sample type as written by the logger, e.g. "<i2" for raw ADC counts
+#   axes            Number of interleaved axes per sample frame
+#   axis            Which of those axes is the direction of travel
+#   header_bytes    Bytes to skip at the start of the file
+def open_log(path, dtype = "<f8", axes = 1, axis = 0, header_bytes = 0):
+    frames = np.memmap(path, dtype=dtype, mode="r", offset=header_bytes)
+    frames = frames[:(len(frames) // axes) * axes].reshape(-1, axes)
+    return frames[:, axis]
+
+
+# Writes acceleration samples in the layout open_log reads by default
+def write_log(path, accel):
+    np.asarray(accel, dtype="<f8").tofile(path)
+
+
+class IMU_Replay:
+    # filter is anything with filter_block(), e.g. RA_Filter or IIR_Filter_Bank. An
+    #   IIR_Filter is converted to the equivalent bank, None gives the half second
+    #   running average inertial_navigation_filtered uses by default
+    # Raw samples are converted to m/s^2 as (raw - offset) * scale
+    def __init__(self, time_step_s, filter = None, scale = 1.0, offset = 0.0):
+        if(filter is None):
+            filter = RA_Filter(int(0.5 / time_step_s))
+        elif(isinstance(filter, IIR_Filter)):
+            filter = IIR_Filter_Bank.from_iir_filter(filter)
+
+        self.dt                 = time_step_s
+        self.filter             = filter
+        self.scale              = scale
+        self.offset             = offset
+        self.samples            = 0
+        self.estimated_velocity = 0.0
+        self.estimated_position = 0.0
+
+    # Estimates for one block of raw samples, continuing from the previous block
+    def process(self, raw):
+        accel = (np.asarray(raw, dtype=np.float64) - self.offset) * self.scale
+        accel = self.filter.filter_block(accel)
+
+        # Same semi-implicit integration as the sims, velocity first and the
+        #   new velocity into position
+        velocity    = self.estimated_velocity + np.cumsum(accel * self.dt)
+        position    = self.estimated_position + np.cumsum(velocity * self.dt)
+        timestamp   = (np.arange(1, len(accel) + 1) + self.samples) * self.dt
+
+        if(len(accel) > 0):
+            self.estimated_velocity = velocity[-1]
+            self.estimated_position = position[-1]
+        self.samples += len(accel)
+
+        return timestamp, accel, velocity, position
+
+
+# Runs a whole log through the estimator block by block. Returns a dict of the
+#   replay_channels arrays, or streams them to a telemetry directory and returns
+#   None so archives larger than memory can be replayed
+def replay(samples, time_step_s, filter = None, scale = 1.0, offset = 0.0,
+           block_size = 1 << 20, telemetry = None):
+    estimator = IMU_Replay(time_step_s, filter, scale, offset)
+
+    writer  = None
+    outputs = None
+    if(telemetry is not None):
+        writer  = Telemetry_Writer(telemetry, replay_channels, {"time_step_s" : time_step_s})
+    else:
+        outputs = dict((name, np.empty(len(samples))) for name in replay_channels)
+
+    for start in range(0, len(samples), block_size):
+        block = estimator.process(samples[start:start + block_size])
+        if(writer is not None):
+            writer.write_block(*block)
+        else:
+            for name, values in zip(replay_channels, block):
+                outputs[name][start:start + len(values)] = values
+
+    if(writer is not None):
+        writer.close()
+
+    return outputs
+
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+    import time
+
+    # Replay has to match stepping the same filter and integration per sample
+    time_step_s = 0.01
+    rng         = np.random.default_rng(0)
+    accel       = rng.normal(0, 0.049, 200000) + np.sin(np.arange(200000) * 0.001)
+
+    for name, make_filter in (("RA_Filter", lambda: RA_Filter(50)), ("IIR_Filter", IIR_Filter)):
+        stepped_filter  = make_filter()
+        velocity        = 0
+        position        = 0
+        expected        = np.empty(len(accel))
+        for i in range(0, len(accel)):
+            velocity    = velocity + (stepped_filter.filter(accel[i]) * time_step_s)
+            position    = position + (velocity * time_step_s)
+            expected[i] = position
+
+        outputs = replay(accel, time_step_s, make_filter(), block_size=30000)
+        error   = np.max(np.abs(outputs["estimated_position"] - expected))
+        print("{:<12} worst position error vs per sample: {:.3e} m".format(name, error))
+        assert np.allclose(outputs["estimated_position"], expected, rtol=1e-9, atol=1e-6)
+
+    # Disk throughput, a raw int16 ADC log with a zero g offset
+    samples = 20000000
+    path    = os.path.join(tempfile.mkdtemp(), "accel.bin")
+    rng.integers(1900, 2200, samples, dtype=np.int16).astype("<i2").tofile(path)
+
+    start   = time.perf_counter()
+    replay(open_log(path, "<i2"), time_step_s, RA_Filter(50), scale=0.0096, offset=2048,
+           telemetry=os.path.join(os.path.dirname(path), "replay"))
+    elapsed = time.perf_counter() - start
+    print("{} samples in {:.2f} s ({:.1f} M samples/s)".format(samples, elapsed, samples / elapsed / 1e6))
@@ -0,0 +1,194 @@
+###########################################################
+#
+#   FILENAME:       instrumentation.py
+#
+#   DESCRIPTION:    Optional per-stage profiling for the sim
+#                     loops. A Profiler wraps the methods of
+#                     the model instances a run uses with
+#                     perf_counter_ns timers, call counts and
+#                     allocated block deltas, aggregated into
+#                     log2 histograms. Nothing is wrapped
+#                     unless a sim is handed a Profiler, so a
+#                     run without one pays nothing
+#
+###########################################################
+
+import  sys
+import  time
+
+histogram_buckets = 64
+
+
+class Stage_Stats:
+    def __init__(self, name):
+        self.name           = name
+        self.calls          = 0
+        self.total_ns       = 0
+        self.max_ns         = 0
+        self.blocks         = 0                             # Net allocated blocks over all calls
+        self.histogram      = [0] * histogram_buckets       # Bucket b counts calls of [2^(b-1), 2^b) ns
+
+    def add(self, elapsed_ns, blocks):
+        self.calls          += 1
+        self.total_ns       += elapsed_ns
+        self.blocks         += blocks
+        self.histogram[min(elapsed_ns.bit_length(), histogram_buckets - 1)] += 1
+        if(elapsed_ns > self.max_ns):
+            self.max_ns     = elapsed_ns
+
+    # Upper bound of the histogram bucket holding the given fraction of calls
+    def percentile_ns(self, fraction):
+        needed  = fraction * self.calls
+        seen    = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if((count > 0) and (seen >= needed)):
+                return 1 << bucket
+        return 0
+
+
+class Profiler:
+    # track_allocations reads sys.getallocatedblocks around every call. It walks
+    #   every allocator arena, a microsecond or more per call once NumPy is loaded,
+    #   so it is off unless asked for
+    def __init__(self, track_allocations = False):
+        self.track_allocations  = track_allocations
+        self.stages             = {}
+        self.start_ns           = None
+        self.elapsed_ns         = 0
+        self.overhead_ns        = 0     # Timer cost inside every stage's time
+        self.outside_ns         = 0     # Wrapper cost outside the timers, lands in the loop time
+        self.overhead_blocks    = 0     # Blocks the bookkeeping itself shows per call
+        self.calibrate()
+
+    def stage(self, name):
+        if(name not in self.stages):
+            self.stages[name] = Stage_Stats(name)
+        return self.stages[name]
+
+    # Replace obj.method_name with a timed version on this instance only. The
+    #   stage defaults to "Class.method"
+    def wrap(self, obj, method_name, stage = None):
+        if(stage is None):
+            stage = "{}.{}".format(type(obj).__name__, method_name)
+        setattr(obj, method_name, self.timed(getattr(obj, method_name), self.stage(stage)))
+
+    # wrap() for several (obj, method_name) pairs
+    def wrap_all(self, methods):
+        for obj, method_name in methods:
+            self.wrap(obj, method_name)
+
+    def timed(self, function, stats):
+        clock = time.perf_counter_ns
+
+        if(not self.track_allocations):
+            def timed_call(*args, **kwargs):
+                start = clock()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    stats.add(clock() - start, 0)
+            return timed_call
+
+        # The block counts go inside the timer so the ints the timer makes
+        #   aren't counted as the stage's allocations
+        blocks = sys.getallocatedblocks
+        def timed_call(*args, **kwargs):
+            start           = clock()
+            start_blocks    = blocks()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end_blocks  = blocks()
+                elapsed     = clock() - start
+                stats.add(elapsed, end_blocks - start_blocks)
+        return timed_call
+
+    # Wrap an empty function to see what the instrumentation itself costs, both
+    #   inside the timed section and around it
+    def calibrate(self, calls = 20000):
+        stats   = Stage_Stats("calibration")
+        bare    = lambda: None
+        empty   = self.timed(bare, stats)
+
+        start   = time.perf_counter_ns()
+        for i in range(0, calls):
+            bare()
+        bare_ns = time.perf_counter_ns() - start
+
+        start   = time.perf_counter_ns()
+        for i in range(0, calls):
+            empty()
+        wrapped_ns = time.perf_counter_ns() - start
+
+        self.overhead_ns        = stats.total_ns // calls
+        self.outside_ns         = max(0, ((wrapped_ns - bare_ns) // calls) - self.overhead_ns)
+        self.overhead_blocks    = stats.blocks / calls
+
+    # Bracket the whole run so time outside the wrapped stages shows up as well
+    def start(self):
+        self.start_ns   = time.perf_counter_ns()
+
+    def stop(self):
+        self.elapsed_ns += time.perf_counter_ns() - self.start_ns
+        self.start_ns   = None
+
+    def as_dict(self):
+        stages = {}
+        for name, stats in self.stages.items():
+            stages[name] = {
+                "calls"             : stats.calls,
+                "total_ns"          : stats.total_ns,
+                "mean_ns"           : (stats.total_ns / stats.calls) if stats.calls else 0,
+                "p50_ns"            : stats.percentile_ns(0.5),
+                "p99_ns"            : stats.percentile_ns(0.99),
+                "max_ns"            : stats.max_ns,
+                "blocks_per_call"   : self.blocks_per_call(stats),
+            }
+        return {"elapsed_ns" : self.elapsed_ns, "overhead_ns" : self.overhead_ns, "outside_ns" : self.outside_ns, "stages" : stages}
+
+    def blocks_per_call(self, stats):
+        if(stats.calls == 0):
+            return 0
+        return (stats.blocks / stats.calls) - self.overhead_blocks
+
+    # Per-stage breakdown, slowest stage first. Percentiles are histogram bucket
+    #   upper bounds, so they are only good to a factor of two
+    def report(self):
+        lines = ["{:<28} {:>9} {:>10} {:>7} {:>9} {:>9} {:>9} {:>8}".format(
+            "stage", "calls", "total ms", "% run", "mean ns", "p50 ns", "p99 ns", "blk/call")]
+
+        staged_ns   = 0
+        calls       = 0
+        for stats in sorted(self.stages.values(), key=lambda stats: stats.total_ns, reverse=True):
+            if(stats.calls == 0):
+                continue
+            staged_ns   += stats.total_ns
+            calls       += stats.calls
+            share = (100.0 * stats.total_ns / self.elapsed_ns) if self.elapsed_ns else 0
+            lines.append("{:<28} {:>9} {:>10.2f} {:>7.1f} {:>9.0f} {:>9} {:>9} {:>8.2f}".format(
+                stats.name, stats.calls, stats.total_ns / 1e6, share,
+                (stats.total_ns / stats.calls) if stats.calls else 0,
+                stats.percentile_ns(0.5), stats.percentile_ns(0.99),
+                self.blocks_per_call(stats)))
+
+        if(self.elapsed_ns):
+            profiler_ns = min(calls * self.outside_ns, self.elapsed_ns - staged_ns)
+            other_ns    = self.elapsed_ns - staged_ns - profiler_ns
+            lines.append("{:<28} {:>9} {:>10.2f} {:>7.1f}".format(
+                "(profiler, estimated)", "", profiler_ns / 1e6, 100.0 * profiler_ns / self.elapsed_ns))
+            lines.append("{:<28} {:>9} {:>10.2f} {:>7.1f}".format(
+                "(loop and other)", "", other_ns / 1e6, 100.0 * other_ns / self.elapsed_ns))
+            lines.append("{:<28} {:>9} {:>10.2f}".format("total", "", self.elapsed_ns / 1e6))
+        lines.append("Timer overhead included per call: ~{} ns".format(self.overhead_ns))
+        return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    import src.motor.inertial_navigation_filtered as inertial_navigation_filtered
+
+    for track_allocations in (False, True):
+        profiler = Profiler(track_allocations)
+        inertial_navigation_filtered.run(seed=0, profiler=profiler)
+        print(profiler.report())
+        print("")
@@ -0,0 +1,56 @@
+###########################################################
+#
+#   FILENAME:       metrics.py
+#
+#   DESCRIPTION:    Scalar performance figures pulled out
+#                     of a Sim_Result or Path_Result
+#
+###########################################################
+
+import math
+
+metric_names = [
+    "settling_time",        # Time steady state was detected, nan if it never was
+    "overshoot",            # Furthest the robot went past the target in meters
+    "steady_state_error",   # Target minus actual final position
+    "final_drift",          # Estimated minus actual final position
+]
+
+def summarize(result):
+    import numpy as np
+
+    target          = result.target_line[-1]
+    final_position  = result.actual_position[-1]
+
+    if(result.settling_time is None):
+        settling_time = math.nan
+    else:
+        settling_time = result.settling_time
+
+    return {
+        "settling_time"         : settling_time,
+        "overshoot"             : max(0.0, float(np.max(result.actual_position)) - target),
+        "steady_state_error"    : float(target - final_position),
+        "final_drift"           : float(result.estimated_position[-1] - final_position),
+    }
+
+
+path_metric_names = [
+    "finish_time",          # Time the robot reached the end of the route, nan if it never did
+    "max_cross_track",      # Furthest the robot strayed from the route in meters
+    "rms_cross_track",      # Root mean square distance from the route
+]
+
+def summarize_path(result):
+    if(result.finish_time is None):
+        finish_time = math.nan
+    else:
+        finish_time = result.finish_time
+
+    cross_track = [float(value) for value in result.cross_track]
+
+    return {
+        "finish_time"           : finish_time,
+        "max_cross_track"       : max(abs(value) for value in cross_track),
+        "rms_cross_track"       : math.sqrt(sum(value * value for value in cross_track) / len(cross_track)),
+    }
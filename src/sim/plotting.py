@@ -0,0 +1,81 @@
+###########################################################
+#
+#   FILENAME:       plotting.py
+#
+#   DESCRIPTION:    Renders a Sim_Result or Path_Result
+#                     with matplotlib. matplotlib is only
+#                     imported when a plot is actually drawn
+#                     so headless workers never load it.
+#                     Channels are decimated to the width of
+#                     the axes and redrawn from a cached
+#                     Min_Max_Pyramid on zoom, so long runs
+#                     draw as fast as short ones
+#
+###########################################################
+
+# Plot a channel against time. decimate is "min_max" or "lttb" for a Decimated_Line,
+#   None to hand every sample to matplotlib
+def plot_channel(ax, timestamp, channel, style, label, decimate):
+    if(decimate is None):
+        return ax.plot(timestamp, channel, style, label=label)[0]
+
+    from src.sim.decimate import Decimated_Line
+    return Decimated_Line(ax, timestamp, channel, style, method=decimate, label=label).line
+
+
+def plot_result(result, show = True, decimate = "min_max"):
+    import matplotlib.pyplot as plt
+
+    fig, ax1 = plt.subplots()
+
+    # ax2 = ax1.twinx()
+
+    plot_channel(ax1, result.timestamp, result.target_line,                 'r',    "Target Position",      decimate)
+    plot_channel(ax1, result.timestamp, result.estimated_position,          'm',    "Estimated Position",   decimate)
+    if(result.estimated_acceleration is not None):
+        plot_channel(ax1, result.timestamp, result.estimated_acceleration,  'y',    "Estimated Accel",      decimate)
+    plot_channel(ax1, result.timestamp, result.actual_position,             'c',    "Actual Position",      decimate)
+    # plot_channel(ax2, result.timestamp, result.solution_drift,            'k',    "Solution Drift",       decimate)
+    plot_channel(ax1, result.timestamp, result.control_effort,              'b',    "Control Effort",       decimate)
+
+    ax1.legend()
+    # ax2.legend()
+
+    if(result.estimated_acceleration is not None):
+        ax1.set_ylabel("Position (m)\nAcceleration (m/s/s)")
+    else:
+        ax1.set_ylabel("Position (m)")
+    # ax2.set_ylabel("Solution % Deviation")
+
+    ax1.set_xlabel("Time (s)")
+    ax1.set_title(result.title)
+
+    if(show):
+        plt.show()
+
+    return fig
+
+
+def plot_path(result, show = True, decimate = "min_max"):
+    import matplotlib.pyplot as plt
+
+    fig, (ax1, ax2) = plt.subplots(1, 2)
+
+    waypoints = list(zip(*result.waypoints))
+    ax1.plot(waypoints[0], waypoints[1],                            'r',    label="Route")
+    ax1.plot(result.x, result.y,                                    'c',    label="Actual Path")
+    ax1.set_aspect("equal")
+    ax1.legend()
+    ax1.set_xlabel("x (m)")
+    ax1.set_ylabel("y (m)")
+    ax1.set_title(result.title)
+
+    plot_channel(ax2, result.timestamp, result.cross_track,                 'm',    "Cross Track Error",    decimate)
+    ax2.legend()
+    ax2.set_xlabel("Time (s)")
+    ax2.set_ylabel("Error (m)")
+
+    if(show):
+        plt.show()
+
+    return fig
@@ -0,0 +1,92 @@
+###########################################################
+#
+#   FILENAME:       recorder.py
+#
+#   DESCRIPTION:    Trajectory recorder backed by contiguous
+#                     float64 buffers. Channels are written
+#                     in place and the buffers double when
+#                     full, constant channels are stored once.
+#                     Samples can also be streamed to a sink
+#                     such as a Telemetry_Writer, with or
+#                     without keeping them in memory
+#
+###########################################################
+
+from array import array
+
+class Trajectory_Recorder:
+    # keep = False only holds on to the latest sample, for runs whose history
+    #   only needs to go to the sink
+    def __init__(self, channels, constants = None, capacity = 4096, keep = True):
+        self.channels       = list(channels)
+        self.constants      = dict(constants) if constants else {}
+        self.keep           = keep
+        self.capacity       = max(1, int(capacity)) if keep else 1
+        self.length         = 0
+        self.sink           = None
+
+        # One preallocated buffer per channel, kept in channel order for record()
+        self.buffers        = {}
+        for name in self.channels:
+            self.buffers[name]  = array('d', bytes(8 * self.capacity))
+        self.buffer_list    = [self.buffers[name] for name in self.channels]
+
+    def __len__(self):
+        return self.length
+
+    # Also pass every following sample to sink.write(), in channel order
+    def stream_to(self, sink):
+        self.sink = sink
+
+    # Store one sample per channel, in the order the channels were declared
+    def record(self, *values):
+        if(self.sink is not None):
+            self.sink.write(*values)
+
+        if(not self.keep):
+            self.length = 0
+        elif(self.length == self.capacity):
+            self.grow()
+
+        index = self.length
+        for buffer, value in zip(self.buffer_list, values):
+            buffer[index] = value
+
+        self.length += 1
+
+    # Double the size of every buffer. Fails with BufferError while a view
+    #   handed out by view() or as_array() is still alive
+    def grow(self):
+        padding = bytes(8 * self.capacity)
+        for buffer in self.buffer_list:
+            buffer.frombytes(padding)
+        self.capacity *= 2
+
+    # Most recently recorded value of a channel
+    def last(self, name):
+        if(name in self.constants):
+            return self.constants[name]
+        return self.buffers[name][self.length - 1]
+
+    # Zero-copy memoryview of the recorded part of a channel
+    def view(self, name):
+        return memoryview(self.buffers[name])[:self.length]
+
+    # Zero-copy NumPy view of the recorded part of a channel. Constant channels
+    #   are broadcast to the recorded length without allocating
+    def as_array(self, name):
+        import numpy as np
+
+        if(name in self.constants):
+            return np.broadcast_to(np.float64(self.constants[name]), (self.length,))
+        return np.frombuffer(self.buffers[name], dtype=np.float64, count=self.length)
+
+    # Closes the sink, if there is one
+    def close(self):
+        if(self.sink is not None):
+            self.sink.close()
+            self.sink = None
+
+    # Bytes held by the channel buffers, including unused capacity
+    def nbytes(self):
+        return sum(buffer.itemsize * len(buffer) for buffer in self.buffer_list)
@@ -0,0 +1,70 @@
+###########################################################
+#
+#   FILENAME:       result.py
+#
+#   DESCRIPTION:    Structured output of a single headless
+#                     simulation run, along a line or along a
+#                     route
+#
+###########################################################
+
+class Sim_Result:
+    def __init__(self,
+                 title,
+                 timestamp,
+                 target_line,
+                 estimated_position,
+                 actual_position,
+                 control_effort,
+                 solution_drift,
+                 estimated_velocity     = None,
+                 estimated_acceleration = None,
+                 actual_velocity        = None,
+                 settling_time          = None,
+                 travel_time            = None,
+                 target_time            = None,
+                 steps_taken            = None):
+
+        self.title                  = title                     # Name used when the run is plotted
+        self.timestamp              = timestamp                 # Time of the simulation
+        self.target_line            = target_line               # Target distance in meters
+        self.estimated_position     = estimated_position        # Where the system thinks it is
+        self.actual_position        = actual_position           # Where the system actually is
+        self.control_effort         = control_effort            # Signal the controller passes to actuators
+        self.solution_drift         = solution_drift            # How far off is estimated position from actual position
+        self.estimated_velocity     = estimated_velocity
+        self.estimated_acceleration = estimated_acceleration
+        self.actual_velocity        = actual_velocity
+        self.settling_time          = settling_time             # None if the run hit the time cap first
+        self.travel_time            = travel_time               # Open loop only, how long it planned to drive
+        self.target_time            = target_time               # When the actual position first crossed the target, if detected
+        self.steps_taken            = steps_taken               # Adaptive step only, how many integration steps the run took
+
+    def steady_state_reached(self):
+        return self.settling_time is not None
+
+
+class Path_Result:
+    def __init__(self,
+                 title,
+                 waypoints,
+                 timestamp,
+                 x,
+                 y,
+                 heading,
+                 along_track,
+                 cross_track,
+                 finish_time            = None):
+
+        self.title                  = title                     # Name used when the run is plotted
+        self.waypoints              = waypoints                 # Route the robot was asked to follow
+        self.timestamp              = timestamp                 # Time of the simulation
+        self.x                      = x                         # Where the robot actually is
+        self.y                      = y
+        self.heading                = heading                   # Radians from the x axis, counter clockwise
+        self.along_track            = along_track               # Distance along the route to the closest point
+        self.cross_track            = cross_track               # Distance off the route, positive to the left
+        self.finish_time            = finish_time               # None if the run hit the time cap first
+
+    def finished(self):
+        return self.finish_time is not None
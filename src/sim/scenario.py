@@ -0,0 +1,244 @@
+###########################################################
+#
+#   FILENAME:       scenario.py
+#
+#   DESCRIPTION:    Scenario files for batch runs. A scenario
+#                     names a sim and the keyword arguments
+#                     its run() takes, plus any changes to the
+#                     default vehicle. Files are JSON or TOML,
+#                     either a list of scenarios or a table
+#                     with shared defaults:
+#
+#                     [defaults]
+#                     seed        = 1
+#
+#                     [[scenarios]]
+#                     name        = "filtered_iir"
+#                     sim         = "motor.inertial_navigation_filtered"
+#                     filter_type = "iir"
+#                     vehicle     = { mass_kg = 1000 }
+#
+#                     Scenarios are run on a process pool and
+#                     each one becomes a row of a summary table
+#
+###########################################################
+
+import  copy
+import  csv
+import  importlib
+import  inspect
+import  json
+import  multiprocessing
+import  os
+import  sys
+import  time
+import  src.sim.metrics     as metrics
+
+# Sims a scenario can name, as the module and function that run them
+sims = {
+    "motor.open_loop"                       : ("src.motor.open_loop",                       "run"),
+    "motor.open_loop_adaptive"              : ("src.motor.open_loop",                       "run_adaptive"),
+    "motor.inertial_navigation"             : ("src.motor.inertial_navigation",             "run"),
+    "motor.inertial_navigation_filtered"    : ("src.motor.inertial_navigation_filtered",    "run"),
+    "motor.multi_rate"                      : ("src.motor.multi_rate",                      "run"),
+    "servo.open_loop"                       : ("src.servo.open_loop",                       "run"),
+    "servo.inertial_navigation"             : ("src.servo.inertial_navigation",             "run"),
+    "servo.velocity_navigation"             : ("src.servo.velocity_navigation",             "run"),
+    "servo.path_following"                  : ("src.servo.path_following",                  "run"),
+}
+
+# Keys of a scenario that aren't passed to the sim
+reserved_keys = ["name", "sim", "vehicle"]
+
+table_columns = ["name", "sim", "seed", "status", "wall_time_s"] + metrics.metric_names + metrics.path_metric_names + ["message"]
+
+
+# The function that runs a sim. Modules are only imported when a scenario uses them
+def sim_function(sim_name):
+    if(sim_name not in sims):
+        raise ValueError("Unknown sim {}, expected one of {}".format(sim_name, ", ".join(sorted(sims))))
+
+    module_name, function_name = sims[sim_name]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+# Keyword arguments a sim accepts. The servo sims' run() passes everything on to
+#   run_batch(), so the names come from there, less the ones run() sets itself
+def sim_parameters(sim_name):
+    function    = sim_function(sim_name)
+    parameters  = inspect.signature(function).parameters
+    if(any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters.values())):
+        parameters = inspect.signature(sys.modules[function.__module__].run_batch).parameters
+        return [name for name in parameters if name not in ("num_runs", "record")]
+    return list(parameters)
+
+
+# Scenarios from a JSON or TOML file, with the file's defaults filled in. Scenarios
+#   without a name are called after the file and their position in it. TOML needs
+#   tomllib, which came with Python 3.11, so it is only imported for TOML files
+def load(path):
+    if(path.endswith(".toml")):
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError("Scenario file {} is TOML, which needs Python 3.11 or newer. Use JSON instead".format(path))
+
+        with open(path, "rb") as file:
+            content = tomllib.load(file)
+    else:
+        with open(path) as file:
+            content = json.load(file)
+
+    if(isinstance(content, list)):
+        content = {"scenarios" : content}
+    elif("scenarios" not in content):
+        content = {"scenarios" : [content]}
+
+    defaults    = content.get("defaults", {})
+    stem        = os.path.splitext(os.path.basename(path))[0]
+    scenarios   = []
+    for i, entry in enumerate(content["scenarios"]):
+        scenario = merge(defaults, entry)
+        scenario.setdefault("name", "{}_{}".format(stem, i))
+        scenarios.append(scenario)
+    return scenarios
+
+
+# Copy of base with changes applied on top, vehicle changes are merged field by field
+def merge(base, changes):
+    scenario = copy.deepcopy(base)
+    for key, value in changes.items():
+        if((key == "vehicle") and isinstance(value, dict)):
+            scenario["vehicle"] = dict(scenario.get("vehicle", {}), **value)
+        else:
+            scenario[key] = copy.deepcopy(value)
+    return scenario
+
+
+# Parse a command line override, "[scenario:]key=value". The key can be vehicle.field
+#   and the value is read as JSON where it can be, so numbers and lists keep their type
+def parse_override(text):
+    if("=" not in text):
+        raise ValueError("Override {} isn't key=value".format(text))
+
+    key, value  = text.split("=", 1)
+    scope       = None
+    if(":" in key):
+        scope, key = key.split(":", 1)
+
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+
+    if(key.startswith("vehicle.")):
+        return scope, {"vehicle" : {key[len("vehicle."):] : value}}
+    return scope, {key : value}
+
+
+# Apply parsed overrides to the scenarios they are scoped to, or to all of them
+def apply_overrides(scenarios, overrides):
+    names = set(scenario["name"] for scenario in scenarios)
+    for scope, changes in overrides:
+        if((scope is not None) and (scope not in names)):
+            raise ValueError("Override for unknown scenario {}".format(scope))
+
+    result = []
+    for scenario in scenarios:
+        for scope, changes in overrides:
+            if((scope is None) or (scope == scenario["name"])):
+                scenario = merge(scenario, changes)
+        result.append(scenario)
+    return result
+
+
+# Raise ValueError for anything a scenario's sim won't accept, before any of them run
+def check(scenario):
+    from src.models.vehicle_spec import Vehicle_Spec
+
+    name = scenario.get("name")
+    if("sim" not in scenario):
+        raise ValueError("Scenario {} doesn't name a sim".format(name))
+
+    accepted    = sim_parameters(scenario["sim"])
+    unknown     = [key for key in scenario if (key not in reserved_keys) and (key not in accepted)]
+    if(unknown):
+        raise ValueError("Scenario {}: {} doesn't take {}".format(name, scenario["sim"], ", ".join(unknown)))
+
+    unknown     = [key for key in scenario.get("vehicle", {}) if key not in Vehicle_Spec.fields]
+    if(unknown):
+        raise ValueError("Scenario {}: vehicles don't have {}".format(name, ", ".join(unknown)))
+
+
+# Keyword arguments for the scenario's sim. Relative telemetry directories are put
+#   under output_directory
+def sim_arguments(scenario, output_directory = None):
+    from src.models.vehicle_spec import Vehicle_Spec
+
+    arguments = {key : value for key, value in scenario.items() if key not in reserved_keys}
+    if("vehicle" in scenario):
+        arguments["vehicle"] = Vehicle_Spec.from_globals().with_changes(**scenario["vehicle"])
+    if((arguments.get("telemetry") is not None) and (output_directory is not None)):
+        arguments["telemetry"] = os.path.join(output_directory, arguments["telemetry"])
+    return arguments
+
+
+# Worker side of a batch, runs one scenario headless. A scenario that fails becomes
+#   an error row rather than taking the batch down. The result itself is only sent
+#   back when keep_result is set, e.g. for plotting
+def run_scenario(task):
+    scenario, output_directory, keep_result = task
+
+    row     = {"name" : scenario["name"], "sim" : scenario["sim"], "seed" : scenario.get("seed", "")}
+    result  = None
+    start   = time.perf_counter()
+    try:
+        result = sim_function(scenario["sim"])(**sim_arguments(scenario, output_directory))
+        if(hasattr(result, "cross_track")):
+            row.update(metrics.summarize_path(result))
+        else:
+            row.update(metrics.summarize(result))
+        row["status"]   = "ok"
+    except Exception as error:
+        row["status"]   = "error"
+        row["message"]  = "{}: {}".format(type(error).__name__, error)
+    row["wall_time_s"] = time.perf_counter() - start
+
+    return row, (result if keep_result else None)
+
+
+# Run every scenario and write one summary row per scenario, in scenario order, to
+#   summary_path. Yields each (row, result) as it is written
+def run_all(scenarios, summary_path, output_directory = None, processes = None, keep_results = False):
+    for scenario in scenarios:
+        check(scenario)
+
+    if(processes is None):
+        processes = os.cpu_count()
+    processes   = max(1, min(processes, len(scenarios)))
+    tasks       = [(scenario, output_directory, keep_results) for scenario in scenarios]
+
+    directory = os.path.dirname(summary_path)
+    if(directory):
+        os.makedirs(directory, exist_ok=True)
+
+    with open(summary_path, "w", newline="") as table:
+        writer = csv.DictWriter(table, fieldnames=table_columns, restval="")
+        writer.writeheader()
+
+        # A single process runs in place, which keeps tracebacks and debuggers simple
+        if(processes == 1):
+            outcomes    = map(run_scenario, tasks)
+            pool        = None
+        else:
+            pool        = multiprocessing.Pool(processes)
+            outcomes    = pool.imap(run_scenario, tasks)
+
+        try:
+            for row, result in outcomes:
+                writer.writerow(row)
+                table.flush()
+                yield row, result
+        finally:
+            if(pool is not None):
+                pool.terminate()
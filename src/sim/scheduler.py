@@ -0,0 +1,100 @@
+###########################################################
+#
+#   FILENAME:       scheduler.py
+#
+#   DESCRIPTION:    Multi rate scheduler. Each model
+#                     registers a task with its own period, a
+#                     whole multiple of the base (plant) step,
+#                     and is only called on its own ticks.
+#                     Between ticks its last output is held,
+#                     like a sampled system would see it
+#
+###########################################################
+
+class Scheduled_Task:
+    def __init__(self, name, period_ticks, function, offset_ticks):
+        self.name           = name
+        self.period_ticks   = period_ticks
+        self.function       = function
+        self.next_tick      = period_ticks + offset_ticks
+        self.calls          = 0
+        self.output         = None
+
+
+class Multi_Rate_Scheduler:
+    # base_step_s is the finest step, every task period must be a whole multiple of it
+    def __init__(self, base_step_s):
+        self.base_step_s    = base_step_s
+        self.tasks          = []
+        self.tick           = 0
+        self.stopped        = False
+
+        # First tick on which any task is due, so ticks with nothing to do are skipped
+        self.next_due       = None
+
+    # Whole number of base steps in period_s
+    def ticks(self, period_s):
+        ticks = int(round(period_s / self.base_step_s))
+        if((ticks < 1) or (abs((ticks * self.base_step_s) - period_s) > (1e-9 * period_s))):
+            raise ValueError("Period {} s is not a multiple of the {} s base step".format(period_s, self.base_step_s))
+        return ticks
+
+    # function(cur_time) is called every period_s, first at period_s + offset_s. Tasks
+    #   due on the same tick run in the order they were added, so register sensors
+    #   before the estimators and controllers that read them
+    def add(self, name, period_s, function, offset_s = 0):
+        offset_ticks = self.ticks(offset_s) if offset_s else 0
+        task = Scheduled_Task(name, self.ticks(period_s), function, offset_ticks)
+        self.tasks.append(task)
+        self.next_due = min(self.next_due, task.next_tick) if (self.next_due is not None) else task.next_tick
+        return task
+
+    # Last value a task returned, held until its next tick
+    def held(self, name):
+        for task in self.tasks:
+            if(task.name == name):
+                return task.output
+        raise KeyError(name)
+
+    @property
+    def time(self):
+        return self.tick * self.base_step_s
+
+    # Tasks can call this to end run() once the current tick is done
+    def stop(self):
+        self.stopped = True
+
+    # Advance to the next tick that has a task due and run those tasks
+    def step(self):
+        self.tick   = self.next_due
+        cur_time    = self.time
+        next_due    = None
+        for task in self.tasks:
+            if(task.next_tick == self.tick):
+                task.output     = task.function(cur_time)
+                task.calls      += 1
+                task.next_tick  += task.period_ticks
+            if((next_due is None) or (task.next_tick < next_due)):
+                next_due = task.next_tick
+        self.next_due = next_due
+
+    # Run until a task calls stop() or max_time_s passes
+    def run(self, max_time_s):
+        while((not self.stopped) and (self.next_due is not None) and
+              (self.next_due * self.base_step_s <= max_time_s)):
+            self.step()
+
+
+if __name__ == '__main__':
+    # Every task has to fire exactly on its own multiples of its period
+    fired       = {"fast" : [], "medium" : [], "slow" : []}
+    scheduler   = Multi_Rate_Scheduler(0.001)
+    scheduler.add("fast",   0.001,  lambda t: fired["fast"].append(scheduler.tick))
+    scheduler.add("medium", 0.01,   lambda t: fired["medium"].append(scheduler.tick))
+    scheduler.add("slow",   0.05,   lambda t: fired["slow"].append(scheduler.tick), offset_s = 0.002)
+    scheduler.run(1.0)
+
+    assert fired["fast"]    == list(range(1, 1001))
+    assert fired["medium"]  == list(range(10, 1001, 10))
+    assert fired["slow"]    == list(range(52, 1001, 50))
+    print("Schedule OK")
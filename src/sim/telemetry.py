@@ -0,0 +1,151 @@
+###########################################################
+#
+#   FILENAME:       telemetry.py
+#
+#   DESCRIPTION:    Streaming telemetry sink. Channels are
+#                     buffered in fixed size chunks and
+#                     appended to one raw little endian float64
+#                     file per channel, with a small JSON
+#                     header next to them. Memory stays bounded
+#                     however long the run, and the files can
+#                     be memory mapped straight back
+#
+#                     <directory>/header.json
+#                     <directory>/<channel>.f64    rows x width
+#
+###########################################################
+
+import  os
+
+header_name     = "header.json"
+file_suffix     = ".f64"
+format_version  = 1
+
+
+class Telemetry_Writer:
+    # channels is a list of names for one value per row, or a dict of name to
+    #   width for channels that carry several values per row (e.g. one per
+    #   Monte Carlo run). constants are stored in the header only
+    def __init__(self, directory, channels, constants = None, chunk_rows = 65536):
+        import numpy as np
+
+        if(not isinstance(channels, dict)):
+            channels = dict((name, 1) for name in channels)
+
+        self.directory      = directory
+        self.widths         = dict(channels)
+        self.channels       = list(channels)
+        self.constants      = dict(constants) if constants else {}
+        self.chunk_rows     = int(chunk_rows)
+        self.rows           = 0
+        self.buffered       = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+        # One chunk buffer and one open file per channel, in channel order
+        self.buffers        = [np.empty((self.chunk_rows, self.widths[name])) for name in self.channels]
+        self.files          = [open(self.channel_path(name), "wb") for name in self.channels]
+
+        self.write_header()
+
+    def channel_path(self, name):
+        return os.path.join(self.directory, name + file_suffix)
+
+    def write_header(self):
+        import json
+
+        header = {
+            "version"       : format_version,
+            "dtype"         : "<f8",
+            "rows"          : self.rows,
+            "chunk_rows"    : self.chunk_rows,
+            "channels"      : dict((name, self.widths[name]) for name in self.channels),
+            "constants"     : self.constants,
+        }
+
+        # Write then rename so a reader never sees half a header
+        temporary_path = os.path.join(self.directory, header_name + ".tmp")
+        with open(temporary_path, "w") as header_file:
+            json.dump(header, header_file, indent=2)
+        os.replace(temporary_path, os.path.join(self.directory, header_name))
+
+    # One row, a value (or width values) per channel in channel order
+    def write(self, *values):
+        row = self.buffered
+        for buffer, value in zip(self.buffers, values):
+            buffer[row] = value
+
+        self.buffered += 1
+        if(self.buffered == self.chunk_rows):
+            self.flush()
+
+    # Many rows at once, one (rows,) or (rows, width) array per channel in channel order
+    def write_block(self, *arrays):
+        import numpy as np
+
+        arrays  = [np.asarray(array, dtype=np.float64) for array in arrays]
+        start   = 0
+        total   = len(arrays[0])
+        while(start < total):
+            count = min(self.chunk_rows - self.buffered, total - start)
+            for buffer, array in zip(self.buffers, arrays):
+                buffer[self.buffered:self.buffered + count] = array[start:start + count].reshape(count, -1)
+
+            self.buffered   += count
+            start           += count
+            if(self.buffered == self.chunk_rows):
+                self.flush()
+
+    # Append whatever is buffered to the channel files
+    def flush(self):
+        if(self.buffered == 0):
+            return
+
+        for buffer, channel_file in zip(self.buffers, self.files):
+            buffer[:self.buffered].astype("<f8", copy=False).tofile(channel_file)
+            channel_file.flush()
+
+        self.rows       += self.buffered
+        self.buffered   = 0
+        self.write_header()
+
+    def close(self):
+        self.flush()
+        for channel_file in self.files:
+            channel_file.close()
+        self.files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+# Memory maps every channel of a telemetry directory. Returns the header and a
+#   dict of read only arrays, (rows,) for single value channels and (rows, width)
+#   otherwise. Rows are counted from the file sizes so a run that died mid
+#   write can still be read up to its last complete chunk
+def open_telemetry(directory):
+    import json
+    import numpy as np
+
+    with open(os.path.join(directory, header_name)) as header_file:
+        header = json.load(header_file)
+
+    rows = None
+    for name, width in header["channels"].items():
+        channel_rows = os.path.getsize(os.path.join(directory, name + file_suffix)) // (8 * width)
+        if((rows is None) or (channel_rows < rows)):
+            rows = channel_rows
+
+    channels = {}
+    for name, width in header["channels"].items():
+        path    = os.path.join(directory, name + file_suffix)
+        shape   = (rows,) if width == 1 else (rows, width)
+        if(rows == 0):
+            channels[name] = np.zeros(shape)
+        else:
+            channels[name] = np.memmap(path, dtype=header["dtype"], mode="r", shape=shape)
+
+    return header, channels